@@ -1,18 +1,62 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
 from pydantic import Field, validator
-from models.appointment import Appointment
-from models.service import Service
-from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentOut
-from utils.response import create_response, create_pagination_response
+from pymongo import ReturnDocument
+from models.appointment import Appointment, ServiceSnapshot, CANCELED_STATUS
+from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentOut, AvailabilityOut, AppointmentBulkCreate, AppointmentBulkOut, AppointmentMultiGet, APPOINTMENT_VIEWS
+from services.availability_service import availability_index, find_free_slots, slot_start_for, to_utc_naive, AVAILABILITY_MAX_DAYS
+from services.reservation_service import check_slot_alignment, claim_slot, release_claim, release_slot
+from services.catalog_service import get_cached_service
+from services.booking_number_service import booking_numbers
+from services.export_service import export_disposition, stream_bookings, EXPORT_BATCH_SIZE
+from services.bulk_import_service import import_appointments, BULK_MAX_ITEMS, BULK_INSERT_CHUNK_SIZE
+from services.booking_feed import booking_feed
+from services.idempotency_service import idempotent
+from services.search_service import search_query
+from services.snapshot_service import expand_services
+from services.stats_service import get_booking_stats, record_booking_change, STATS_MAX_DAYS
+from utils.pagination import encode_cursor, keyset_filter, count_documents
+from utils.response import create_response, create_pagination_response, create_cursor_response, create_multi_get_response
+from utils.fast_json import FAST_SERIALIZATION, find_rows, respond, row_encoder, select_fields
+from utils.multi_get import check_batch_size, in_request_order, index_by, unique
+from utils.http_cache import BOOKING_CACHE_CONTROL, etag_matches, make_etag, not_modified, with_cache_headers
+from utils.versioning import raise_update_miss, versioned_filter, versioned_update
 
 router = APIRouter(prefix="/bookings")
 
+async def find_appointments(query: dict, sort: list, skip: int = 0, limit: int = 0, fields: Optional[tuple] = None) -> list:
+    # Fast mode and sparse fieldsets encode projected raw documents; otherwise build Beanie documents and schemas
+    if FAST_SERIALIZATION or fields:
+        return await find_rows(Appointment, row_encoder(AppointmentOut, fields), query, sort, skip, limit)
+    appointments = await Appointment.find(query).sort(sort).skip(skip).limit(limit).to_list()
+    return [AppointmentOut.from_orm(appt) for appt in appointments]
+
+def item_value(item, name: str):
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+EXPAND_QUERY = Query(default=None, pattern="^service$", description="service: attach each booking's current service, resolved once per distinct service_id")
+
 @router.get("")
-async def get_appointments(skip: int = Query(default=0, ge=0), limit: int = Query(default=100, ge=1, le=1000), tenant_id: Optional[str] = None):
+async def get_appointments(
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    tenant_id: Optional[str] = None,
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from nextCursor; send an empty value for the first page"),
+    include_total: bool = Query(default=False, description="Add totalElements to cursor pages"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated AppointmentOut fields to return"),
+    view: Optional[str] = Query(default=None, pattern="^(full|summary)$", description="Named field set; summary is index-covered for tenant cursor pages"),
+    expand: Optional[str] = EXPAND_QUERY
+):
+    # Cursor pages always carry their sort keys, expanded pages the key of their service
+    always = ("id", "appointment_time") if cursor is not None else ("id",)
+    if expand:
+        always += ("service_id",)
+    selected = select_fields(AppointmentOut, fields, view, APPOINTMENT_VIEWS, always=always)
+
     # Filter appointments based on provided parameters
     query = {}
     # if user_id:
@@ -20,35 +64,204 @@ async def get_appointments(skip: int = Query(default=0, ge=0), limit: int = Quer
     if tenant_id:
         query["tenant_id"] = tenant_id
 
+    # Cursor mode: seek past the last (appointment_time, _id) instead of skipping rows
+    if cursor is not None:
+        page_query = dict(query)
+        if cursor:
+            page_query.update(keyset_filter(cursor, "appointment_time"))
+        content = await find_appointments(page_query, [("appointment_time", 1), ("_id", 1)], limit=limit + 1, fields=selected)
+        next_cursor = None
+        if len(content) > limit:
+            content = content[:limit]
+            next_cursor = encode_cursor(item_value(content[-1], "id"), item_value(content[-1], "appointment_time"))
+        if expand:
+            content = await expand_services(content)
+        total_elements = await count_documents(Appointment, query) if include_total else None
+        return respond(create_cursor_response(
+            content=content,
+            next_cursor=next_cursor,
+            size=limit,
+            total_elements=total_elements
+        ), raw=selected is not None)
+
     # Calculate total elements
-    total_elements = await Appointment.find(query).count()
+    total_elements = await count_documents(Appointment, query, cached=False)
     
-    # Get paginated items
-    appointments = await Appointment.find(query).skip(skip).limit(limit).to_list()
+    # Get paginated items, in _id order so skip pages are stable and index-backed
+    content = await find_appointments(query, [("_id", 1)], skip, limit, fields=selected)
+    if expand:
+        content = await expand_services(content)
     
     # Create pagination response
-    content = [AppointmentOut.from_orm(appt) for appt in appointments]
-    return create_pagination_response(
+    return respond(create_pagination_response(
         content=content,
         total_elements=total_elements,
         page=skip,
         size=limit
+    ), raw=selected is not None)
+
+@router.get("/availability")
+async def get_availability(
+    service_id: PydanticObjectId,
+    tenant_id: str,
+    start: datetime,
+    end: datetime
+):
+    if end <= start:
+        raise HTTPException(
+            status_code=400,
+            detail="end must be after start"
+        )
+    if end - start > timedelta(days=AVAILABILITY_MAX_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Availability range cannot exceed {AVAILABILITY_MAX_DAYS} days"
+        )
+    service = await get_cached_service(service_id)
+    if not service:
+        raise HTTPException(
+            status_code=404,
+            detail="Service not found"
+        )
+    slots = await find_free_slots(tenant_id, service_id, service.duration, start, end, service.capacity)
+    return create_response(AvailabilityOut(
+        service_id=service_id,
+        tenant_id=tenant_id,
+        duration=service.duration,
+        slots=slots
+    ))
+
+@router.get("/export")
+async def export_appointments(
+    tenant_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(default=EXPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    query = {"tenant_id": tenant_id}
+    time_range = {}
+    if start:
+        time_range["$gte"] = start
+    if end:
+        time_range["$lt"] = end
+    if time_range:
+        query["appointment_time"] = time_range
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_bookings(query, format, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": export_disposition(tenant_id, format)}
+    )
+
+@router.get("/feed")
+async def booking_change_feed(tenant_id: str):
+    # Server-Sent Events: fetch GET /bookings once, then apply created/updated/canceled deltas;
+    # a resync event means events were dropped and the list must be fetched again
+    return StreamingResponse(
+        booking_feed.stream(tenant_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@router.get("/search")
+async def search_appointments(
+    tenant_id: str,
+    phone: Optional[str] = Query(default=None, description="Leading part of the phone number, in any common format"),
+    name: Optional[str] = Query(default=None, description="Leading part of the customer name; case and diacritics are ignored"),
+    limit: int = Query(default=20, ge=1, le=100),
+    fields: Optional[str] = Query(default=None, description="Comma-separated AppointmentOut fields to return"),
+    view: Optional[str] = Query(default=None, pattern="^(full|summary)$", description="Named field set"),
+    expand: Optional[str] = EXPAND_QUERY
+):
+    # Matches sorted by phone or name, then newest booking first
+    query, sort = search_query(tenant_id, phone, name)
+    selected = select_fields(AppointmentOut, fields, view, APPOINTMENT_VIEWS, always=("id", "service_id") if expand else ("id",))
+    content = await find_appointments(query, sort, limit=limit, fields=selected)
+    if expand:
+        content = await expand_services(content)
+    return respond(create_response(content), raw=selected is not None)
+
+@router.get("/stats")
+async def get_appointment_stats(
+    tenant_id: str,
+    start: date,
+    end: date,
+    service_id: Optional[PydanticObjectId] = None
+):
+    if end < start:
+        raise HTTPException(
+            status_code=400,
+            detail="end must not be before start"
+        )
+    if (end - start).days >= STATS_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stats range cannot exceed {STATS_MAX_DAYS} days"
+        )
+    return create_response(await get_booking_stats(tenant_id, start, end, service_id))
+
+@router.post("/multi-get")
+async def get_appointments_by_ids(
+    lookup: AppointmentMultiGet,
+    tenant_id: Optional[str] = None,
+    fields: Optional[str] = Query(default=None, description="Comma-separated AppointmentOut fields to return"),
+    view: Optional[str] = Query(default=None, pattern="^(full|summary)$", description="Named field set"),
+    expand: Optional[str] = EXPAND_QUERY
+):
+    check_batch_size(lookup.ids, lookup.booking_numbers)
+    # Matching needs both keys whatever the caller selected
+    always = ("id", "booking_number", "service_id") if expand else ("id", "booking_number")
+    selected = select_fields(AppointmentOut, fields, view, APPOINTMENT_VIEWS, always=always)
+
+    # One $in per key kind, combined into a single query; each half uses its own index
+    ids, numbers = unique(lookup.ids), unique(lookup.booking_numbers)
+    clauses = []
+    if ids:
+        clauses.append({"_id": {"$in": ids}})
+    if numbers:
+        clauses.append({"booking_number": {"$in": numbers}})
+    query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    if tenant_id:
+        # Bookings of other tenants are reported as missing
+        query = {**query, "tenant_id": tenant_id}
+    appointments = await find_appointments(query, [("_id", 1)], fields=selected)
+
+    seen = set()
+    by_id, missing_ids = in_request_order(ids, index_by(appointments, lambda item: item_value(item, "id")), seen)
+    by_number, missing_numbers = in_request_order(numbers, index_by(appointments, lambda item: item_value(item, "booking_number")), seen)
+    content = by_id + by_number
+    if expand:
+        content = await expand_services(content)
+    return respond(create_multi_get_response(
+        content=content,
+        missing={"ids": [str(appointment_id) for appointment_id in missing_ids], "bookingNumbers": missing_numbers}
+    ), raw=selected is not None)
+
 @router.get("/{appointment_id}")
-async def get_appointment(appointment_id: PydanticObjectId):
-    appointment = await Appointment.get(appointment_id)
-    if not appointment:
+async def get_appointment(appointment_id: PydanticObjectId, if_none_match: Optional[str] = Header(None)):
+    appointments = await find_appointments({"_id": appointment_id}, [("_id", 1)], limit=1)
+    if not appointments:
         raise HTTPException(
             status_code=404,
             detail="Appointment not found"
         )
-    return create_response(AppointmentOut.from_orm(appointment))
+    # Every write to a booking bumps its version, so (id, version) identifies the representation
+    appointment = appointments[0]
+    etag = make_etag("booking", item_value(appointment, "id"), item_value(appointment, "version"))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, BOOKING_CACHE_CONTROL)
+    return with_cache_headers(respond(create_response(appointment)), etag, BOOKING_CACHE_CONTROL)
 
 @router.post("/new")
-async def create_appointment(appointment: AppointmentCreate):
+async def create_appointment(appointment: AppointmentCreate, idempotency_key: Optional[str] = Header(None)):
+    # Retries with the same Idempotency-Key (or x-request-id) replay the first response
+    return await idempotent("bookings.create", idempotency_key, appointment, lambda: save_appointment(appointment))
+
+async def save_appointment(appointment: AppointmentCreate):
     # Check if service exists
-    service = await Service.get(appointment.service_id)
+    service = await get_cached_service(appointment.service_id)
     if not service:
         raise HTTPException(
             status_code=404,
@@ -72,16 +285,6 @@ async def create_appointment(appointment: AppointmentCreate):
             status_code=400,
             detail="Appointment time must be in the future"
         )
-    # Check for overlapping appointments
-    # overlapping_appointment = await Appointment.find_one(
-    #     Appointment.appointment_time == appointment.appointment_time,
-    #     Appointment.status == "scheduled"
-    # )
-    # if overlapping_appointment:
-    #     raise HTTPException(
-    #         status_code=400,
-    #         detail="This time slot is already booked"
-    #     )
     # Create new appointment
     new_appointment = Appointment(
         customer_name=appointment.customer_name,
@@ -90,67 +293,183 @@ async def create_appointment(appointment: AppointmentCreate):
         tenant_id=appointment.tenant_id,
         appointment_time=appointment.appointment_time,
         status="Pending",
-        notes=appointment.notes
+        notes=appointment.notes,
+        booking_number=await booking_numbers.next(),
+        service_snapshot=ServiceSnapshot.of(service)
     )
-    saved_appointment = await new_appointment.save()
+    # Atomically reserve the time slot before writing the booking
+    await claim_slot(new_appointment, service)
+    try:
+        saved_appointment = await new_appointment.save()
+    except Exception:
+        await release_slot(new_appointment.id)
+        raise
+    availability_index.record_booking(saved_appointment)
+    await record_booking_change(None, saved_appointment)
     return create_response(AppointmentOut.from_orm(saved_appointment), "201")
 
-@router.put("/{appointment_id}")
-async def update_appointment(appointment_id: PydanticObjectId, appointment: AppointmentUpdate, tenant_id: Optional[str] = None):
-    db_appointment = await Appointment.get(appointment_id)
-    if not db_appointment:
+@router.post("/bulk")
+async def create_appointments_bulk(
+    bulk: AppointmentBulkCreate,
+    chunk_size: int = Query(default=BULK_INSERT_CHUNK_SIZE, ge=1, le=BULK_MAX_ITEMS)
+):
+    if len(bulk.items) > BULK_MAX_ITEMS:
         raise HTTPException(
-            status_code=404,
-            detail="Appointment not found"
+            status_code=400,
+            detail=f"A bulk import accepts at most {BULK_MAX_ITEMS} bookings"
         )
-    # Check if tenant is allowed to update this appointment
-    if tenant_id and db_appointment.tenant_id != tenant_id:
-        raise HTTPException(
-            status_code=403,
-            detail="Not allowed to update appointments from other tenants"
+    results = await import_appointments(bulk.items, chunk_size)
+    created = sum(1 for result in results if result.status == "created")
+    return create_response(AppointmentBulkOut(
+        created=created,
+        failed=len(results) - created,
+        results=results
+    ))
+
+async def move_appointment(collection, appointment_id: PydanticObjectId, version: Optional[int], tenant_id: Optional[str], update: dict, service):
+    """Slow path of an update: read the booking, claim its new slot, then write pinned to the version read."""
+    # The tenant check and the client's expected version are part of the filter
+    previous = await collection.find_one(versioned_filter(appointment_id, version, tenant_id))
+    if previous is None:
+        await raise_update_miss(
+            collection, appointment_id, "Appointment not found", tenant_id,
+            "Not allowed to update appointments from other tenants"
+        )
+    previous_appointment = Appointment.model_validate(previous)
+    db_appointment = previous_appointment.model_copy(
+        update={**update["$set"], "version": previous_appointment.version + 1}
+    )
+    if service is not None and db_appointment.service_id != previous_appointment.service_id:
+        # The snapshot follows the booking to its new service in the same write; same-service updates keep the original
+        snapshot = ServiceSnapshot.of(service)
+        update = {**update, "$set": {**update["$set"], "service_snapshot": snapshot.model_dump()}}
+        db_appointment = db_appointment.model_copy(update={"service_snapshot": snapshot})
+
+    # Take the new slot when the booking lands in another slot or is reactivated
+    was_active = previous_appointment.status != CANCELED_STATUS
+    is_active = db_appointment.status != CANCELED_STATUS
+    claim_id = None
+    if is_active:
+        if service is None:
+            service = await get_cached_service(db_appointment.service_id)
+        moved = (
+            to_utc_naive(previous_appointment.appointment_time) != to_utc_naive(db_appointment.appointment_time)
+            or previous_appointment.service_id != db_appointment.service_id
+        )
+        if service is not None and moved:
+            # Same-slot moves claim nothing, so an off-grid time would overlap the next slot;
+            # bookings made before the grid check keep their time through other edits
+            check_slot_alignment(db_appointment.appointment_time, service)
+        same_slot = (
+            was_active
+            and service is not None
+            and previous_appointment.tenant_id == db_appointment.tenant_id
+            and previous_appointment.service_id == db_appointment.service_id
+            and slot_start_for(previous_appointment.appointment_time, service.duration) == slot_start_for(db_appointment.appointment_time, service.duration)
         )
+        if service is not None and not same_slot:
+            claim_id = await claim_slot(db_appointment, service)
+
+    # The write is pinned to the version just read: if anything changed the booking
+    # in between, nothing is written and the seat taken above is given back
+    written = await collection.find_one_and_update(
+        versioned_filter(appointment_id, previous_appointment.version, tenant_id),
+        update,
+        projection={"_id": 1}
+    )
+    if written is None:
+        if claim_id is not None:
+            await release_claim(claim_id, appointment_id)
+        await raise_update_miss(
+            collection, appointment_id, "Appointment not found", tenant_id,
+            "Not allowed to update appointments from other tenants"
+        )
+
+    return previous_appointment, db_appointment, was_active, is_active, claim_id
+
+@router.put("/{appointment_id}")
+async def update_appointment(appointment_id: PydanticObjectId, appointment: AppointmentUpdate, tenant_id: Optional[str] = None):
     # If changing appointment time, check if it's in the future
     if appointment.appointment_time and appointment.appointment_time < datetime.now(timezone.utc):
         raise HTTPException(
             status_code=400,
             detail="Appointment time must be in the future"
         )
-    # Update appointment fields
+    service = None
+    # Collect only the fields this request changes
+    changes = {}
     if appointment.service_id:
-        service = await Service.get(appointment.service_id)
+        service = await get_cached_service(appointment.service_id)
         if not service:
             raise HTTPException(
                 status_code=404,
                 detail="Service not found"
             )
-        db_appointment.service_id = appointment.service_id
+        changes["service_id"] = appointment.service_id
     if appointment.appointment_time:
-        db_appointment.appointment_time = appointment.appointment_time
+        changes["appointment_time"] = appointment.appointment_time
     if appointment.status:
-        db_appointment.status = appointment.status
+        changes["status"] = appointment.status
     if appointment.notes is not None:
-        db_appointment.notes = appointment.notes
+        changes["notes"] = appointment.notes
     if appointment.tenant_id is not None:
-        db_appointment.tenant_id = appointment.tenant_id
+        changes["tenant_id"] = appointment.tenant_id
+
+    collection = Appointment.get_motor_collection()
+    update = versioned_update(changes)
+    previous = None
+    # The tenant check stays in the filter, so a body moving the booking to another tenant takes the slow path
+    keeps_tenant = not tenant_id or appointment.tenant_id in (None, tenant_id)
+    if appointment.status != CANCELED_STATUS and keeps_tenant:
+        # Fast path for edits that leave the slot alone: an active booking already at
+        # this service and time holds its seat, so one versioned write is all it takes
+        unchanged_slot = {
+            **versioned_filter(appointment_id, appointment.version, tenant_id),
+            "service_id": appointment.service_id,
+            "appointment_time": appointment.appointment_time,
+            "status": {"$ne": CANCELED_STATUS},
+        }
+        if appointment.tenant_id is not None:
+            unchanged_slot["tenant_id"] = appointment.tenant_id
+        previous = await collection.find_one_and_update(unchanged_slot, update, return_document=ReturnDocument.BEFORE)
 
-    await db_appointment.save()
+    if previous is not None:
+        previous_appointment = Appointment.model_validate(previous)
+        db_appointment = previous_appointment.model_copy(
+            update={**update["$set"], "version": previous_appointment.version + 1}
+        )
+        was_active = is_active = True
+        claim_id = None
+    else:
+        previous_appointment, db_appointment, was_active, is_active, claim_id = await move_appointment(
+            collection, appointment_id, appointment.version, tenant_id, update, service
+        )
+
+    if was_active and (not is_active or claim_id is not None):
+        await release_slot(db_appointment.id, keep_claim_id=claim_id)
+    availability_index.discard_booking(previous_appointment.tenant_id, previous_appointment.service_id, db_appointment.id)
+    availability_index.record_booking(db_appointment)
+    await record_booking_change(previous_appointment, db_appointment)
     return create_response(AppointmentOut.from_orm(db_appointment))
 
 @router.delete("/{appointment_id}")
 async def delete_appointment(appointment_id: PydanticObjectId, tenant_id: Optional[str] = None):
-    appointment = await Appointment.get(appointment_id)
-    if not appointment:
-        raise HTTPException(
-            status_code=404,
-            detail="Appointment not found"
-        )
-    # Check if tenant is allowed to delete this appointment
-    if tenant_id and appointment.tenant_id != tenant_id:
-        raise HTTPException(
-            status_code=403,
-            detail="Not allowed to delete appointments from other tenants"
+    # Instead of deleting, mark it as canceled (recommended approach), in one round trip
+    collection = Appointment.get_motor_collection()
+    update = versioned_update({"status": CANCELED_STATUS})
+    previous = await collection.find_one_and_update(
+        versioned_filter(appointment_id, tenant_id=tenant_id),
+        update,
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        await raise_update_miss(
+            collection, appointment_id, "Appointment not found", tenant_id,
+            "Not allowed to delete appointments from other tenants"
         )
-    # Instead of deleting, mark it as canceled (recommended approach)
-    appointment.status = "canceled"
-    await appointment.save()
-    return create_response(None, "204")
\ No newline at end of file
+    before = Appointment.model_validate(previous)
+    appointment = before.model_copy(update={**update["$set"], "version": before.version + 1})
+    await release_slot(appointment.id)
+    availability_index.discard_booking(appointment.tenant_id, appointment.service_id, appointment.id)
+    await record_booking_change(before, appointment)
+    return create_response(None, "204")
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Query, HTTPException, File, UploadFile, Form, Request
+from fastapi import APIRouter, Query, HTTPException, File, UploadFile, Form, Header
 from typing import List, Optional
 from beanie import PydanticObjectId
+from pymongo import ReturnDocument
 from models.service import Service
-from schemas.service import ServiceCreate, ServiceUpdate, ServiceOut
-from utils.response import create_response, create_pagination_response
+from schemas.service import ServiceCreate, ServiceUpdate, ServiceOut, ServiceMultiGet, SERVICE_VIEWS
+from utils.pagination import encode_cursor, keyset_filter, count_documents
+from utils.response import create_response, create_pagination_response, create_cursor_response, create_multi_get_response
 import re
-from services.image_service import upload_images
+from services.image_service import upload_images, upload_images_each
+from services.idempotency_service import idempotent
+from services.catalog_service import get_cached_service, get_cached_services, get_cached_service_page, get_catalog_version, invalidate_service
+from utils.fast_json import FAST_SERIALIZATION, find_rows, respond, row_encoder, select_fields
+from utils.multi_get import check_batch_size, in_request_order, unique
+from utils.http_cache import CATALOG_CACHE_CONTROL, etag_matches, make_etag, not_modified, with_cache_headers
+from utils.versioning import raise_update_miss, versioned_filter, versioned_update
 
 # URL pattern validation
 URL_PATTERN = re.compile(r'^https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[-\w./?%&=]*$')
@@ -13,59 +21,110 @@ URL_PATTERN = re.compile(r'^https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[-\w./?%&=]*$
 # Backward compatibility router
 router_biz_services = APIRouter(prefix="/biz-services")
 
+async def find_services(query: dict, skip: int = 0, limit: int = 0, fields: Optional[tuple] = None) -> list:
+    # Fast mode and sparse fieldsets encode projected raw documents; otherwise build Beanie documents and schemas
+    if FAST_SERIALIZATION or fields:
+        return await find_rows(Service, row_encoder(ServiceOut, fields), query, [("_id", 1)], skip, limit)
+    services = await Service.find(query).sort([("_id", 1)]).skip(skip).limit(limit).to_list()
+    return [ServiceOut.from_orm(service) for service in services]
+
 @router_biz_services.get("")
 async def get_services(
-    request: Request,
     skip: int = Query(0, ge=0, description="Number of items to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of items to return")
+    limit: int = Query(100, ge=1, le=1000, description="Number of items to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from nextCursor; send an empty value for the first page"),
+    include_total: bool = Query(False, description="Add totalElements to cursor pages"),
+    fields: Optional[str] = Query(None, description="Comma-separated ServiceOut fields to return"),
+    view: Optional[str] = Query(None, pattern="^(full|summary)$", description="Named field set; summary drops descriptions and media URLs"),
+    if_none_match: Optional[str] = Header(None)
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
-    # Calculate total elements
-    total_elements = await Service.find_all().count()
-    
-    # Get paginated items
-    services = await Service.find_all().skip(skip).limit(limit).to_list()
+    selected = select_fields(ServiceOut, fields, view, SERVICE_VIEWS)
+
+    # Revalidation against the catalog version needs neither the page nor its serialization
+    etag = make_etag("services", await get_catalog_version(), skip, limit, cursor, include_total, selected)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    # Cursor mode: seek past the last _id instead of skipping rows
+    if cursor is not None:
+        async def load_cursor_page():
+            query = keyset_filter(cursor) if cursor else {}
+            content = await find_services(query, limit=limit + 1, fields=selected)
+            next_cursor = None
+            if len(content) > limit:
+                content = content[:limit]
+                last = content[-1]
+                next_cursor = encode_cursor(last["id"] if isinstance(last, dict) else last.id)
+            total_elements = await count_documents(Service, {}) if include_total else None
+            return content, next_cursor, total_elements
+
+        content, next_cursor, total_elements = await get_cached_service_page(
+            ("cursor", cursor, limit, include_total, selected), load_cursor_page
+        )
+        return with_cache_headers(respond(create_cursor_response(
+            content=content,
+            next_cursor=next_cursor,
+            size=limit,
+            total_elements=total_elements
+        ), raw=selected is not None), etag, CATALOG_CACHE_CONTROL)
+
+    async def load_page():
+        # Calculate total elements
+        total_elements = await count_documents(Service, {}, cached=False)
+        # Get paginated items, in _id order so skip pages are stable and index-backed
+        return await find_services({}, skip, limit, fields=selected), total_elements
+
+    content, total_elements = await get_cached_service_page(("skip", skip, limit, selected), load_page)
     
     # Calculate page number (1-indexed) from skip and limit
     # If skip=0, page=1; if skip=5 and limit=5, page=2, etc.
     page = (skip // limit) + 1 if limit > 0 else 1
     
     # Create pagination response
-    content = [ServiceOut.from_orm(service) for service in services]
-    return create_pagination_response(
+    return with_cache_headers(respond(create_pagination_response(
         content=content,
         total_elements=total_elements,
         page=page,
-        size=limit,
-        request_id=request_id
-    )
+        size=limit
+    ), raw=selected is not None), etag, CATALOG_CACHE_CONTROL)
 
 @router_biz_services.get("{service_id}")
 async def get_service(
-    request: Request,
-    service_id: PydanticObjectId
+    service_id: PydanticObjectId,
+    if_none_match: Optional[str] = Header(None)
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
-    service = await Service.get(service_id)
+    # Looked up first, so If-None-Match: * cannot turn a missing service into a 304
+    service = await get_cached_service(service_id)
     if not service:
         raise HTTPException(
             status_code=404,
             detail="Service not found"
         )
-    return create_response(ServiceOut.from_orm(service), request_id=request_id)
+    etag = make_etag("service", service_id, await get_catalog_version())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CATALOG_CACHE_CONTROL)
+    return with_cache_headers(create_response(ServiceOut.from_orm(service)), etag, CATALOG_CACHE_CONTROL)
+
+@router_biz_services.post("/multi-get")
+async def get_services_by_ids(lookup: ServiceMultiGet):
+    check_batch_size(lookup.ids)
+    # Cached services are served from memory; the rest come from one $in query
+    services = await get_cached_services(unique(lookup.ids))
+    content, missing_ids = in_request_order(lookup.ids, services, set())
+    return create_multi_get_response(
+        content=[ServiceOut.from_orm(service) for service in content],
+        missing={"ids": [str(service_id) for service_id in missing_ids]}
+    )
 
 @router_biz_services.post("/new")
 async def create_service(
-    request: Request,
-    service: ServiceCreate
+    service: ServiceCreate,
+    idempotency_key: Optional[str] = Header(None)
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
+    # Retries with the same Idempotency-Key (or x-request-id) replay the first response
+    return await idempotent("services.create", idempotency_key, service, lambda: save_service(service))
+
+async def save_service(service: ServiceCreate):
     # Validate photo and video URLs if provided
     for photo in service.photos:
         if not URL_PATTERN.match(photo):
@@ -84,50 +143,53 @@ async def create_service(
     # Create service without extra fields by using exclude_unset
     new_service = Service(**service.dict(exclude_unset=True))
     await new_service.save()
-    return create_response(ServiceOut.from_orm(new_service), "201", request_id)
+    await invalidate_service(new_service.id)
+    return create_response(ServiceOut.from_orm(new_service), "201")
 
 @router_biz_services.post("/image/upload")
 async def upload_service_image(
-    request: Request,
     category: str = Form(...),
     files: List[UploadFile] = File(...)
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
     result = await upload_images(category, files)
-    return create_response(result, request_id=request_id)
+    return create_response(result)
+
+@router_biz_services.post("/image/upload/each")
+async def upload_service_images_each(
+    category: str = Form(...),
+    files: List[UploadFile] = File(...)
+):
+    # One upstream request per file; the payload is a list of their responses in file order
+    result = await upload_images_each(category, files)
+    return create_response(result)
 
 @router_biz_services.put("/{service_id}")
 async def update_service(
-    request: Request,
     service_id: PydanticObjectId, 
     service: ServiceUpdate
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
-    db_service = await Service.get(service_id)
-    if not db_service:
-        raise HTTPException(
-            status_code=404,
-            detail="Service not found"
-        )
     # Use exclude_unset to ensure we only update provided fields and ignore extras
     update_data = service.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_service, key, value)
-    await db_service.save()
-    return create_response(ServiceOut.from_orm(db_service), request_id=request_id)
+    update_data.pop("id", None)
+    expected_version = update_data.pop("version", None)
+
+    # One round trip: $set only the provided fields, guarded by the version the client read
+    collection = Service.get_motor_collection()
+    updated = await collection.find_one_and_update(
+        versioned_filter(service_id, expected_version),
+        versioned_update(update_data),
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        await raise_update_miss(collection, service_id, "Service not found")
+    db_service = Service.model_validate(updated)
+    await invalidate_service(service_id)
+    return create_response(ServiceOut.from_orm(db_service))
 
 @router_biz_services.delete("/{service_id}")
 async def delete_service(
-    request: Request,
     service_id: PydanticObjectId
 ):
-    # Get the request_id from the request state (added by middleware)
-    request_id = request.state.request_id
-    
     service = await Service.get(service_id)
     if not service:
         raise HTTPException(
@@ -135,4 +197,5 @@ async def delete_service(
             detail="Service not found"
         )
     await service.delete()
-    return create_response(None, "204", request_id)
\ No newline at end of file
+    await invalidate_service(service_id)
+    return create_response(None, "204")
\ No newline at end of file
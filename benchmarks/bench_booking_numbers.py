@@ -0,0 +1,82 @@
+"""Stress the booking number allocator from several processes and check for duplicates.
+
+Every worker process leases blocks from the shared counter in the configured
+MongoDB (BENCH_DB_NAME, default booking_bench), or in the server at --uri:
+
+    python -m benchmarks.bench_booking_numbers --total 1000000 --processes 8
+
+tests/test_booking_numbers.py runs the same check with assertions.
+"""
+import os
+
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "booking_bench")
+
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import time
+from typing import List, Optional
+
+
+def allocate_in_process(count: int, batch: int, uri: Optional[str] = None) -> List[str]:
+    # Spawned processes import their own client, as separate workers would
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import core.database as database
+    from models.counter import Counter
+    from services.booking_number_service import BookingNumberAllocator
+
+    async def run():
+        if uri:
+            database.client = AsyncIOMotorClient(uri)
+        await init_beanie(database=database.get_db(), document_models=[Counter])
+        allocator = BookingNumberAllocator()
+        numbers = []
+        while len(numbers) < count:
+            take = min(batch, count - len(numbers))
+            numbers.extend(await asyncio.gather(*[allocator.next() for _ in range(take)]))
+        return numbers
+
+    return asyncio.run(run())
+
+
+def allocate_in_processes(total: int, processes: int, batch: int, uri: Optional[str] = None) -> List[List[str]]:
+    """Numbers handed out by each of `processes` workers, `total` in all."""
+    per_process = total // processes
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        return pool.starmap(allocate_in_process, [(per_process, batch, uri)] * processes)
+
+
+def sequence_key(number: str) -> str:
+    # The base36 suffix is the sequence; pad so longer suffixes sort after shorter ones
+    return number.rsplit("-", 1)[1].rjust(12, "0")
+
+
+def is_increasing(numbers: List[str]) -> bool:
+    keys = [sequence_key(number) for number in numbers]
+    return all(a < b for a, b in zip(keys, keys[1:]))
+
+
+def main(total: int, processes: int, batch: int, uri: Optional[str] = None) -> int:
+    started = time.perf_counter()
+    results = allocate_in_processes(total, processes, batch, uri)
+    elapsed = time.perf_counter() - started
+
+    numbers = [number for result in results for number in result]
+    unique = len(set(numbers))
+    print(f"{len(numbers)} numbers from {processes} processes in {elapsed:.2f}s ({len(numbers) / elapsed:,.0f}/s)")
+    # Within one process numbers must come out strictly increasing
+    monotonic = all(is_increasing(result) for result in results)
+    print(f"unique={unique} duplicates={len(numbers) - unique} monotonic_per_process={monotonic}")
+    return 0 if unique == len(numbers) and monotonic else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=1000, help="concurrent allocations per process")
+    parser.add_argument("--uri", help="MongoDB to use instead of DB_HOST/DB_PORT")
+    args = parser.parse_args()
+    sys.exit(main(args.total, args.processes, args.batch, args.uri))
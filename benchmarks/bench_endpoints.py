@@ -0,0 +1,497 @@
+"""Latency and throughput of every API route against a seeded MongoDB.
+
+Seeds a scratch database (BENCH_DB_NAME, default booking_bench) on the
+configured MongoDB with a reproducible data set, then drives each route in
+api/v1/endpoints through httpx's ASGITransport and through a real uvicorn
+server on a local port, reporting p50/p99 latency and requests per second:
+
+    python -m benchmarks.bench_endpoints --bookings 5000000 --save-baseline bench.json
+    python -m benchmarks.bench_endpoints --skip-seed --baseline bench.json --threshold 0.15
+
+With --baseline the run exits non-zero when any route's throughput drops more
+than --threshold below the recorded value. Seeding is skipped when the
+database already holds the requested volumes; --reseed drops it first.
+--in-memory swaps MongoDB for mongomock-motor (not a requirement of the
+service, install it separately) for smoke runs without a mongod.
+"""
+import os
+
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "booking_bench")
+# Route throughput is measured without admission control; see load_admission for that
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import httpx
+from bson import ObjectId
+
+UPLOAD_RESPONSE = b'{"urls": ["https://cdn.example.com/bench.png"]}'
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 4096
+SEED_BATCH = 10000
+STATUSES = ["Pending", "Pending", "Pending", "completed", "canceled"]
+
+
+class Case(NamedTuple):
+    name: str
+    build: Callable[[int], Tuple[str, str, dict]]  # request number -> (method, path, httpx kwargs)
+    requests: int
+    stream: bool = False  # Endless response: timed to its first chunk, then closed
+
+
+async def upload_stub(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Keep-alive upstream for image uploads that drains each body and answers 200."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+                + str(len(UPLOAD_RESPONSE)).encode() + b"\r\n\r\n" + UPLOAD_RESPONSE
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def seed(db, tenants: int, services: int, bookings: int, rng: random.Random):
+    service_collection = db["services"]
+    booking_collection = db["bookings"]
+    if (
+        await service_collection.count_documents({}) == services
+        and await booking_collection.estimated_document_count() == bookings
+    ):
+        print(f"seed: reusing {services} services and {bookings} bookings")
+        return
+
+    await service_collection.delete_many({})
+    await booking_collection.delete_many({})
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    service_docs = [
+        {
+            "_id": ObjectId(),
+            "name": f"Service {i}",
+            "description": f"Benchmark service {i}",
+            "duration": rng.choice([15, 30, 45, 60, 90]),
+            "price": float(rng.randint(10, 200)),
+            "capacity": rng.choice([1, 1, 1, 2, 4]),
+            "photos": [f"https://cdn.example.com/services/{i}.png"],
+            "videos": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(services)
+    ]
+    await service_collection.insert_many(service_docs)
+    service_ids = [doc["_id"] for doc in service_docs]
+
+    from utils.search_keys import name_key, normalize_phone
+
+    # Bookings spread over the last and next 90 days, in half-hour steps
+    started = time.perf_counter()
+    window = 180 * 48
+    for offset in range(0, bookings, SEED_BATCH):
+        batch = []
+        for i in range(offset, min(offset + SEED_BATCH, bookings)):
+            created = now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+            customer_name = f"Customer {rng.randint(0, bookings // 3)}"
+            phone_no = f"09{rng.randint(0, 99999999):08d}"
+            batch.append({
+                "_id": ObjectId(),
+                "customer_name": customer_name,
+                "phone_no": phone_no,
+                "phone_e164": normalize_phone(phone_no),
+                "name_key": name_key(customer_name),
+                "service_id": rng.choice(service_ids),
+                "appointment_time": now - timedelta(days=90) + timedelta(minutes=30 * rng.randrange(window)),
+                "status": rng.choice(STATUSES),
+                "notes": None,
+                "tenant_id": f"tenant-{rng.randrange(tenants):03d}",
+                "booking_number": f"BK-BENCH-{i:09d}",
+                "created_at": created,
+                "updated_at": created,
+            })
+        await booking_collection.insert_many(batch, ordered=False)
+        done = offset + len(batch)
+        if done % (SEED_BATCH * 50) == 0 or done == bookings:
+            print(f"seed: {done}/{bookings} bookings ({time.perf_counter() - started:.0f}s)")
+
+
+async def sample(db, tenants: int) -> dict:
+    """Ids and keys the request builders pick from."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    services = await db["services"].find({}, {"_id": 1}).limit(200).to_list(length=200)
+    bookings = await db["bookings"].find({}, {"_id": 1}).limit(500).to_list(length=500)
+    future = await db["bookings"].find(
+        {"appointment_time": {"$gt": now + timedelta(days=1)}, "status": {"$ne": "canceled"}}
+    ).limit(500).to_list(length=500)
+    return {
+        "tenants": [f"tenant-{i:03d}" for i in range(tenants)],
+        "services": [str(doc["_id"]) for doc in services],
+        "bookings": [str(doc["_id"]) for doc in bookings],
+        "future": future,
+    }
+
+
+def build_cases(api: str, data: dict, requests: int, rng: random.Random) -> Tuple[List[Case], List[str], List[str]]:
+    """One case per route; write routes work on their own run-scoped tenant and services."""
+    run = uuid.uuid4().hex[:8]
+    write_tenant = f"bench-{run}"
+    # Far-future slots nobody else books, one per write request
+    base_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=400)
+    created_services: List[str] = []
+    created_bookings: List[str] = []
+    day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    bulk_size = 100
+    bulk_requests = max(1, requests // 20)
+
+    def pick(values):
+        return values[rng.randrange(len(values))]
+
+    def service_payload(i: int) -> dict:
+        return {
+            "name": f"Bench service {run}-{i}",
+            "description": "Created by the endpoint benchmark",
+            "duration": 30,
+            "price": 25.0,
+        }
+
+    def booking_payload(i: int, service_id: str) -> dict:
+        return {
+            "customer_name": f"Bench customer {i}",
+            "phone_no": f"08{i:08d}",
+            "service_id": service_id,
+            "appointment_time": (base_time + timedelta(minutes=60 * i)).isoformat(),
+            "tenant_id": write_tenant,
+        }
+
+    def future_update(i: int) -> dict:
+        booking = data["future"][i % len(data["future"])]
+        appointment_time = booking["appointment_time"].replace(tzinfo=timezone.utc)
+        return {
+            "customer_name": booking["customer_name"],
+            "phone_no": booking["phone_no"],
+            "service_id": str(booking["service_id"]),
+            "appointment_time": appointment_time.isoformat(),
+            "tenant_id": booking["tenant_id"],
+            "notes": f"bench update {i}",
+            "status": booking["status"],
+        }
+
+    def list_services(i):
+        return "GET", f"{api}/biz-services", {"params": {"skip": rng.randrange(5) * 20, "limit": 20}}
+
+    def list_services_cursor(i):
+        return "GET", f"{api}/biz-services", {"params": {"cursor": "", "limit": 50, "view": "summary"}}
+
+    def get_service(i):
+        return "GET", f"{api}/biz-services{pick(data['services'])}", {}
+
+    def create_service(i):
+        return "POST", f"{api}/biz-services/new", {"json": service_payload(i)}
+
+    def update_service(i):
+        return "PUT", f"{api}/biz-services/{pick(created_services)}", {"json": {"price": 30.0 + i % 10}}
+
+    def upload_image(i):
+        return "POST", f"{api}/biz-services/image/upload", {
+            "data": {"category": "bench"},
+            "files": [("files", ("bench.png", PNG_BYTES, "image/png"))],
+        }
+
+    def upload_images_each(i):
+        return "POST", f"{api}/biz-services/image/upload/each", {
+            "data": {"category": "bench"},
+            "files": [("files", (f"bench-{n}.png", PNG_BYTES, "image/png")) for n in range(4)],
+        }
+
+    def list_bookings(i):
+        return "GET", f"{api}/bookings", {"params": {"skip": rng.randrange(10) * 100, "limit": 100}}
+
+    def list_bookings_cursor(i):
+        return "GET", f"{api}/bookings", {"params": {"cursor": "", "limit": 100, "tenant_id": pick(data["tenants"])}}
+
+    def list_bookings_expanded(i):
+        return "GET", f"{api}/bookings", {"params": {"cursor": "", "limit": 100, "tenant_id": pick(data["tenants"]), "expand": "service"}}
+
+    def search_by_phone(i):
+        return "GET", f"{api}/bookings/search", {"params": {"tenant_id": pick(data["tenants"]), "phone": f"09{rng.randrange(100):02d}"}}
+
+    def search_by_name(i):
+        return "GET", f"{api}/bookings/search", {"params": {"tenant_id": pick(data["tenants"]), "name": f"customer {rng.randrange(100)}"}}
+
+    def list_bookings_summary(i):
+        return "GET", f"{api}/bookings", {
+            "params": {"cursor": "", "limit": 100, "tenant_id": pick(data["tenants"]), "view": "summary"}
+        }
+
+    def availability(i):
+        start = day + timedelta(days=rng.randrange(7))
+        return "GET", f"{api}/bookings/availability", {"params": {
+            "service_id": pick(data["services"]),
+            "tenant_id": pick(data["tenants"]),
+            "start": start.isoformat(),
+            "end": (start + timedelta(days=7)).isoformat(),
+        }}
+
+    def export(i):
+        start = day - timedelta(days=rng.randrange(30))
+        return "GET", f"{api}/bookings/export", {"params": {
+            "tenant_id": pick(data["tenants"]),
+            "start": start.isoformat(),
+            "end": (start + timedelta(days=1)).isoformat(),
+        }}
+
+    def stats(i):
+        start = day - timedelta(days=rng.randrange(90))
+        return "GET", f"{api}/bookings/stats", {"params": {
+            "tenant_id": pick(data["tenants"]),
+            "start": start.date().isoformat(),
+            "end": (start + timedelta(days=30)).date().isoformat(),
+        }}
+
+    def feed(i):
+        return "GET", f"{api}/bookings/feed", {"params": {"tenant_id": pick(data["tenants"])}}
+
+    def get_booking(i):
+        return "GET", f"{api}/bookings/{pick(data['bookings'])}", {}
+
+    def multi_get_bookings(i):
+        return "POST", f"{api}/bookings/multi-get", {"json": {"ids": data["bookings"]}}
+
+    def multi_get_services(i):
+        return "POST", f"{api}/biz-services/multi-get", {"json": {"ids": data["services"]}}
+
+    def create_booking(i):
+        return "POST", f"{api}/bookings/new", {"json": booking_payload(i, created_services[0])}
+
+    def bulk_create(i):
+        first = requests + i * bulk_size
+        items = [booking_payload(first + n, created_services[0]) for n in range(bulk_size)]
+        return "POST", f"{api}/bookings/bulk", {"json": {"items": items}}
+
+    def update_booking(i):
+        return "PUT", f"{api}/bookings/{data['future'][i % len(data['future'])]['_id']}", {"json": future_update(i)}
+
+    def delete_booking(i):
+        return "DELETE", f"{api}/bookings/{created_bookings[i % len(created_bookings)]}", {}
+
+    def delete_service(i):
+        return "DELETE", f"{api}/biz-services/{created_services[i % len(created_services)]}", {}
+
+    cases = [
+        Case("GET /biz-services", list_services, requests),
+        Case("GET /biz-services?cursor", list_services_cursor, requests),
+        Case("GET /biz-services{id}", get_service, requests),
+        Case("POST /biz-services/multi-get", multi_get_services, requests),
+        Case("POST /biz-services/new", create_service, requests),
+        Case("PUT /biz-services/{id}", update_service, requests),
+        Case("POST /biz-services/image/upload", upload_image, requests),
+        Case("POST /biz-services/image/upload/each", upload_images_each, max(1, requests // 10)),
+        Case("GET /bookings", list_bookings, requests),
+        Case("GET /bookings?cursor", list_bookings_cursor, requests),
+        Case("GET /bookings?view=summary", list_bookings_summary, requests),
+        Case("GET /bookings?expand=service", list_bookings_expanded, requests),
+        Case("GET /bookings/search?phone", search_by_phone, requests),
+        Case("GET /bookings/search?name", search_by_name, requests),
+        Case("GET /bookings/availability", availability, requests),
+        Case("GET /bookings/export", export, max(1, requests // 10)),
+        Case("GET /bookings/stats", stats, requests),
+        Case("GET /bookings/feed", feed, max(1, requests // 10), stream=True),
+        Case("GET /bookings/{id}", get_booking, requests),
+        Case("POST /bookings/multi-get", multi_get_bookings, max(1, requests // 10)),
+        Case("POST /bookings/new", create_booking, requests),
+        Case("POST /bookings/bulk", bulk_create, bulk_requests),
+        Case("PUT /bookings/{id}", update_booking, requests if data["future"] else 0),
+        Case("DELETE /bookings/{id}", delete_booking, requests),
+        Case("DELETE /biz-services/{id}", delete_service, requests),
+    ]
+    return cases, created_services, created_bookings
+
+
+async def run_case(client: httpx.AsyncClient, case: Case, concurrency: int, created: Optional[List[str]]) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        method, path, kwargs = case.build(i)
+        # x-request-id doubles as the idempotency key of create routes, so every request needs its own
+        kwargs["headers"] = {"x-request-id": f"bench-{case.name}-{i}-{uuid.uuid4().hex[:8]}"}
+        async with semaphore:
+            started = time.perf_counter()
+            if case.stream:
+                async with client.stream(method, path, **kwargs) as response:
+                    async for _ in response.aiter_raw():
+                        break
+            else:
+                response = await client.request(method, path, **kwargs)
+                await response.aread()
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+        elif created is not None:
+            created.append(response.json()["payload"]["id"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(case.requests)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": case.requests,
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)], 3),
+        "rps": round(case.requests / elapsed, 1),
+    }
+
+
+async def run_suite(client: httpx.AsyncClient, api: str, data: dict, requests: int, concurrency: int, rng: random.Random, streaming: bool = True) -> Dict[str, dict]:
+    cases, created_services, created_bookings = build_cases(api, data, requests, rng)
+    results = {}
+    for case in cases:
+        if not case.requests or (case.stream and not streaming):
+            continue
+        # Creates feed the ids later update/delete cases work on
+        created = None
+        if case.name == "POST /biz-services/new":
+            created = created_services
+        elif case.name == "POST /bookings/new":
+            created = created_bookings
+        result = await run_case(client, case, concurrency, created)
+        results[case.name] = result
+        print(
+            f"  {case.name:<34} p50={result['p50_ms']:8.3f}ms p99={result['p99_ms']:8.3f}ms "
+            f"rps={result['rps']:9.1f} errors={result['errors']}"
+        )
+    return results
+
+
+def compare(results: Dict[str, Dict[str, dict]], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)["results"]
+    regressions = []
+    for transport, routes in results.items():
+        for name, result in routes.items():
+            recorded = baseline.get(transport, {}).get(name)
+            if recorded and result["rps"] < recorded["rps"] * (1 - threshold):
+                regressions.append(
+                    f"{transport} {name}: {result['rps']} rps vs baseline {recorded['rps']} rps"
+                )
+    return regressions
+
+
+async def main(args) -> int:
+    rng = random.Random(args.seed)
+    upstream = await asyncio.start_server(upload_stub, "127.0.0.1", 0)
+    os.environ["UPLOAD_SERVICE_URL"] = f"http://127.0.0.1:{upstream.sockets[0].getsockname()[1]}/upload"
+
+    import core.database as database
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("--in-memory needs mongomock-motor: pip install mongomock-motor", file=sys.stderr)
+            return 2
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[os.environ["DB_NAME"]]
+
+    import uvicorn
+    from core.http_client import close_http_client, init_http_client
+    from main import API_VERSION, app
+
+    if args.reseed:
+        bench_db = database.get_db()
+        await database.client.drop_database(bench_db.name)
+    await database.init_db()
+    await init_http_client()
+    if not args.skip_seed:
+        await seed(database.db, args.tenants, args.services, args.bookings, rng)
+    data = await sample(database.db, args.tenants)
+    headers = {"x-request-id": "bench"}
+
+    results: Dict[str, Dict[str, dict]] = {}
+    if args.transport in ("asgi", "both"):
+        print("asgi transport")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            # ASGITransport buffers whole responses, so the endless feed only runs over uvicorn
+            results["asgi"] = await run_suite(client, API_VERSION, data, args.requests, args.concurrency, rng, streaming=False)
+
+    if args.transport in ("uvicorn", "both"):
+        # Lifespan already ran above; the server shares this process and event loop
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, lifespan="off", log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        print(f"uvicorn on port {port}")
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers, limits=limits) as client:
+            results["uvicorn"] = await run_suite(client, API_VERSION, data, args.requests, args.concurrency, rng)
+        server.should_exit = True
+        await serving
+
+    await close_http_client()
+    upstream.close()
+
+    report = {
+        "meta": {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "tenants": args.tenants,
+            "services": args.services,
+            "bookings": args.bookings,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "in_memory": args.in_memory,
+        },
+        "results": results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        if regressions:
+            print(f"throughput regressions beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no route dropped more than {args.threshold:.0%} below {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=100000, help="5000000 for production-sized runs")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--transport", choices=["asgi", "uvicorn", "both"], default="both")
+    parser.add_argument("--port", type=int, default=0, help="uvicorn port, 0 picks a free one")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed for data and request mix")
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--reseed", action="store_true", help="Drop the benchmark database first")
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="Fail when rps drops past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed rps drop as a fraction")
+    sys.exit(asyncio.run(main(parser.parse_args())))
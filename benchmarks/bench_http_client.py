@@ -0,0 +1,79 @@
+"""Latency of upstream calls: a client per call vs the shared pooled client.
+
+Runs against a local keep-alive stub server, no external services needed:
+
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from core.http_client import create_http_client
+
+BODY = b'{"id": "user-1", "name": "Stub User"}'
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+    + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+)
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_case(name: str, call, url: str, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name:<22} p50={statistics.median(latencies):7.3f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:7.3f}ms "
+        f"rps={requests / elapsed:9.1f}"
+    )
+
+
+async def main(requests: int, concurrency: int):
+    server = await asyncio.start_server(handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/users/user-1"
+
+    async def client_per_call(target: str):
+        async with httpx.AsyncClient() as client:
+            (await client.get(target)).json()
+
+    shared = create_http_client()
+
+    async def shared_client(target: str):
+        (await shared.get(target)).json()
+
+    async with server:
+        await run_case("client per call", client_per_call, url, requests, concurrency)
+        await run_case("shared pooled client", shared_client, url, requests, concurrency)
+    await shared.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,107 @@
+"""Per-request overhead of the middleware stack: BaseHTTPMiddleware hook vs pure ASGI.
+
+Calls a trivial endpoint through each stack with hand-built ASGI messages, so
+the numbers contain no network, client or database time:
+
+    python -m benchmarks.bench_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from fastapi import FastAPI, Request
+from core.metrics import observe_request
+from core.middleware import CORSOnErrorMiddleware, RequestIdMiddleware, TimingMiddleware
+from utils.response import create_response
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"bench"), (b"x-request-id", b"bench"), (b"origin", b"http://localhost:3000")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("bench", 80),
+}
+
+
+def legacy_app() -> FastAPI:
+    """The previous app.middleware("http") hook, doing the same work as the ASGI stack."""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def request_id_middleware(request: Request, call_next):
+        request_id = request.headers.get("x-request-id")
+        request.state.request_id = request_id
+        started = time.perf_counter()
+        response = await call_next(request)
+        observe_request(request.scope, response.status_code, time.perf_counter() - started)
+        response.headers["x-request-id"] = request_id
+        return response
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return create_response({"pong": True}, request_id=request.state.request_id)
+
+    return app
+
+
+def asgi_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(CORSOnErrorMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return create_response({"pong": True})
+
+    return app
+
+
+async def call(app, latencies: list):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    await app(dict(SCOPE, headers=list(SCOPE["headers"])), receive, send)
+    latencies.append((time.perf_counter() - started) * 1_000_000)
+
+
+async def run_case(name: str, app, requests: int) -> float:
+    # Warm up routing, validation and the metrics label cache
+    for _ in range(200):
+        await call(app, [])
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, latencies)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    mean = elapsed / requests * 1_000_000
+    print(
+        f"{name:<22} mean={mean:7.1f}us p50={statistics.median(latencies):7.1f}us "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:7.1f}us rps={requests / elapsed:9.1f}"
+    )
+    return mean
+
+
+async def main(requests: int):
+    legacy = await run_case("BaseHTTPMiddleware", legacy_app(), requests)
+    pure = await run_case("pure ASGI stack", asgi_app(), requests)
+    print(f"saving per request: {legacy - pure:.1f}us ({(legacy - pure) / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,105 @@
+"""Serialization cost of a 1000-row bookings page: current path vs fast path.
+
+Seeds a scratch database (BENCH_DB_NAME, default booking_bench) on the
+configured MongoDB and times both read paths end to end:
+
+    python -m benchmarks.bench_serialization --rows 1000 --rounds 20
+
+--in-memory swaps MongoDB for mongomock-motor, as in bench_endpoints. Its
+reads are in-process copies, so the timings isolate serialization cost and
+leave out network and BSON decoding time.
+"""
+import os
+
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "booking_bench")
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from beanie import PydanticObjectId
+from fastapi.encoders import jsonable_encoder
+import core.database as database
+from models.appointment import Appointment
+from schemas.appointment import AppointmentOut
+from utils.fast_json import RowEncoder, dumps, find_rows
+from utils.response import create_pagination_response
+
+TENANT = "bench-serialization"
+
+
+async def seed(rows: int):
+    collection = Appointment.get_motor_collection()
+    await collection.delete_many({"tenant_id": TENANT})
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    service_id = PydanticObjectId()
+    await Appointment.insert_many([
+        Appointment(
+            customer_name=f"Customer {i}",
+            phone_no=f"09{i:08d}",
+            service_id=service_id,
+            tenant_id=TENANT,
+            appointment_time=start + timedelta(minutes=30 * i),
+            notes="Seeded for the serialization benchmark",
+        )
+        for i in range(rows)
+    ])
+
+
+async def current_path(rows: int) -> bytes:
+    appointments = await Appointment.find({"tenant_id": TENANT}).sort([("_id", 1)]).limit(rows).to_list()
+    content = [AppointmentOut.from_orm(appt) for appt in appointments]
+    body = create_pagination_response(content=content, total_elements=rows, page=0, size=rows, request_id="bench")
+    # What JSONResponse does with an endpoint's return value
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+async def fast_path(rows: int, encoder: RowEncoder) -> bytes:
+    content = await find_rows(Appointment, encoder, {"tenant_id": TENANT}, [("_id", 1)], limit=rows)
+    body = create_pagination_response(content=content, total_elements=rows, page=0, size=rows, request_id="bench")
+    return dumps(body)
+
+
+async def measure(name: str, call, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{name:<14} mean={statistics.mean(timings):8.2f}ms p50={statistics.median(timings):8.2f}ms min={min(timings):8.2f}ms")
+    return statistics.median(timings)
+
+
+async def main(rows: int, rounds: int, in_memory: bool = False) -> int:
+    if in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("--in-memory needs mongomock-motor: pip install mongomock-motor", file=sys.stderr)
+            return 2
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[os.environ["DB_NAME"]]
+    await database.init_db()
+    await seed(rows)
+    encoder = RowEncoder(AppointmentOut)
+
+    # Both paths must produce the same JSON document
+    assert json.loads(await current_path(rows)) == json.loads(await fast_path(rows, encoder))
+
+    current = await measure("current path", lambda: current_path(rows), rounds)
+    fast = await measure("fast path", lambda: fast_path(rows, encoder), rounds)
+    print(f"speed-up: {current / fast:.1f}x on {rows}-row pages")
+    await Appointment.get_motor_collection().delete_many({"tenant_id": TENANT})
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--in-memory", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.rows, args.rounds, args.in_memory)))
@@ -0,0 +1,151 @@
+"""Noisy-neighbour load test for admission control.
+
+One tenant floods the API with exports and list pages from many concurrent
+workers and ignores Retry-After. A handful of well-behaved tenants read at a
+steady rate. The same load runs twice, with admission control off and then
+on, and the well-behaved tenants' latency and the noisy tenant's outcomes are
+reported for each run:
+
+    python -m benchmarks.load_admission --duration 20 --noisy-workers 200
+
+Uses the bench_endpoints data set (BENCH_DB_NAME); --in-memory runs against
+mongomock-motor, where the database work blocks the event loop, so the
+numbers only show queueing in the process and not pool contention.
+"""
+import os
+
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "booking_bench")
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List
+import httpx
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[max(0, int(len(values) * fraction) - 1)] if values else 0.0
+
+
+async def noisy_worker(client: httpx.AsyncClient, api: str, tenant: str, stop: asyncio.Event, outcomes: Counter, rng: random.Random):
+    """Export or list as fast as responses come back, whatever the status."""
+    while not stop.is_set():
+        if rng.random() < 0.3:
+            path, params = f"{api}/bookings/export", {"tenant_id": tenant, "batch_size": 1000}
+        else:
+            path, params = f"{api}/bookings", {"tenant_id": tenant, "cursor": "", "limit": 500}
+        response = await client.get(path, params=params, headers={"x-request-id": uuid.uuid4().hex})
+        await response.aread()
+        outcomes[response.status_code] += 1
+        if response.status_code >= 400:
+            # Still no backoff, only a yield so the loop is not spun on rejections
+            await asyncio.sleep(0)
+
+
+async def polite_tenant(client: httpx.AsyncClient, api: str, tenant: str, bookings: List[str], rps: float, stop: asyncio.Event, latencies: List[float], outcomes: Counter, rng: random.Random):
+    """Alternate cursor pages and booking reads at a fixed rate.
+
+    Latency counts from when a request was due, not when it was sent, so a
+    stalled process shows up in the numbers instead of hiding as fewer requests.
+    """
+    interval = 1 / rps
+    next_at = time.perf_counter()
+    while not stop.is_set():
+        if rng.random() < 0.5:
+            path, params = f"{api}/bookings", {"tenant_id": tenant, "cursor": "", "limit": 50}
+        else:
+            path, params = f"{api}/bookings/{rng.choice(bookings)}", {}
+        response = await client.get(path, params=params, headers={"x-request-id": uuid.uuid4().hex, "x-tenant-id": tenant})
+        await response.aread()
+        latencies.append((time.perf_counter() - next_at) * 1000)
+        outcomes[response.status_code] += 1
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+async def run_phase(client: httpx.AsyncClient, api: str, data: dict, args, rng: random.Random) -> Dict[str, object]:
+    stop = asyncio.Event()
+    noisy_outcomes: Counter = Counter()
+    polite_outcomes: Counter = Counter()
+    latencies: List[float] = []
+    noisy_tenant, polite_tenants = data["tenants"][0], data["tenants"][1:args.polite_tenants + 1]
+    tasks = [
+        asyncio.create_task(noisy_worker(client, api, noisy_tenant, stop, noisy_outcomes, rng))
+        for _ in range(args.noisy_workers)
+    ] + [
+        asyncio.create_task(polite_tenant(client, api, tenant, data["bookings"], args.polite_rps, stop, latencies, polite_outcomes, rng))
+        for tenant in polite_tenants
+    ]
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "polite_requests": len(latencies),
+        "polite_p50_ms": round(statistics.median(latencies), 1) if latencies else 0.0,
+        "polite_p99_ms": round(percentile(latencies, 0.99), 1),
+        "polite_max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "polite_status": dict(polite_outcomes),
+        "noisy_status": dict(noisy_outcomes),
+    }
+
+
+async def main(args) -> int:
+    rng = random.Random(args.seed)
+    import core.database as database
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("--in-memory needs mongomock-motor: pip install mongomock-motor", file=sys.stderr)
+            return 2
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[os.environ["DB_NAME"]]
+
+    from benchmarks.bench_endpoints import sample, seed
+    from core.admission import admission
+    from main import API_VERSION, app
+
+    await database.init_db()
+    if not args.skip_seed:
+        await seed(database.db, args.tenants, args.services, args.bookings, rng)
+    data = await sample(database.db, args.tenants)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        for enabled in (False, True):
+            admission.enabled = enabled
+            print(f"admission {'on' if enabled else 'off'}: {args.noisy_workers} noisy workers, "
+                  f"{args.polite_tenants} tenants at {args.polite_rps} rps for {args.duration}s")
+            result = await run_phase(client, API_VERSION, data, args, rng)
+            print(
+                f"  well-behaved: {result['polite_requests']} requests p50={result['polite_p50_ms']}ms "
+                f"p99={result['polite_p99_ms']}ms max={result['polite_max_ms']}ms status={result['polite_status']}"
+            )
+            print(f"  noisy tenant: status={result['noisy_status']} over {result['elapsed_s']}s")
+            # Let the buckets refill before the next phase
+            await asyncio.sleep(1)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per phase")
+    parser.add_argument("--noisy-workers", type=int, default=200)
+    parser.add_argument("--polite-tenants", type=int, default=10)
+    parser.add_argument("--polite-rps", type=float, default=5, help="Requests per second per well-behaved tenant")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--in-memory", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,236 @@
+"""Admission control for the database-bound API routes.
+
+Each tenant gets a token bucket, so one tenant's export or bulk sync cannot
+take the whole request budget. A global in-flight limit keeps the total
+below what the Motor pool can serve. Requests over either limit fail fast
+with 429 or 503 and a Retry-After header instead of queueing without bound.
+Only a short, bounded wait is allowed for a free in-flight slot.
+
+Requests name their tenant with the tenant_id parameter or the x-tenant-id
+header. Requests with neither, which is every client that predates the
+header, are charged to one shared bucket with its own, larger limits.
+"""
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+from dotenv import load_dotenv
+import asyncio
+import math
+import os
+import time
+from core.metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT, register_admission
+
+# Load environment variables
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+# Requests executing at once across all tenants; keep it near DB_MAX_POOL_SIZE
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '100'))
+# Requests allowed to wait for a free slot, and for how long, before 503
+ADMISSION_MAX_WAITING = int(os.getenv('ADMISSION_MAX_WAITING', '100'))
+ADMISSION_WAIT_TIMEOUT = float(os.getenv('ADMISSION_WAIT_TIMEOUT', '0.25'))
+ADMISSION_RETRY_AFTER = float(os.getenv('ADMISSION_RETRY_AFTER', '1'))
+# Per tenant: sustained requests per second, burst size, and share of the in-flight slots
+ADMISSION_TENANT_RATE = float(os.getenv('ADMISSION_TENANT_RATE', '50'))
+ADMISSION_TENANT_BURST = float(os.getenv('ADMISSION_TENANT_BURST', '100'))
+ADMISSION_TENANT_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_TENANT_MAX_IN_FLIGHT', '25'))
+# The shared bucket of requests that name no tenant
+ADMISSION_SHARED_RATE = float(os.getenv('ADMISSION_SHARED_RATE', '500'))
+ADMISSION_SHARED_BURST = float(os.getenv('ADMISSION_SHARED_BURST', '1000'))
+ADMISSION_SHARED_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_SHARED_MAX_IN_FLIGHT', str(ADMISSION_MAX_IN_FLIGHT)))
+# Idle buckets beyond this many tenants are forgotten, least recently used first
+ADMISSION_MAX_TENANTS = int(os.getenv('ADMISSION_MAX_TENANTS', '10000'))
+
+API_VERSION = os.getenv('API_VERSION', '/api/v1')
+
+# Tokens a request costs, by path suffix; everything else costs 1
+ROUTE_COSTS = {
+    "/bookings/export": 10,
+    "/bookings/bulk": 10,
+    "/bookings/multi-get": 5,
+    "/biz-services/multi-get": 2,
+}
+# Key of the shared bucket; no real tenant id has angle brackets
+SHARED_TENANT = "<shared>"
+
+# Long-lived streams that hold no pool connection while idle
+EXEMPT_SUFFIXES = ("/bookings/feed",)
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """Take `cost` tokens; returns 0 on success, otherwise the seconds until they are available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class AdmissionController:
+    """Per-tenant token buckets and in-flight counts plus a global in-flight limit.
+
+    Single event loop only: state is changed without locks between awaits.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_waiting: int = ADMISSION_MAX_WAITING,
+        wait_timeout: float = ADMISSION_WAIT_TIMEOUT,
+        tenant_rate: float = ADMISSION_TENANT_RATE,
+        tenant_burst: float = ADMISSION_TENANT_BURST,
+        tenant_max_in_flight: int = ADMISSION_TENANT_MAX_IN_FLIGHT,
+        shared_rate: float = ADMISSION_SHARED_RATE,
+        shared_burst: float = ADMISSION_SHARED_BURST,
+        shared_max_in_flight: int = ADMISSION_SHARED_MAX_IN_FLIGHT,
+        max_tenants: int = ADMISSION_MAX_TENANTS,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst
+        self.tenant_max_in_flight = tenant_max_in_flight
+        self.shared_rate = shared_rate
+        self.shared_burst = shared_burst
+        self.shared_max_in_flight = shared_max_in_flight
+        self.max_tenants = max_tenants
+        self.enabled = enabled
+        self.in_flight = 0
+        self.tenant_in_flight: Dict[str, int] = {}
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def _bucket(self, tenant: str) -> TokenBucket:
+        bucket = self.buckets.get(tenant)
+        if bucket is None:
+            if tenant == SHARED_TENANT:
+                bucket = TokenBucket(self.shared_rate, self.shared_burst)
+            else:
+                bucket = TokenBucket(self.tenant_rate, self.tenant_burst)
+            self.buckets[tenant] = bucket
+            while len(self.buckets) > self.max_tenants:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(tenant)
+        return bucket
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: float) -> Rejected:
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return Rejected(status_code, reason, detail, retry_after)
+
+    async def acquire(self, tenant: str, cost: float = 1):
+        """Admit one request of `tenant` or raise Rejected; every admitted request must call release()."""
+        bucket = self._bucket(tenant)
+        wait = bucket.take(cost)
+        if wait:
+            raise self._reject(429, "tenant_rate", "Rate limit exceeded for this tenant", wait)
+        max_in_flight = self.shared_max_in_flight if tenant == SHARED_TENANT else self.tenant_max_in_flight
+        if self.tenant_in_flight.get(tenant, 0) >= max_in_flight:
+            bucket.refund(cost)
+            raise self._reject(429, "tenant_concurrency", "Too many concurrent requests for this tenant", ADMISSION_RETRY_AFTER)
+
+        if self.in_flight < self.max_in_flight and not self.waiting:
+            self.in_flight += 1
+            self._enter(tenant)
+        else:
+            if self.waiting >= self.max_waiting:
+                bucket.refund(cost)
+                raise self._reject(503, "overloaded", "Service is overloaded, retry later", ADMISSION_RETRY_AFTER)
+            # Waiting requests count against their tenant's share as well
+            self._enter(tenant)
+            # release() hands its slot straight to the oldest waiter
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(waiter, self.wait_timeout)
+            except asyncio.TimeoutError:
+                self._leave(tenant)
+                bucket.refund(cost)
+                raise self._reject(503, "overloaded", "Service is overloaded, retry later", ADMISSION_RETRY_AFTER)
+            except asyncio.CancelledError:
+                self._leave(tenant)
+                if waiter.done() and not waiter.cancelled():
+                    # The slot arrived together with the cancellation: pass it on
+                    self._pass_slot()
+                raise
+            finally:
+                ADMISSION_WAIT.observe(time.perf_counter() - started)
+
+    def release(self, tenant: str):
+        self._leave(tenant)
+        self._pass_slot()
+
+    def _enter(self, tenant: str):
+        self.tenant_in_flight[tenant] = self.tenant_in_flight.get(tenant, 0) + 1
+
+    def _leave(self, tenant: str):
+        remaining = self.tenant_in_flight.get(tenant, 0) - 1
+        if remaining > 0:
+            self.tenant_in_flight[tenant] = remaining
+        else:
+            self.tenant_in_flight.pop(tenant, None)
+
+    def _pass_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "tenants": len(self.buckets),
+            "tenant_in_flight": dict(self.tenant_in_flight),
+        }
+
+
+def applies(path: str) -> bool:
+    return path.startswith(API_VERSION) and not path.endswith(EXEMPT_SUFFIXES)
+
+
+def route_cost(path: str) -> float:
+    for suffix, cost in ROUTE_COSTS.items():
+        if path.endswith(suffix):
+            return cost
+    return 1
+
+
+admission = AdmissionController()
+register_admission(admission)
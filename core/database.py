@@ -1,9 +1,16 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from beanie.odm.utils.init import Initializer
+from pymongo.errors import OperationFailure
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import importlib.util
+import json
 import os
 import logging
 from dotenv import load_dotenv
+from core.metrics import mongo_event_listeners
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,62 +19,227 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Create MongoDB client
 from models.service import Service
 from models.appointment import Appointment
-# Handle both local (no auth) and production (with auth) connections
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
+from models.slot_claim import SlotClaim
+from models.counter import Counter
+from models.booking_rollup import BookingRollup
+from models.idempotency_record import IdempotencyRecord
 
-if db_user and db_password:
-    client = AsyncIOMotorClient(
-        f"mongodb://{db_user}:{db_password}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/"
+DOCUMENT_MODELS = [Service, Appointment, SlotClaim, Counter, BookingRollup, IdempotencyRecord]
+
+# Connection pool, timeouts and wire compression
+DB_MAX_POOL_SIZE = int(os.getenv('DB_MAX_POOL_SIZE', '100'))
+DB_MIN_POOL_SIZE = int(os.getenv('DB_MIN_POOL_SIZE', '10'))
+DB_MAX_IDLE_TIME_MS = int(os.getenv('DB_MAX_IDLE_TIME_MS', '300000'))
+DB_CONNECT_TIMEOUT_MS = int(os.getenv('DB_CONNECT_TIMEOUT_MS', '5000'))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+DB_SOCKET_TIMEOUT_MS = int(os.getenv('DB_SOCKET_TIMEOUT_MS', '30000'))
+DB_COMPRESSORS = os.getenv('DB_COMPRESSORS', 'zstd,snappy,zlib')
+
+# Collection and index setup is skipped while the stored fingerprint matches the models
+SCHEMA_META_COLLECTION = "schema_meta"
+SCHEMA_META_ID = "document_models"
+
+# Indexes earlier versions of the models declared; Beanie only adds indexes
+# (allow_index_dropping would also drop ones created by hand), so these are dropped by name
+OBSOLETE_INDEXES = {
+    Appointment: [
+        "tenant_time_id",  # Replaced by tenant_time_id_summary
+        "customer_name_1",  # Search moved to tenant_name_time / tenant_phone_time
+        "phone_no_1",
+    ],
+}
+
+# Unique indexes legacy data can violate, and the command that repairs that data
+UNIQUE_INDEX_REPAIRS = {
+    Appointment: "python -m services.booking_number_service --renumber-duplicates",
+}
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+# Python packages pymongo needs for each wire compressor; zlib is in the standard library
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
+ready = False
+
+
+def available_compressors() -> List[str]:
+    compressors = []
+    for name in [name.strip() for name in DB_COMPRESSORS.split(",") if name.strip()]:
+        module = COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+        else:
+            logger.warning(f"Wire compressor {name} is not available; skipping it")
+    return compressors
+
+
+def create_client() -> AsyncIOMotorClient:
+    # Handle both local (no auth) and production (with auth) connections
+    db_user = os.getenv('DB_USER')
+    db_password = os.getenv('DB_PASSWORD')
+    credentials = f"{db_user}:{db_password}@" if db_user and db_password else ""
+    options = {}
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return AsyncIOMotorClient(
+        f"mongodb://{credentials}{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/",
+        maxPoolSize=DB_MAX_POOL_SIZE,
+        minPoolSize=DB_MIN_POOL_SIZE,
+        maxIdleTimeMS=DB_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=DB_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=DB_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=DB_SOCKET_TIMEOUT_MS,
+        event_listeners=mongo_event_listeners(),
+        **options
     )
-else:
-    client = AsyncIOMotorClient(f"mongodb://{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/")
 
-# Get database
-db = client[os.getenv('DB_NAME', 'automation_crm')]
+
+def connect_db() -> AsyncIOMotorDatabase:
+    """Build the client on first use; no I/O happens until the first command."""
+    global client, db
+    if db is None:
+        if client is None:
+            client = create_client()
+        db = client[os.getenv('DB_NAME', 'automation_crm')]
+    return db
+    return db
+
+
+def schema_fingerprint() -> str:
+    """Hash of every model's collection name and declared indexes."""
+    spec = []
+    for model in DOCUMENT_MODELS:
+        indexes = [getattr(index, "document", index) for index in getattr(model.Settings, "indexes", [])]
+        spec.append([model.__name__, model.Settings.name, indexes])
+    # Listing another obsolete index triggers a sync as well
+    spec.append([[model.__name__, names] for model, names in OBSOLETE_INDEXES.items()])
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SchemaMigrationError(RuntimeError):
+    """Stored data violates a declared unique index; it has to be repaired before startup."""
+
+
+class SchemaInitializer(Initializer):
+    """Beanie initializer that only syncs indexes when the schema changed."""
+
+    def __init__(self, *args, sync_indexes: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sync_indexes = sync_indexes
+
+    async def init_indexes(self, cls, allow_index_dropping: bool = False):
+        if not self.sync_indexes:
+            return
+        try:
+            await super().init_indexes(cls, allow_index_dropping)
+        except OperationFailure as e:
+            if e.code not in DUPLICATE_KEY_CODES:
+                raise
+            # Every restart would fail the same way, so say how to get out of it
+            repair = UNIQUE_INDEX_REPAIRS.get(cls, "remove the duplicate documents")
+            raise SchemaMigrationError(
+                f"Duplicate values in {cls.get_settings().name} block one of its unique indexes ({e}); "
+                f"run `{repair}`, then restart"
+            ) from e
+
+
+async def drop_obsolete_indexes():
+    for model, names in OBSOLETE_INDEXES.items():
+        collection = model.get_motor_collection()
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                await collection.drop_index(name)
+                logger.info(f"Dropped obsolete index {model.get_settings().name}.{name}")
+
+
+async def warm_pool():
+    # Concurrent pings open minPoolSize connections before traffic arrives
+    await asyncio.gather(*[db.command("ping") for _ in range(max(DB_MIN_POOL_SIZE, 1))])
+
 
 # Initialize beanie
 async def init_db():
+    """Connect, set up collections and indexes when the schema changed, and warm the pool.
+
+    Failures propagate so the process does not start serving without a database.
+    """
+    global ready
+    connect_db()
     try:
-        # Ensure models are imported
-        from models.service import Service
-        from models.appointment import Appointment
+        meta = db[SCHEMA_META_COLLECTION]
+        fingerprint = schema_fingerprint()
+        stored = await meta.find_one({"_id": SCHEMA_META_ID})
+        sync_indexes = stored is None or stored.get("fingerprint") != fingerprint
 
         # Initialize Beanie with document models
-        await init_beanie(
+        await SchemaInitializer(
             database=db,
-            document_models=[
-                Service,
-                Appointment
-            ]
+            document_models=DOCUMENT_MODELS,
+            sync_indexes=sync_indexes
         )
         logger.info(f"Successfully connected to database: {db.name}")
-        logger.info(f"Registered models: {[model.__name__ for model in [Service, Appointment]]}")
-        logger.info(f"Appointment model collection name: {Appointment.get_settings().name}")
-
-        # Explicitly check and create collections if they don't exist
-        collections = await db.list_collection_names()
-        # Get collection names from models to ensure consistency
-        required_collections = [Service.get_settings().name, Appointment.get_settings().name]
-        created_collections = []
-
-        for coll in required_collections:
-            if coll not in collections:
-                # Create collection
-                await db.create_collection(coll)
-                created_collections.append(coll)
-
-        if created_collections:
-            logger.info(f"Created missing collections: {created_collections}")
+        logger.info(f"Registered models: {[model.__name__ for model in DOCUMENT_MODELS]}")
+
+        if sync_indexes:
+            # Create collections the models need but the database does not have yet
+            collections = await db.list_collection_names()
+            required_collections = [model.get_settings().name for model in DOCUMENT_MODELS]
+            created_collections = []
+            for coll in required_collections:
+                if coll not in collections:
+                    await db.create_collection(coll)
+                    created_collections.append(coll)
+            if created_collections:
+                logger.info(f"Created missing collections: {created_collections}")
+            await drop_obsolete_indexes()
+
+            await meta.update_one(
+                {"_id": SCHEMA_META_ID},
+                {"$set": {"fingerprint": fingerprint, "applied_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+            logger.info(f"Applied schema {fingerprint[:12]}")
         else:
-            logger.info("All required collections already exist")
+            logger.info(f"Schema {fingerprint[:12]} unchanged; skipped collection and index setup")
 
+        await warm_pool()
+        ready = True
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}", exc_info=True)
+        raise
+
+
+async def init_models():
+    """Register the document models without touching collections or indexes, for repair scripts."""
+    connect_db()
+    await SchemaInitializer(database=db, document_models=DOCUMENT_MODELS, sync_indexes=False)
+
+
+async def close_db():
+    global client, db, ready
+    ready = False
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+
+async def ping_db(timeout: float = 2.0) -> bool:
+    if db is None:
+        return False
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout)
+    except Exception as e:
+        logger.warning(f"Database ping failed: {str(e)}")
+        return False
+    return True
+
 
 # Dependency to get database
 def get_db():
-    return db
\ No newline at end of file
+    return connect_db()
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+import core.database as database
+
+health_router = APIRouter()
+
+
+@health_router.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness only: the process is up and serving; no dependency checks
+    return {"status": "ok"}
+
+
+@health_router.get("/readyz", include_in_schema=False)
+async def readyz():
+    # Ready once init_db has finished and the database still answers
+    if database.ready and await database.ping_db():
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": "unavailable"})
@@ -0,0 +1,224 @@
+from typing import Dict, Tuple
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+import time
+
+# Request latency per route template (not raw path) to keep label cardinality bounded
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests handled by the service",
+    ["method", "route", "status"],
+)
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "Latency of MongoDB commands as seen by the driver",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["collection", "command"],
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections",
+    "Open connections in the MongoDB driver pool",
+    ["address"],
+)
+MONGO_POOL_IN_USE = Gauge(
+    "mongodb_pool_connections_in_use",
+    "Connections currently checked out of the MongoDB driver pool",
+    ["address"],
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total",
+    "Failed attempts to check a connection out of the pool",
+    ["address", "reason"],
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "http_upstream_duration_seconds",
+    "Time to response headers for calls to upstream services",
+    ["host", "method", "status"],
+)
+
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests turned away by admission control",
+    ["reason"],
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time requests waited for a free in-flight slot",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def route_label(scope: dict) -> str:
+    # The router stores the matched route in the ASGI scope
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+def observe_request(scope: dict, status_code: int, elapsed: float):
+    REQUEST_LATENCY.labels(scope["method"], route_label(scope), str(status_code)).observe(elapsed)
+
+
+def _address(connection_id) -> str:
+    host, port = connection_id if isinstance(connection_id, tuple) else (connection_id, "")
+    return f"{host}:{port}"
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Times every driver command per collection and command name.
+
+    Collection names are only on the started event, so they are parked by
+    (connection, request id) until the matching succeeded/failed event.
+    """
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1_000_000)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Keeps open/in-use connection gauges per server address."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).set(0)
+        MONGO_POOL_IN_USE.labels(_address(event.address)).set(0)
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.labels(_address(event.address), str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_IN_USE.labels(_address(event.address)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_IN_USE.labels(_address(event.address)).dec()
+
+
+def mongo_event_listeners() -> list:
+    return [CommandTimingListener(), PoolMetricsListener()]
+
+
+async def _upstream_request_started(request):
+    request.extensions["metrics_started_at"] = time.perf_counter()
+
+
+async def _upstream_response_received(response):
+    started = response.request.extensions.get("metrics_started_at")
+    if started is not None:
+        UPSTREAM_LATENCY.labels(
+            response.request.url.host, response.request.method, str(response.status_code)
+        ).observe(time.perf_counter() - started)
+
+
+# httpx event hooks for the shared upstream client
+HTTPX_EVENT_HOOKS = {
+    "request": [_upstream_request_started],
+    "response": [_upstream_response_received],
+}
+
+
+class CacheCollector:
+    """Exposes hit/miss/size counters of in-process caches at scrape time."""
+
+    def __init__(self):
+        self.caches = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "In-process cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "In-process cache misses", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries held by in-process caches", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield size
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, cache):
+    cache_collector.caches[name] = cache
+
+
+class AdmissionCollector:
+    """Exposes the admission controller's in-flight, waiting and per-tenant state at scrape time."""
+
+    def __init__(self):
+        self.controller = None
+
+    def collect(self):
+        if self.controller is None:
+            return
+        stats = self.controller.stats()
+        yield GaugeMetricFamily("admission_in_flight", "Admitted requests still executing", value=stats["in_flight"])
+        yield GaugeMetricFamily("admission_waiting", "Requests waiting for an in-flight slot", value=stats["waiting"])
+        yield GaugeMetricFamily("admission_in_flight_limit", "Global in-flight limit", value=stats["max_in_flight"])
+        yield GaugeMetricFamily("admission_tenants", "Tenants with a token bucket", value=stats["tenants"])
+        # Only tenants with requests in progress right now, to bound label cardinality
+        tenants = GaugeMetricFamily("admission_tenant_in_flight", "Requests executing or waiting for a slot per tenant", labels=["tenant"])
+        for tenant, count in stats["tenant_in_flight"].items():
+            tenants.add_metric([tenant], count)
+        yield tenants
+
+
+admission_collector = AdmissionCollector()
+REGISTRY.register(admission_collector)
+
+
+def register_admission(controller):
+    admission_collector.controller = controller
+
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -3,36 +3,172 @@ from fastapi.responses import JSONResponse
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.admission import SHARED_TENANT, AdmissionController, Rejected, admission, applies, route_cost
+from core.metrics import observe_request
+from utils.request_context import request_id_var
+from urllib.parse import parse_qs
+import re
+import time
 
 
-async def request_id_middleware(request: Request, call_next):
-    # Extract the mandatory x-request-id header
-    request_id = request.headers.get("x-request-id")
-    
-    # If x-request-id is not provided, raise an HTTPException
-    if not request_id:
-        raise HTTPException(status_code=400, detail="x-request-id header is required")
-    
-    # Add the request_id to the request state so it can be accessed by endpoints
-    request.state.request_id = request_id
-    
-    # Call the next middleware/route handler
-    response = await call_next(request)
-    
-    # Add the request_id to the response headers for traceability
-    response.headers["x-request-id"] = request_id
-    
-    return response
-
-
-# Custom exception handler to ensure CORS headers are added to error responses
+# Operational endpoints scraped or probed without an x-request-id header
+UNTRACED_PATHS = {"/metrics", "/healthz", "/readyz"}
+# Anything the id cannot be echoed back with in a response header: non-Latin-1 and control characters
+INVALID_REQUEST_ID = re.compile(r"[^\x20-\x7e\xa0-\xff]")
+
+# Pure ASGI middleware: no per-request task or body stream wrapping, so
+# streaming responses pass straight through
+
+
+class RequestIdMiddleware:
+    """Require x-request-id, expose it via request.state and a contextvar, echo it back."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # Extract the mandatory x-request-id header; EventSource clients cannot set
+        # headers, so a x-request-id query parameter is accepted as well
+        request_id = Headers(scope=scope).get("x-request-id")
+        if not request_id and scope.get("query_string"):
+            request_id = parse_qs(scope["query_string"].decode("latin-1")).get("x-request-id", [None])[0]
+        if not request_id:
+            response = JSONResponse(status_code=400, content={"detail": "x-request-id header is required"})
+            await response(scope, receive, send)
+            return
+        # The query parameter is percent-decoded, so it can hold characters no header can carry
+        if INVALID_REQUEST_ID.search(request_id):
+            response = JSONResponse(status_code=400, content={"detail": "x-request-id must be printable Latin-1 text"})
+            await response(scope, receive, send)
+            return
+
+        # Endpoints read request.state.request_id; create_response reads the contextvar
+        scope.setdefault("state", {})["request_id"] = request_id
+        encoded = request_id.encode("latin-1")
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                # Add the request_id to the response headers for traceability
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", encoded)]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+class CORSOnErrorMiddleware:
+    """Allow the calling origin on error responses, which CORS preflight rules would otherwise hide."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        origin = Headers(scope=scope).get("origin")
+        if not origin:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start" and message["status"] >= 400:
+                headers = MutableHeaders(scope=message)
+                headers["Access-Control-Allow-Origin"] = origin
+                headers["Access-Control-Allow-Credentials"] = "true"
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+class TimingMiddleware:
+    """Record request latency per route and status, up to the last body chunk."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            observe_request(scope, status_code, time.perf_counter() - started)
+
+
+def tenant_key(scope: Scope) -> str:
+    """Whom a request is charged to: its tenant_id query parameter, else the x-tenant-id header.
+
+    Behind the ingress every client shares the proxy's address, so requests
+    naming neither go to the shared bucket rather than one per address.
+    """
+    if scope.get("query_string"):
+        tenant_id = parse_qs(scope["query_string"].decode("latin-1")).get("tenant_id", [None])[0]
+        if tenant_id:
+            return tenant_id
+    return Headers(scope=scope).get("x-tenant-id") or SHARED_TENANT
+
+
+class AdmissionMiddleware:
+    """Admit API requests through the admission controller; rejections are 429/503 with Retry-After.
+
+    The slot is held until the last body chunk is sent, so streamed exports count for their whole duration.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not self.controller.enabled
+            or scope["method"] == "OPTIONS"
+            or not applies(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        tenant = tenant_key(scope)
+        try:
+            await self.controller.acquire(tenant, route_cost(scope["path"]))
+        except Rejected as rejected:
+            response = JSONResponse(
+                status_code=rejected.status_code,
+                content={"detail": rejected.detail},
+                headers={"Retry-After": rejected.retry_after_header}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(tenant)
+
+
+# Custom exception handler for HTTP errors; CORSOnErrorMiddleware adds the CORS headers
 async def custom_http_exception_handler(request: Request, exc: HTTPException):
-    response = await http_exception_handler(request, exc)
-    origin = request.headers.get("origin")
-    if origin:
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-    return response
+    return await http_exception_handler(request, exc)
 
 
 # Custom exception handler to return 400 instead of 422 for validation errors
@@ -43,11 +179,4 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         status_code=400,
         headers={"Content-Type": "text/plain"}
     )
-    
-    # Add CORS headers if origin is present
-    origin = request.headers.get("origin")
-    if origin:
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-    
     return response
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""Query-plan check for every query shape the endpoints issue.
+
+Run against a database initialised by init_db:
+
+    python -m core.query_plans
+
+Each shape is explained with the queryPlanner verbosity and the command
+exits non-zero if any winning plan contains a COLLSCAN stage, or a blocking
+SORT stage where the index should have supplied the order.
+"""
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta
+from bson import ObjectId
+import asyncio
+import logging
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_ID = ObjectId()
+SAMPLE_TENANT = "tenant-explain"
+SAMPLE_TIME = datetime(2030, 1, 1, 9, 0)
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+    limit: Optional[int] = None
+    count: bool = False
+    # Sorts no more than the ids it was given, so an in-memory SORT is expected
+    bounded_sort: bool = False
+
+
+def query_shapes() -> List[QueryShape]:
+    from models.appointment import Appointment, CANCELED_STATUS
+    from models.service import Service
+    from models.slot_claim import SlotClaim
+    from models.booking_rollup import BookingRollup
+
+    bookings = Appointment.get_settings().name
+    services = Service.get_settings().name
+    slots = SlotClaim.get_settings().name
+    rollups = BookingRollup.get_settings().name
+    after_time = {"$or": [
+        {"appointment_time": {"$gt": SAMPLE_TIME}},
+        {"appointment_time": SAMPLE_TIME, "_id": {"$gt": SAMPLE_ID}},
+    ]}
+    by_time = [("appointment_time", 1), ("_id", 1)]
+
+    return [
+        # GET /bookings (skip pages)
+        QueryShape("bookings.list", bookings, {}, [("_id", 1)], 100),
+        QueryShape("bookings.list.tenant", bookings, {"tenant_id": SAMPLE_TENANT}, [("_id", 1)], 100),
+        QueryShape("bookings.count.tenant", bookings, {"tenant_id": SAMPLE_TENANT}, count=True),
+        # GET /bookings (cursor pages)
+        QueryShape("bookings.cursor", bookings, after_time, by_time, 101),
+        QueryShape("bookings.cursor.tenant", bookings, {"tenant_id": SAMPLE_TENANT, **after_time}, by_time, 101),
+        # GET /bookings/availability
+        QueryShape("bookings.availability", bookings, {
+            "tenant_id": SAMPLE_TENANT,
+            "service_id": SAMPLE_ID,
+            "appointment_time": {"$gte": SAMPLE_TIME, "$lt": SAMPLE_TIME + timedelta(days=7)},
+            "status": {"$ne": CANCELED_STATUS},
+        }),
+        # GET /bookings/export
+        QueryShape("bookings.export", bookings, {
+            "tenant_id": SAMPLE_TENANT,
+            "appointment_time": {"$gte": SAMPLE_TIME, "$lt": SAMPLE_TIME + timedelta(days=31)},
+        }, by_time),
+        # GET /bookings/search
+        QueryShape("bookings.search.phone", bookings, {
+            "tenant_id": SAMPLE_TENANT,
+            "phone_e164": {"$gte": "+84912", "$lt": "+84913"},
+        }, [("phone_e164", 1), ("appointment_time", -1), ("_id", -1)], 20),
+        QueryShape("bookings.search.name", bookings, {
+            "tenant_id": SAMPLE_TENANT,
+            "name_key": {"$gte": "nguyen v", "$lt": "nguyen w"},
+        }, [("name_key", 1), ("appointment_time", -1), ("_id", -1)], 20),
+        # GET /bookings/stats
+        QueryShape("booking_rollups.stats", rollups, {
+            "tenant_id": SAMPLE_TENANT,
+            "day": {"$gte": "2030-01-01", "$lte": "2030-01-31"},
+        }),
+        # GET/PUT/DELETE /bookings/{id}
+        QueryShape("bookings.get", bookings, {"_id": SAMPLE_ID}),
+        # POST /bookings/multi-get
+        QueryShape("bookings.multi_get", bookings, {"$or": [
+            {"_id": {"$in": [SAMPLE_ID]}},
+            {"booking_number": {"$in": ["BK-EXPLAIN"]}},
+        ], "tenant_id": SAMPLE_TENANT}, [("_id", 1)], bounded_sort=True),
+        # python -m services.snapshot_service, one update per service
+        QueryShape("bookings.snapshot_backfill", bookings, {"service_id": SAMPLE_ID, "service_snapshot": None}),
+        # Slot claims taken on create/update, released on update/cancel
+        QueryShape("booking_slots.claim", slots, {
+            "tenant_id": SAMPLE_TENANT,
+            "service_id": SAMPLE_ID,
+            "slot_start": SAMPLE_TIME,
+            "taken": {"$lt": 1},
+            "booking_ids": {"$ne": SAMPLE_ID},
+        }),
+        QueryShape("booking_slots.release", slots, {"booking_ids": SAMPLE_ID}),
+        # GET /biz-services
+        QueryShape("services.list", services, {}, [("_id", 1)], 100),
+        QueryShape("services.cursor", services, {"_id": {"$gt": SAMPLE_ID}}, [("_id", 1)], 101),
+        # GET/PUT/DELETE /biz-services/{id}
+        QueryShape("services.get", services, {"_id": SAMPLE_ID}),
+        # POST /biz-services/multi-get (cache misses)
+        QueryShape("services.multi_get", services, {"_id": {"$in": [SAMPLE_ID]}}),
+    ]
+
+
+def plan_stages(plan: Any) -> Iterator[str]:
+    """Yield every winning stage name in an explain tree, whatever the engine's layout."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+async def explain(db, shape: QueryShape) -> Dict[str, Any]:
+    if shape.count:
+        # count_documents runs as an aggregation
+        command = {
+            "aggregate": shape.collection,
+            "pipeline": [{"$match": shape.filter}, {"$group": {"_id": 1, "n": {"$sum": 1}}}],
+            "cursor": {},
+        }
+    else:
+        command = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = dict(shape.sort)
+        if shape.limit:
+            command["limit"] = shape.limit
+    return await db.command({"explain": command, "verbosity": "queryPlanner"})
+
+
+def plan_problems(shape: QueryShape, stages: set) -> List[str]:
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages and not shape.bounded_sort:
+        problems.append("SORT")
+    return problems
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain every shape and return the names of those that scan the collection or sort in memory."""
+    failures = []
+    for shape in query_shapes():
+        stages = set(plan_stages(await explain(db, shape)))
+        problems = plan_problems(shape, stages)
+        if problems:
+            failures.append(shape.name)
+            logger.error(f"{shape.name}: {', '.join(problems)} ({', '.join(sorted(stages))})")
+        else:
+            logger.info(f"{shape.name}: {', '.join(sorted(stages))}")
+    return failures
+
+
+async def main() -> int:
+    from core.database import get_db, init_db
+
+    await init_db()
+    failures = await check_query_plans(get_db())
+    if failures:
+        logger.error(f"Query shapes without full index support: {failures}")
+        return 1
+    logger.info("All query shapes are index-backed and sorted by their index")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -3,8 +3,12 @@ from fastapi import FastAPI, UploadFile, File, Request, Response, HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from api import router as api_router
-from core.database import init_db
-from core.middleware import request_id_middleware, custom_http_exception_handler, validation_exception_handler
+from core.database import init_db, close_db
+from core.http_client import init_http_client, close_http_client
+from core.health import health_router
+from core.metrics import metrics_router
+from services.booking_feed import booking_feed
+from core.middleware import AdmissionMiddleware, RequestIdMiddleware, CORSOnErrorMiddleware, TimingMiddleware, custom_http_exception_handler, validation_exception_handler
 import os
 import httpx
 from dotenv import load_dotenv
@@ -20,7 +24,11 @@ PORT = int(os.getenv('PORT', '9800'))
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await init_http_client()
     yield
+    await booking_feed.close()
+    await close_http_client()
+    await close_db()
 
 app = FastAPI(title=PROJECT_NAME, lifespan=lifespan, redirect_slashes=False)
 
@@ -31,7 +39,11 @@ ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173,http://loc
 app.exception_handler(HTTPException)(custom_http_exception_handler)
 app.exception_handler(RequestValidationError)(validation_exception_handler)
 
-app.middleware("http")(request_id_middleware)
+# Each add wraps the previous one, so requests pass CORS -> CORS on errors -> timing -> request id -> admission -> routes
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(TimingMiddleware)
+app.add_middleware(CORSOnErrorMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,6 +56,8 @@ app.add_middleware(
 )
 
 app.include_router(api_router, prefix=API_VERSION)
+app.include_router(metrics_router)
+app.include_router(health_router)
 
 # For running the app directly
 if __name__ == '__main__':
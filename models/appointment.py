@@ -1,19 +1,35 @@
 from beanie import PydanticObjectId, Link
-from pydantic import Field, BeforeValidator
+from pydantic import BaseModel, Field, BeforeValidator, model_validator
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from .base import BaseDocument
 from typing import Optional, Any
 from datetime import datetime
 from models.service import Service
-import random
+from utils.search_keys import name_key, normalize_phone
+import secrets
 import string
 
-# Function to generate booking number
+# Status given to bookings that no longer hold their time slot
+CANCELED_STATUS = "canceled"
+
+# Fallback booking number for documents built outside the endpoints, which take
+# numbers from services.booking_number_service; the unique index rejects any clash
 def generate_booking_number() -> str:
     # Format: BK-{timestamp}-{random 6 chars}
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    random_chars = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    random_chars = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
     return f"BK-{timestamp}-{random_chars}"
 
+class ServiceSnapshot(BaseModel):
+    """The service as it was when it was booked; later catalog edits leave it alone."""
+    name: str
+    duration: int
+    price: float
+
+    @classmethod
+    def of(cls, service: Service) -> "ServiceSnapshot":
+        return cls(name=service.name, duration=service.duration, price=service.price)
+
 class Appointment(BaseDocument):
     customer_name: str
     phone_no: str
@@ -22,11 +38,72 @@ class Appointment(BaseDocument):
     status: str = Field(default="Pending")  # Pending, completed, canceled
     notes: Optional[str] = None
     tenant_id: Optional[str] = None  # Add tenant_id for authorization
-    booking_number: str = Field(default_factory=generate_booking_number, unique=True)  # Unique booking number
+    booking_number: str = Field(default_factory=generate_booking_number)  # Unique booking number, enforced by the booking_number index
 
     # Relationship with service
     service: Optional[Link[Service]] = None
+    # Name, duration and price at booking time, so listings need no service lookups
+    service_snapshot: Optional[ServiceSnapshot] = None
+    # Search keys derived from phone_no and customer_name, see utils.search_keys
+    phone_e164: Optional[str] = None
+    name_key: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def derive_search_keys(cls, data: Any) -> Any:
+        # Documents stored before the keys existed get them on load as well
+        if isinstance(data, dict) and (data.get("phone_e164") is None or data.get("name_key") is None):
+            data = {
+                **data,
+                "phone_e164": data.get("phone_e164") or normalize_phone(data.get("phone_no")),
+                "name_key": data.get("name_key") or name_key(data.get("customer_name")),
+            }
+        return data
 
     class Settings:
         name = "bookings"
-        indexes = ["customer_name", "phone_no", "service_id"]
+        indexes = [
+            "service_id",
+            IndexModel([("booking_number", ASCENDING)], name="booking_number", unique=True),
+            # Range scans for availability of one service within a tenant
+            IndexModel(
+                [("tenant_id", ASCENDING), ("service_id", ASCENDING), ("appointment_time", ASCENDING)],
+                name="tenant_service_time",
+            ),
+            # Keyset pagination over (appointment_time, _id), with and without a tenant filter;
+            # the trailing fields let view=summary tenant pages be answered from the index alone
+            IndexModel(
+                [
+                    ("tenant_id", ASCENDING),
+                    ("appointment_time", ASCENDING),
+                    ("_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("booking_number", ASCENDING),
+                    ("customer_name", ASCENDING),
+                ],
+                name="tenant_time_id_summary",
+            ),
+            IndexModel(
+                [("appointment_time", ASCENDING), ("_id", ASCENDING)],
+                name="time_id",
+            ),
+            # Tenant skip pages in _id order, without sorting the tenant's bookings in memory
+            IndexModel(
+                [("tenant_id", ASCENDING), ("_id", ASCENDING)],
+                name="tenant_by_id",
+            ),
+            # GET /bookings/search: anchored prefix ranges on the search keys, newest bookings first
+            IndexModel(
+                [("tenant_id", ASCENDING), ("phone_e164", ASCENDING), ("appointment_time", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_phone_time",
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("name_key", ASCENDING), ("appointment_time", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_name_time",
+            ),
+            # Tenant listings narrowed by status
+            IndexModel(
+                [("tenant_id", ASCENDING), ("status", ASCENDING), ("appointment_time", ASCENDING)],
+                name="tenant_status_time",
+            ),
+        ]
@@ -7,6 +7,7 @@ class BaseDocument(Document):
     id: PydanticObjectId = Field(default_factory=PydanticObjectId, alias="_id")
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
+    version: int = 0  # Bumped by every update; clients send it back for optimistic concurrency
 
     class Settings:
         abstract = True
@@ -0,0 +1,26 @@
+from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+
+
+class BookingRollup(Document):
+    """Bookings and their revenue for one service on one local business day, per tenant and status."""
+    tenant_id: Optional[str] = None
+    day: str  # YYYY-MM-DD in the business' local time
+    service_id: PydanticObjectId
+    status: str
+    bookings: int = 0
+    revenue: float = 0.0  # Sum of the snapshotted prices of its bookings
+    unpriced: int = 0  # Bookings without a snapshot, priced when read
+    rebuild_id: Optional[PydanticObjectId] = None  # Last rebuild that wrote the row; stale rows are deleted by it
+
+    class Settings:
+        name = "booking_rollups"
+        indexes = [
+            # Also the $merge key of the rebuild and the range scan of GET /bookings/stats
+            IndexModel(
+                [("tenant_id", ASCENDING), ("day", ASCENDING), ("service_id", ASCENDING), ("status", ASCENDING)],
+                name="tenant_day_service_status",
+                unique=True,
+            ),
+        ]
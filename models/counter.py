@@ -0,0 +1,11 @@
+from beanie import Document
+from pydantic import Field
+
+
+class Counter(Document):
+    """Named monotonic counter; values are handed out in leased blocks."""
+    id: str = Field(alias="_id")
+    value: int = 0
+
+    class Settings:
+        name = "counters"
@@ -0,0 +1,24 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+from datetime import datetime
+
+
+class IdempotencyRecord(Document):
+    """First response to a create request, replayed for retries with the same key."""
+    id: str = Field(alias="_id")  # "<operation>:<key>"
+    state: str = "pending"  # pending, done
+    fingerprint: str  # Hash of the request payload; a reused key with another payload is rejected
+    locked_until: datetime  # A pending record past this is taken over, e.g. after a crash
+    expires_at: datetime
+    status_code: Optional[int] = None
+    media_type: Optional[str] = None
+    body: Optional[bytes] = None
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            # Per-record expiry, so the retention can change without rebuilding the index
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
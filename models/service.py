@@ -9,6 +9,7 @@ class Service(BaseDocument):
     description: str
     duration: int
     price: float
+    capacity: int = 1  # Bookings that may share one time slot
     photos: List[str] = Field(default_factory=list)
     videos: List[str] = Field(default_factory=list)
 
@@ -0,0 +1,25 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import List, Optional
+from datetime import datetime
+
+
+class SlotClaim(Document):
+    """Seats taken in one time bucket of a service; the unique key makes claiming atomic."""
+    tenant_id: Optional[str] = None
+    service_id: PydanticObjectId
+    slot_start: datetime
+    taken: int = 0
+    booking_ids: List[PydanticObjectId] = Field(default_factory=list)
+
+    class Settings:
+        name = "booking_slots"
+        indexes = [
+            IndexModel(
+                [("tenant_id", ASCENDING), ("service_id", ASCENDING), ("slot_start", ASCENDING)],
+                name="tenant_service_slot",
+                unique=True,
+            ),
+            "booking_ids",
+        ]
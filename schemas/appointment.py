@@ -1,7 +1,8 @@
-from pydantic import Field
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 from .base import BaseSchema, DateTimeModelMixin
+from .service import ServiceOut
 from beanie import PydanticObjectId
 
 class AppointmentBase(BaseSchema):
@@ -18,9 +19,82 @@ class AppointmentCreate(AppointmentBase):
 
 class AppointmentUpdate(AppointmentBase):
     status: str
+    version: int | None = None  # Version the client read; 409 when the booking changed since
+
+class ServiceSnapshotOut(BaseModel):
+    name: str
+    duration: int
+    price: float
+
+    class Config:
+        from_attributes = True
 
 class AppointmentOut(AppointmentBase, DateTimeModelMixin):
     id: PydanticObjectId
     status: str
     booking_number: str
-    
\ No newline at end of file
+    version: int = 0
+    service_snapshot: ServiceSnapshotOut | None = None  # Missing on bookings made before snapshots until backfilled
+
+class AppointmentExpandedOut(AppointmentOut):
+    # expand=service: the service as it is now, or None when it was deleted
+    service: ServiceOut | None = None
+    
+# Named projections for list endpoints; "summary" is what the admin calendar renders
+APPOINTMENT_VIEWS = {
+    "summary": ["booking_number", "appointment_time", "status", "customer_name"],
+}
+
+class AppointmentMultiGet(BaseModel):
+    # Either list may be empty; results come back ids first, then booking numbers
+    ids: List[PydanticObjectId] = Field(default_factory=list)
+    booking_numbers: List[str] = Field(default_factory=list)
+
+class AvailabilitySlot(BaseModel):
+    start: datetime
+    end: datetime
+
+class AvailabilityOut(BaseModel):
+    service_id: PydanticObjectId
+    tenant_id: str
+    duration: int
+    slots: List[AvailabilitySlot]
+
+class AppointmentBulkCreate(BaseModel):
+    # Items are validated one by one against AppointmentCreate so each gets its own result
+    items: List[Dict[str, Any]] = Field(..., min_length=1)
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # created, failed
+    id: PydanticObjectId | None = None
+    booking_number: str | None = None
+    error: str | None = None
+
+class AppointmentBulkOut(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class DailyStats(BaseModel):
+    day: str
+    total: int = 0
+    by_status: Dict[str, int] = Field(default_factory=dict)
+    revenue: float = 0.0
+
+class ServiceStats(BaseModel):
+    service_id: PydanticObjectId
+    name: str | None = None
+    total: int = 0
+    by_status: Dict[str, int] = Field(default_factory=dict)
+    revenue: float = 0.0
+
+class BookingStatsOut(BaseModel):
+    tenant_id: str
+    start: date
+    end: date
+    total: int
+    revenue: float
+    by_status: Dict[str, int]
+    by_day: List[DailyStats]
+    by_service: List[ServiceStats]
@@ -1,4 +1,4 @@
-from pydantic import Field
+from pydantic import BaseModel, Field
 from .base import BaseSchema
 from beanie import PydanticObjectId
 from typing import Optional, List
@@ -9,9 +9,15 @@ class ServiceBase(BaseSchema):
     description: str | None = None
     duration: int = Field(..., gt=0)
     price: float = Field(..., gt=0)
+    capacity: int = Field(1, gt=0)
     photos: List[str] = Field(default_factory=list)
     videos: List[str] = Field(default_factory=list)
 
+# Named projections for list endpoints; "summary" leaves out descriptions and media URLs
+SERVICE_VIEWS = {
+    "summary": ["name", "duration", "price"],
+}
+
 class ServiceCreate(ServiceBase):
     pass
 
@@ -19,9 +25,15 @@ class ServiceUpdate(ServiceBase):
     name: str | None = None
     duration: int | None = Field(None, gt=0)
     price: float | None = Field(None, gt=0)
+    capacity: int | None = Field(None, gt=0)
+    version: int | None = None  # Version the client read; 409 when the service changed since
+
+class ServiceMultiGet(BaseModel):
+    ids: List[PydanticObjectId] = Field(default_factory=list)
 
 class ServiceOut(ServiceBase):
     id: PydanticObjectId
+    version: int = 0
     
     class Config:
         json_encoders = {
@@ -0,0 +1,172 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+from dotenv import load_dotenv
+from beanie import PydanticObjectId
+from models.appointment import Appointment, CANCELED_STATUS
+
+# Load environment variables
+load_dotenv()
+
+# Opening hours are expressed in the business' local time
+BUSINESS_OPEN_HOUR = int(os.getenv('BUSINESS_OPEN_HOUR', '8'))
+BUSINESS_CLOSE_HOUR = int(os.getenv('BUSINESS_CLOSE_HOUR', '20'))
+BUSINESS_UTC_OFFSET_MINUTES = int(os.getenv('BUSINESS_UTC_OFFSET_MINUTES', '420'))
+
+# How long a window loaded from Mongo is trusted, and how many tenant/service timelines are kept
+AVAILABILITY_CACHE_TTL = float(os.getenv('AVAILABILITY_CACHE_TTL', '30'))
+AVAILABILITY_CACHE_MAX_TIMELINES = int(os.getenv('AVAILABILITY_CACHE_MAX_TIMELINES', '1024'))
+
+# Longest range a single availability request may span
+AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', '31'))
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalise a datetime to naive UTC, the form Mongo hands back."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ServiceTimeline:
+    """Sorted booking start times of one service within one tenant.
+
+    Only bookings inside the loaded window are tracked; `generation` is bumped on
+    every write so a load racing with a write is not trusted as a full picture.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[datetime, str]] = []
+        self.window: Optional[Tuple[datetime, datetime]] = None
+        self.loaded_at = 0.0
+        self.generation = 0
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        if self.window is None or time.monotonic() - self.loaded_at > AVAILABILITY_CACHE_TTL:
+            return False
+        return self.window[0] <= start and end <= self.window[1]
+
+    def replace(self, entries: List[Tuple[datetime, str]], start: datetime, end: datetime):
+        self.entries = sorted(entries)
+        self.window = (start, end)
+        self.loaded_at = time.monotonic()
+
+    def add(self, booking_id: str, appointment_time: datetime):
+        self.generation += 1
+        if self.window and self.window[0] <= appointment_time < self.window[1]:
+            insort(self.entries, (appointment_time, booking_id))
+
+    def discard(self, booking_id: str):
+        self.generation += 1
+        self.entries = [entry for entry in self.entries if entry[1] != booking_id]
+
+    def starts(self) -> List[datetime]:
+        return [entry[0] for entry in self.entries]
+
+
+class AvailabilityIndex:
+    """In-process, per-tenant index of booked intervals kept current by booking writes."""
+
+    def __init__(self, max_timelines: int = AVAILABILITY_CACHE_MAX_TIMELINES):
+        self.max_timelines = max_timelines
+        self._timelines: "OrderedDict[Tuple[str, str], ServiceTimeline]" = OrderedDict()
+
+    def _timeline(self, tenant_id: str, service_id: str, create: bool = True) -> Optional[ServiceTimeline]:
+        key = (tenant_id, service_id)
+        timeline = self._timelines.get(key)
+        if timeline is not None:
+            self._timelines.move_to_end(key)
+        elif create:
+            timeline = self._timelines[key] = ServiceTimeline()
+            while len(self._timelines) > self.max_timelines:
+                self._timelines.popitem(last=False)
+        return timeline
+
+    async def booked_starts(self, tenant_id: str, service_id: PydanticObjectId, start: datetime, end: datetime) -> List[datetime]:
+        """Return sorted start times of active bookings in [start, end) with a single bounded query."""
+        timeline = self._timeline(tenant_id, str(service_id))
+        if timeline.covers(start, end):
+            return timeline.starts()
+
+        generation = timeline.generation
+        cursor = Appointment.get_motor_collection().find(
+            {
+                "tenant_id": tenant_id,
+                "service_id": service_id,
+                "appointment_time": {"$gte": start, "$lt": end},
+                "status": {"$ne": CANCELED_STATUS},
+            },
+            {"appointment_time": 1},
+        )
+        entries = [(to_utc_naive(doc["appointment_time"]), str(doc["_id"])) async for doc in cursor]
+        if timeline.generation == generation:
+            timeline.replace(entries, start, end)
+        return sorted(entry[0] for entry in entries)
+
+    def record_booking(self, appointment: Appointment):
+        if not appointment.tenant_id or appointment.status == CANCELED_STATUS:
+            return
+        timeline = self._timeline(appointment.tenant_id, str(appointment.service_id), create=False)
+        if timeline is not None:
+            timeline.add(str(appointment.id), to_utc_naive(appointment.appointment_time))
+
+    def discard_booking(self, tenant_id: Optional[str], service_id: PydanticObjectId, booking_id: PydanticObjectId):
+        if not tenant_id:
+            return
+        timeline = self._timeline(tenant_id, str(service_id), create=False)
+        if timeline is not None:
+            timeline.discard(str(booking_id))
+
+
+availability_index = AvailabilityIndex()
+
+
+def iter_business_slots(start: datetime, end: datetime, duration: int):
+    """Yield naive-UTC (slot_start, slot_end) pairs within opening hours that fit in [start, end)."""
+    offset = timedelta(minutes=BUSINESS_UTC_OFFSET_MINUTES)
+    step = timedelta(minutes=duration)
+    day = (start + offset).replace(hour=0, minute=0, second=0, microsecond=0)
+    while day - offset < end:
+        slot = day + timedelta(hours=BUSINESS_OPEN_HOUR) - offset
+        close = day + timedelta(hours=BUSINESS_CLOSE_HOUR) - offset
+        while slot + step <= close:
+            if slot >= start and slot + step <= end:
+                yield slot, slot + step
+            slot += step
+        day += timedelta(days=1)
+
+
+def slot_start_for(appointment_time: datetime, duration: int) -> datetime:
+    """Align a booking time to the start of its slot on the opening-hours grid, in naive UTC."""
+    offset = timedelta(minutes=BUSINESS_UTC_OFFSET_MINUTES)
+    local = to_utc_naive(appointment_time) + offset
+    opening = local.replace(hour=BUSINESS_OPEN_HOUR, minute=0, second=0, microsecond=0)
+    step = timedelta(minutes=duration)
+    return opening + ((local - opening) // step) * step - offset
+
+
+def on_slot_grid(appointment_time: datetime, duration: int) -> bool:
+    """Whether a booking starts exactly on a slot boundary, so it overlaps no slot but its own."""
+    return slot_start_for(appointment_time, duration) == to_utc_naive(appointment_time)
+
+
+async def find_free_slots(tenant_id: str, service_id: PydanticObjectId, duration: int, start: datetime, end: datetime, capacity: int = 1) -> List[Dict[str, datetime]]:
+    """Compute open slots of a service between start and end."""
+    start = max(to_utc_naive(start), datetime.now(timezone.utc).replace(tzinfo=None))
+    end = to_utc_naive(end)
+    step = timedelta(minutes=duration)
+    # Bookings that started up to one duration before the range still overlap its first slot
+    booked = await availability_index.booked_starts(tenant_id, service_id, start - step, end)
+
+    slots = []
+    for slot_start, slot_end in iter_business_slots(start, end, duration):
+        overlapping = bisect_left(booked, slot_end) - bisect_right(booked, slot_start - step)
+        if overlapping < capacity:
+            slots.append({
+                "start": slot_start.replace(tzinfo=timezone.utc),
+                "end": slot_end.replace(tzinfo=timezone.utc),
+            })
+    return slots
@@ -0,0 +1,155 @@
+from typing import AsyncIterator, Dict, Optional, Set
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+import asyncio
+import logging
+import os
+from models.appointment import Appointment, CANCELED_STATUS
+from schemas.appointment import AppointmentOut
+from utils.fast_json import dumps, row_encoder
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Events buffered per subscriber before it is told to resync, and the keep-alive interval
+FEED_QUEUE_SIZE = int(os.getenv('FEED_QUEUE_SIZE', '256'))
+FEED_HEARTBEAT_SECONDS = float(os.getenv('FEED_HEARTBEAT_SECONDS', '15'))
+FEED_RETRY_MAX_SECONDS = float(os.getenv('FEED_RETRY_MAX_SECONDS', '30'))
+
+# Change streams need a replica set; a standalone mongod answers with this code
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+RESYNC = b"event: resync\ndata: {}\n\n"
+UNAVAILABLE = b"event: unavailable\ndata: {}\n\n"
+HEARTBEAT = b": ping\n\n"
+_CLOSE = None
+
+
+def sse_event(event: str, payload) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+
+
+def change_event_type(change: dict) -> str:
+    if change["operationType"] == "insert":
+        return "created"
+    updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+    if updated_fields.get("status") == CANCELED_STATUS:
+        return "canceled"
+    return "updated"
+
+
+class TenantFeed:
+    """Subscribers of one tenant and the single change stream that serves them."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.resume_token = None
+
+    def publish(self, frame: Optional[bytes]):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop what it has not read and ask it to refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC if frame is not _CLOSE else _CLOSE)
+
+
+class BookingFeedHub:
+    """In-process fan-out of booking changes: one change stream per tenant, however many subscribers.
+
+    Each event is encoded once and the same bytes are queued for every subscriber.
+    """
+
+    def __init__(self):
+        self.feeds: Dict[str, TenantFeed] = {}
+
+    def subscribe(self, tenant_id: str) -> asyncio.Queue:
+        feed = self.feeds.get(tenant_id)
+        if feed is None:
+            feed = self.feeds[tenant_id] = TenantFeed(tenant_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        feed.subscribers.add(queue)
+        if feed.task is None:
+            feed.task = asyncio.create_task(self._watch(feed))
+        return queue
+
+    def unsubscribe(self, tenant_id: str, queue: asyncio.Queue):
+        feed = self.feeds.get(tenant_id)
+        if feed is None:
+            return
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            # Last subscriber gone: stop the upstream stream
+            if feed.task is not None:
+                feed.task.cancel()
+            del self.feeds[tenant_id]
+
+    async def _watch(self, feed: TenantFeed):
+        encoder = row_encoder(AppointmentOut)
+        pipeline = [{"$match": {
+            "operationType": {"$in": ["insert", "update", "replace"]},
+            "fullDocument.tenant_id": feed.tenant_id,
+        }}]
+        delay = 1.0
+        while True:
+            try:
+                async with Appointment.get_motor_collection().watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=feed.resume_token
+                ) as stream:
+                    delay = 1.0
+                    async for change in stream:
+                        feed.resume_token = stream.resume_token
+                        document = change.get("fullDocument")
+                        if document is None:
+                            continue
+                        feed.publish(sse_event(change_event_type(change), encoder.encode(document)))
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.error(f"Booking feed for {feed.tenant_id} unavailable: {str(e)}")
+                    feed.publish(UNAVAILABLE)
+                    feed.publish(_CLOSE)
+                    return
+                logger.warning(f"Booking feed for {feed.tenant_id} failed, retrying in {delay:.0f}s: {str(e)}")
+            except PyMongoError as e:
+                logger.warning(f"Booking feed for {feed.tenant_id} failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, FEED_RETRY_MAX_SECONDS)
+
+    async def stream(self, tenant_id: str) -> AsyncIterator[bytes]:
+        """SSE frames for one subscriber, with heartbeats, until the client or the hub goes away."""
+        queue = self.subscribe(tenant_id)
+        try:
+            yield f"retry: {int(FEED_HEARTBEAT_SECONDS * 1000)}\n\n".encode()
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if frame is _CLOSE:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(tenant_id, queue)
+
+    async def close(self):
+        """End every stream; called from main.lifespan on shutdown."""
+        for feed in list(self.feeds.values()):
+            feed.publish(_CLOSE)
+            if feed.task is not None:
+                feed.task.cancel()
+        self.feeds.clear()
+
+
+booking_feed = BookingFeedHub()
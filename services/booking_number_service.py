@@ -0,0 +1,143 @@
+"""Booking numbers leased in blocks from a shared counter.
+
+Bookings made before the unique booking_number index can share a number, and
+the index cannot be built until they are renumbered. Check, then renumber
+every duplicate but the oldest booking of each number:
+
+    python -m services.booking_number_service --check
+    python -m services.booking_number_service --renumber-duplicates
+"""
+from datetime import datetime
+from typing import Dict, List
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+import argparse
+import asyncio
+import logging
+import os
+import string
+import sys
+from models.appointment import Appointment
+from models.counter import Counter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Numbers leased from Mongo per round trip; unused numbers of a block are lost on restart
+BOOKING_NUMBER_BLOCK_SIZE = int(os.getenv('BOOKING_NUMBER_BLOCK_SIZE', '1000'))
+BOOKING_NUMBER_COUNTER = "booking_number"
+
+BASE36 = string.digits + string.ascii_uppercase
+
+
+def to_base36(value: int, width: int = 6) -> str:
+    digits = ""
+    while value:
+        value, remainder = divmod(value, 36)
+        digits = BASE36[remainder] + digits
+    return digits.rjust(width, "0")
+
+
+def format_booking_number(sequence: int, timestamp: datetime) -> str:
+    # Same BK-{timestamp}-{6+ chars} shape as before; the suffix is the global sequence, so it never repeats
+    return f"BK-{timestamp.strftime('%Y%m%d%H%M%S')}-{to_base36(sequence)}"
+
+
+class BookingNumberAllocator:
+    """Hands out collision-free booking numbers from blocks leased atomically with $inc.
+
+    Every process leases disjoint ranges of one shared counter, so numbers are
+    unique across workers and increase monotonically within each worker.
+    """
+
+    def __init__(self, block_size: int = BOOKING_NUMBER_BLOCK_SIZE):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _lease(self, size: int):
+        counter = await Counter.get_motor_collection().find_one_and_update(
+            {"_id": BOOKING_NUMBER_COUNTER},
+            {"$inc": {"value": size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._end = counter["value"] + 1
+        self._next = self._end - size
+
+    async def allocate(self, count: int = 1) -> List[str]:
+        sequences = []
+        async with self._lock:
+            while len(sequences) < count:
+                if self._next >= self._end:
+                    await self._lease(max(self.block_size, count - len(sequences)))
+                take = min(count - len(sequences), self._end - self._next)
+                sequences.extend(range(self._next, self._next + take))
+                self._next += take
+        now = datetime.now()
+        return [format_booking_number(sequence, now) for sequence in sequences]
+
+    async def next(self) -> str:
+        return (await self.allocate(1))[0]
+
+
+booking_numbers = BookingNumberAllocator()
+
+
+async def find_duplicate_booking_numbers() -> Dict[str, list]:
+    """Booking numbers held by more than one booking, with those bookings' ids in creation order."""
+    pipeline = [
+        {"$group": {"_id": "$booking_number", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    cursor = Appointment.get_motor_collection().aggregate(pipeline, allowDiskUse=True)
+    return {group["_id"]: sorted(group["ids"]) async for group in cursor}
+
+
+async def renumber_duplicates() -> List[dict]:
+    """Give every booking but the oldest of each shared number a fresh one; returns what changed."""
+    collection = Appointment.get_motor_collection()
+    changes = []
+    for number, ids in (await find_duplicate_booking_numbers()).items():
+        for appointment_id in ids[1:]:
+            new_number = await booking_numbers.next()
+            result = await collection.update_one(
+                {"_id": appointment_id, "booking_number": number},
+                {"$set": {"booking_number": new_number}, "$inc": {"version": 1}}
+            )
+            if result.modified_count:
+                changes.append({"id": appointment_id, "old": number, "new": new_number})
+    return changes
+
+
+async def main(renumber: bool) -> int:
+    from core.database import init_models
+
+    # The unique index may be what is failing, so only the models are registered
+    await init_models()
+    if not renumber:
+        duplicates = await find_duplicate_booking_numbers()
+        for number, ids in duplicates.items():
+            logger.warning(f"{number} is shared by {len(ids)} bookings: {', '.join(map(str, ids))}")
+        logger.info(f"{len(duplicates)} booking numbers are shared by more than one booking")
+        return 1 if duplicates else 0
+    changes = await renumber_duplicates()
+    for change in changes:
+        # Customers may quote the old number; support needs the mapping
+        logger.info(f"Booking {change['id']}: {change['old']} -> {change['new']}")
+    logger.info(f"Renumbered {len(changes)} bookings")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Find or renumber bookings that share a booking number")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--check", action="store_true", help="List shared numbers; exits 1 when there are any")
+    action.add_argument("--renumber-duplicates", action="store_true", help="Renumber all but the oldest booking of each shared number")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.renumber_duplicates)))
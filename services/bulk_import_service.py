@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from beanie import PydanticObjectId
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+import os
+import logging
+from models.appointment import Appointment, ServiceSnapshot
+from models.service import Service
+from schemas.appointment import AppointmentCreate, BulkItemResult
+from services.availability_service import availability_index, on_slot_grid
+from services.booking_number_service import booking_numbers
+from services.reservation_service import claim_slots, release_slots
+from services.stats_service import record_new_bookings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '10000'))
+BULK_INSERT_CHUNK_SIZE = int(os.getenv('BULK_INSERT_CHUNK_SIZE', '1000'))
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+
+async def import_appointments(items: List[Dict[str, Any]], chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> List[BulkItemResult]:
+    """Validate and insert many bookings with the same rules as POST /bookings/new.
+
+    Services are resolved with one $in query, slots are claimed and bookings
+    inserted per chunk with unordered bulk writes, and every item gets a result.
+    """
+    results: List[BulkItemResult] = [None] * len(items)
+    parsed: Dict[int, AppointmentCreate] = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = AppointmentCreate.model_validate(item)
+        except ValidationError as exc:
+            results[index] = BulkItemResult(index=index, status="failed", error=_validation_message(exc))
+
+    # One query for every referenced service
+    service_ids = list({appointment.service_id for appointment in parsed.values()})
+    services: Dict[PydanticObjectId, Service] = {
+        service.id: service
+        for service in await Service.find({"_id": {"$in": service_ids}}).to_list()
+    } if service_ids else {}
+
+    # Single pass over the business rules of create_appointment
+    now = datetime.now(timezone.utc)
+    pending: List[tuple] = []
+    for index, appointment in parsed.items():
+        service = services.get(appointment.service_id)
+        error = None
+        if service is None:
+            error = "Service not found"
+        elif appointment.service_name and appointment.service_name.strip().lower() != service.name.strip().lower():
+            error = f"Service name '{appointment.service_name}' does not match the service with ID {appointment.service_id}"
+        elif appointment.appointment_time.tzinfo is None:
+            error = "Appointment time must include a timezone offset"
+        elif appointment.appointment_time < now:
+            error = "Appointment time must be in the future"
+        elif not on_slot_grid(appointment.appointment_time, service.duration):
+            error = f"Appointment time must start on a {service.duration}-minute slot boundary"
+        if error:
+            results[index] = BulkItemResult(index=index, status="failed", error=error)
+            continue
+        pending.append((index, Appointment(
+            customer_name=appointment.customer_name,
+            phone_no=appointment.phone_no,
+            service_id=appointment.service_id,
+            tenant_id=appointment.tenant_id,
+            appointment_time=appointment.appointment_time,
+            status="Pending",
+            notes=appointment.notes,
+            service_snapshot=ServiceSnapshot.of(service)
+        )))
+
+    # One counter lease covers the whole import
+    for (_, appointment), booking_number in zip(pending, await booking_numbers.allocate(len(pending))):
+        appointment.booking_number = booking_number
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        appointments = [appointment for _, appointment in chunk]
+
+        lost = await claim_slots(appointments, services)
+        for position in lost:
+            index = chunk[position][0]
+            results[index] = BulkItemResult(index=index, status="failed", error="This time slot is already booked")
+        chunk = [entry for position, entry in enumerate(chunk) if position not in lost]
+        if not chunk:
+            continue
+
+        failed: Dict[int, str] = {}
+        try:
+            await Appointment.insert_many([appointment for _, appointment in chunk], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "Insert failed")
+            logger.warning(f"Bulk import: {len(failed)} of {len(chunk)} inserts failed")
+        await release_slots([chunk[position][1].id for position in failed])
+
+        inserted = []
+        for position, (index, appointment) in enumerate(chunk):
+            if position in failed:
+                results[index] = BulkItemResult(index=index, status="failed", error=failed[position])
+                continue
+            inserted.append(appointment)
+            availability_index.record_booking(appointment)
+            results[index] = BulkItemResult(
+                index=index,
+                status="created",
+                id=appointment.id,
+                booking_number=appointment.booking_number
+            )
+        # One $inc per touched rollup for the whole chunk
+        await record_new_bookings(inserted)
+    return results
@@ -0,0 +1,99 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from beanie import PydanticObjectId
+from dotenv import load_dotenv
+import os
+from core.metrics import register_cache
+from models.counter import Counter
+from models.service import Service
+from pymongo import ReturnDocument
+from utils.cache import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+# The catalog changes a few times a day; writes on this process invalidate immediately,
+# other workers pick changes up within the TTL
+SERVICE_CACHE_TTL = float(os.getenv('SERVICE_CACHE_TTL', '60'))
+SERVICE_CACHE_SIZE = int(os.getenv('SERVICE_CACHE_SIZE', '1024'))
+
+service_cache = TTLCache(maxsize=SERVICE_CACHE_SIZE, ttl=SERVICE_CACHE_TTL)
+service_page_cache = TTLCache(maxsize=SERVICE_CACHE_SIZE, ttl=SERVICE_CACHE_TTL)
+register_cache("service", service_cache)
+register_cache("service_page", service_page_cache)
+
+# Shared catalog version, bumped on every catalog write; it drives the catalog ETags.
+# Other workers notice a bump within CATALOG_VERSION_TTL and drop their cached services
+CATALOG_VERSION_ID = "catalog_version"
+CATALOG_VERSION_TTL = float(os.getenv('CATALOG_VERSION_TTL', '5'))
+
+catalog_version_cache = TTLCache(maxsize=1, ttl=CATALOG_VERSION_TTL)
+_seen_catalog_version: Optional[int] = None
+
+
+def _observe_catalog_version(version: int):
+    global _seen_catalog_version
+    if _seen_catalog_version is not None and version != _seen_catalog_version:
+        service_cache.invalidate()
+        service_page_cache.invalidate()
+    _seen_catalog_version = version
+
+
+async def _load_catalog_version() -> int:
+    counter = await Counter.get_motor_collection().find_one({"_id": CATALOG_VERSION_ID})
+    version = counter["value"] if counter else 0
+    _observe_catalog_version(version)
+    return version
+
+
+async def get_catalog_version() -> int:
+    return await catalog_version_cache.get_or_load(CATALOG_VERSION_ID, _load_catalog_version)
+
+
+async def bump_catalog_version() -> int:
+    counter = await Counter.get_motor_collection().find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _observe_catalog_version(counter["value"])
+    catalog_version_cache.set(CATALOG_VERSION_ID, counter["value"])
+    return counter["value"]
+
+
+async def get_cached_service(service_id: PydanticObjectId) -> Optional[Service]:
+    """Read-through lookup of a service. The returned document is shared and must not be mutated."""
+    return await service_cache.get_or_load(service_id, lambda: Service.get(service_id))
+
+
+async def get_cached_services(service_ids: List[PydanticObjectId]) -> Dict[PydanticObjectId, Service]:
+    """Services by id from the cache, with every miss fetched in one $in query; absent ids are left out."""
+    found: Dict[PydanticObjectId, Service] = {}
+    misses = []
+    for service_id in service_ids:
+        hit, service = service_cache.get(service_id)
+        if hit:
+            service_cache.hits += 1
+            found[service_id] = service
+        else:
+            misses.append(service_id)
+    if misses:
+        service_cache.misses += len(misses)
+        generation = service_cache.generation
+        for service in await Service.find({"_id": {"$in": misses}}).to_list():
+            if generation == service_cache.generation:
+                service_cache.set(service.id, service)
+            found[service.id] = service
+    return found
+
+
+async def get_cached_service_page(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """Cache a rendered catalog listing page until the next catalog write."""
+    return await service_page_cache.get_or_load(key, loader)
+
+
+async def invalidate_service(service_id: Optional[PydanticObjectId] = None):
+    """Forget one service (or all) together with every cached listing page, and bump the catalog version."""
+    service_cache.invalidate(service_id)
+    service_page_cache.invalidate()
+    await bump_catalog_version()
@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+from bson import ObjectId
+from dotenv import load_dotenv
+from urllib.parse import quote
+import csv
+import io
+import json
+import os
+import re
+from models.appointment import Appointment
+
+# Load environment variables
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+# Exported columns, in output order; "id" is read from Mongo's _id
+EXPORT_FIELDS = [
+    "id",
+    "booking_number",
+    "tenant_id",
+    "service_id",
+    "customer_name",
+    "phone_no",
+    "appointment_time",
+    "status",
+    "notes",
+    "created_at",
+    "updated_at",
+]
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+# Characters left as they are in the plain ASCII filename; everything else becomes "_"
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def export_disposition(tenant_id: str, export_format: str) -> str:
+    """Content-Disposition for an export: an ASCII filename, plus the exact one as RFC 5987 filename*."""
+    filename = f"bookings-{tenant_id}.{export_format}"
+    ascii_filename = UNSAFE_FILENAME_CHARS.sub("_", filename)
+    return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _export_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = doc.pop("_id")
+    return {field: _export_value(doc.get(field)) for field in EXPORT_FIELDS}
+
+
+def _encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode()
+
+
+def _encode_csv(rows: List[Dict[str, Any]], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_bookings(query: Dict[str, Any], export_format: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Stream matching bookings as NDJSON or CSV, one encoded batch at a time.
+
+    Documents come straight off a projected Motor cursor, so at most one batch
+    of raw rows is held in memory however large the export is.
+    """
+    cursor = Appointment.get_motor_collection().find(query, EXPORT_PROJECTION).sort(
+        [("appointment_time", 1), ("_id", 1)]
+    ).batch_size(batch_size)
+    try:
+        if export_format == "csv":
+            yield _encode_csv([], header=True)
+        while True:
+            docs = await cursor.to_list(length=batch_size)
+            if not docs:
+                break
+            rows = [_export_row(doc) for doc in docs]
+            yield _encode_csv(rows) if export_format == "csv" else _encode_ndjson(rows)
+    finally:
+        # A client that disconnects mid-export closes the generator; kill the
+        # server-side cursor now instead of leaving it to the idle timeout
+        await cursor.close()
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from core.metrics import register_cache
+from models.idempotency_record import IdempotencyRecord
+from utils.cache import TTLCache
+from utils.request_context import get_request_id
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# How long first responses are replayed, and how many are kept in process
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv('IDEMPOTENCY_CACHE_TTL', '300'))
+# A duplicate waits this long for the first request; a pending key is taken over after its lock expires
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '10'))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '30'))
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+idempotency_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_CACHE_TTL)
+register_cache("idempotency", idempotency_cache)
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    media_type: Optional[str]
+    body: bytes
+    replayed: bool
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, the form Mongo hands back
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _stored(record: dict) -> StoredResponse:
+    return StoredResponse(record["fingerprint"], record["status_code"], record.get("media_type"), record["body"], True)
+
+
+async def _acquire(record_id: str, fingerprint: str) -> Optional[StoredResponse]:
+    """Own the key (returns None) or wait for whoever owns it and return its response."""
+    collection = IdempotencyRecord.get_motor_collection()
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.02
+    while True:
+        now = _utcnow()
+        try:
+            await collection.insert_one({
+                "_id": record_id,
+                "state": "pending",
+                "fingerprint": fingerprint,
+                "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            # The owner failed and released the key; try to take it
+            continue
+        if record["state"] == "done":
+            return _stored(record)
+        if record["locked_until"] < now:
+            # The owner died mid-request: take the key over
+            taken = await collection.find_one_and_update(
+                {"_id": record_id, "state": "pending", "locked_until": record["locked_until"]},
+                {"$set": {
+                    "fingerprint": fingerprint,
+                    "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                }}
+            )
+            if taken is not None:
+                return None
+            continue
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this idempotency key is still in progress"
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+async def _execute(record_id: str, fingerprint: str, handler: Callable[[], Awaitable[Any]]) -> StoredResponse:
+    stored = await _acquire(record_id, fingerprint)
+    if stored is not None:
+        return stored
+
+    collection = IdempotencyRecord.get_motor_collection()
+    try:
+        result = await handler()
+    except BaseException:
+        # Nothing was created; release the key so a retry runs again
+        await collection.delete_one({"_id": record_id, "state": "pending"})
+        raise
+
+    response = result if isinstance(result, Response) else JSONResponse(jsonable_encoder(result))
+    if response.status_code >= 300:
+        await collection.delete_one({"_id": record_id, "state": "pending"})
+        return StoredResponse(fingerprint, response.status_code, response.media_type, bytes(response.body), False)
+    await collection.update_one(
+        {"_id": record_id},
+        {"$set": {
+            "state": "done",
+            "status_code": response.status_code,
+            "media_type": response.media_type,
+            "body": bytes(response.body),
+        }}
+    )
+    return StoredResponse(fingerprint, response.status_code, response.media_type, bytes(response.body), False)
+
+
+async def idempotent(operation: str, idempotency_key: Optional[str], payload: BaseModel, handler: Callable[[], Awaitable[Any]]) -> Response:
+    """Run a create handler at most once per key and replay its first successful response.
+
+    The key is the Idempotency-Key header, falling back to the request's
+    x-request-id. Duplicates in this process share one execution; duplicates
+    on other workers wait on the pending record in Mongo.
+    """
+    key = idempotency_key or get_request_id()
+    if not key:
+        result = await handler()
+        return result if isinstance(result, Response) else JSONResponse(jsonable_encoder(result))
+
+    record_id = f"{operation}:{key}"
+    fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    executed = []
+
+    def load():
+        executed.append(True)
+        return _execute(record_id, fingerprint, handler)
+
+    stored = await idempotency_cache.get_or_load(record_id, load)
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency key was already used for a different request"
+        )
+    if stored.status_code >= 300:
+        # Failures are not remembered; drop the in-process entry as well
+        idempotency_cache.invalidate(record_id)
+    # Only the caller whose handler ran gets a fresh response; everyone else sees a replay
+    headers = {REPLAY_HEADER: "true"} if stored.replayed or not executed else {}
+    return Response(content=stored.body, status_code=stored.status_code, media_type=stored.media_type, headers=headers)
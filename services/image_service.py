@@ -1,9 +1,11 @@
 from fastapi import UploadFile, HTTPException
-from typing import List
-import httpx
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
 import os
+import uuid
 from dotenv import load_dotenv
 import logging
+from core.http_client import get_http_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,51 +17,153 @@ load_dotenv()
 # Get the upload service URL from environment variables
 UPLOAD_SERVICE_URL = os.getenv('UPLOAD_SERVICE_URL', 'http://localhost:6000')
 
-async def upload_images(category: str, files: List[UploadFile]):
+# Files are read and forwarded in chunks so only one chunk per file is held in memory
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', str(4 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '4'))
+
+# Magic bytes of the accepted image formats
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+]
+
+
+def format_size(size: int) -> str:
+    """Byte count as the largest whole unit: 4194304 -> "4MB", 512000 -> "500KB"."""
+    for unit, factor in (("MB", 1024 * 1024), ("KB", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size} bytes"
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image type from the first bytes of a file, ignoring the declared content type."""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+async def inspect_upload(file: UploadFile) -> Tuple[str, int]:
+    """Check type and size while reading in chunks; returns (content_type, size) and rewinds the file."""
+    head = await file.read(UPLOAD_CHUNK_SIZE)
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type: {file.content_type}. Only PNG, JPEG, and JPG files are allowed."
+        )
+    size = len(head)
+    while size <= MAX_IMAGE_SIZE:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+    if size > MAX_IMAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File size exceeds {format_size(MAX_IMAGE_SIZE)} limit"
+        )
+    await file.seek(0)  # Reset file pointer
+    return content_type, size
+
+
+def _quote(value: str) -> str:
+    return value.replace("\r", "").replace("\n", "").replace('"', "%22")
+
+
+class MultipartStream:
+    """multipart/form-data body streamed from upload files with a precomputed Content-Length."""
+
+    def __init__(self, fields: dict, files: List[Tuple[UploadFile, str, int]]):
+        self.boundary = uuid.uuid4().hex
+        self.fields = fields
+        self.files = files
+
+    def _field_part(self, name: str, value: str) -> bytes:
+        return (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n{value}\r\n'
+        ).encode()
+
+    def _file_header(self, file: UploadFile, content_type: str) -> bytes:
+        return (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="imageFiles"; '
+            f'filename="{_quote(file.filename or "upload")}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode()
+
+    def _closing(self) -> bytes:
+        return f"--{self.boundary}--\r\n".encode()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def content_length(self) -> int:
+        length = sum(len(self._field_part(name, value)) for name, value in self.fields.items())
+        for file, content_type, size in self.files:
+            length += len(self._file_header(file, content_type)) + size + 2
+        return length + len(self._closing())
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for name, value in self.fields.items():
+            yield self._field_part(name, value)
+        for file, content_type, _ in self.files:
+            yield self._file_header(file, content_type)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+            yield b"\r\n"
+        yield self._closing()
+
+
+async def forward_images(category: str, files: List[Tuple[UploadFile, str, int]]):
+    body = MultipartStream({"category": category}, files)
+    response = await get_http_client().post(
+        UPLOAD_SERVICE_URL,
+        content=body,
+        headers={"Content-Type": body.content_type, "Content-Length": str(body.content_length)}
+    )
+
+    # Check if the upstream service returned an error
+    if response.status_code >= 400:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=response.text
+        )
+
+    return response.json()
+
+
+async def inspect_uploads(category: str, files: List[UploadFile]) -> List[Tuple[UploadFile, str, int]]:
     # Log incoming files
     logger.info(f"Received {len(files)} files for category: {category}")
     for i, file in enumerate(files):
         logger.info(f"File {i+1}: filename={file.filename}, content_type={file.content_type}")
-    
-    # Validate files
+
+    # Validate files by content and size without loading them whole
+    inspected = []
     for file in files:
-        # Check file type
-        if not file.content_type in ["image/png", "image/jpeg", "image/jpg"]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type: {file.content_type}. Only PNG, JPEG, and JPG files are allowed."
-            )
-        
-        # Check file size (4MB limit)
-        contents = await file.read()
-        await file.seek(0)  # Reset file pointer
-        if len(contents) > 4 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds 4MB limit: {len(contents)} bytes"
-            )
-    
-    # Forward files to the image service
-    async with httpx.AsyncClient() as client:
-        # Prepare files for forwarding
-        forwarded_files = []
-        for file in files:
-            forwarded_files.append(("imageFiles", (file.filename, file.file, file.content_type)))
-        
-        # Add category to the form data
-        form_data = {"category": category}
-        
-        response = await client.post(
-            UPLOAD_SERVICE_URL,
-            files=forwarded_files,
-            data=form_data
-        )
-        
-        # Check if the upstream service returned an error
-        if response.status_code >= 400:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=response.text
-            )
-        
-        return response.json()
\ No newline at end of file
+        content_type, size = await inspect_upload(file)
+        inspected.append((file, content_type, size))
+    return inspected
+
+
+async def upload_images(category: str, files: List[UploadFile]):
+    """Forward every file in one streamed request; returns the upstream response."""
+    return await forward_images(category, await inspect_uploads(category, files))
+
+
+async def upload_images_each(category: str, files: List[UploadFile]) -> list:
+    """Forward one streamed request per file, at most UPLOAD_CONCURRENCY in flight.
+
+    Returns the upstream response of every file, in input order.
+    """
+    inspected = await inspect_uploads(category, files)
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def forward_one(entry):
+        async with semaphore:
+            return await forward_images(category, [entry])
+
+    return await asyncio.gather(*[forward_one(entry) for entry in inspected])
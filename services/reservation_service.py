@@ -0,0 +1,108 @@
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from beanie import PydanticObjectId
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from models.appointment import Appointment
+from models.service import Service
+from models.slot_claim import SlotClaim
+from services.availability_service import on_slot_grid, slot_start_for
+
+
+def check_slot_alignment(appointment_time: datetime, service: Service):
+    # Claims are keyed by slot start: an off-grid booking would overlap the next slot without claiming it
+    if not on_slot_grid(appointment_time, service.duration):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Appointment time must start on a {service.duration}-minute slot boundary"
+        )
+
+
+def _claim_query(appointment: Appointment, service: Service) -> dict:
+    return {
+        "tenant_id": appointment.tenant_id,
+        "service_id": service.id,
+        "slot_start": slot_start_for(appointment.appointment_time, service.duration),
+        "taken": {"$lt": service.capacity},
+        "booking_ids": {"$ne": appointment.id},
+    }
+
+
+def _claim_update(appointment: Appointment) -> dict:
+    return {"$inc": {"taken": 1}, "$push": {"booking_ids": appointment.id}}
+
+
+async def claim_slot(appointment: Appointment, service: Service) -> PydanticObjectId:
+    """Take one seat of the appointment's slot in a single round trip.
+
+    The filter only matches a claim that still has room; when the slot is full
+    the upsert collides with the unique (tenant, service, slot) key instead of
+    inserting, so exactly `capacity` writers can win.
+    """
+    check_slot_alignment(appointment.appointment_time, service)
+    query = _claim_query(appointment, service)
+    # Two first claims of a shared slot can race on the insert; the loser retries
+    # once against the now existing claim. Single-seat slots never retry.
+    attempts = 2 if service.capacity > 1 else 1
+    for attempt in range(attempts):
+        try:
+            claim = await SlotClaim.get_motor_collection().find_one_and_update(
+                query,
+                _claim_update(appointment),
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            break
+        except DuplicateKeyError:
+            if attempt == attempts - 1:
+                raise HTTPException(
+                    status_code=409,
+                    detail="This time slot is already booked"
+                )
+    return claim["_id"]
+
+
+async def claim_slots(appointments: List[Appointment], services: Dict[PydanticObjectId, Service]) -> Set[int]:
+    """Claim slots for many bookings in one unordered bulk write; return positions that lost their slot."""
+    if not appointments:
+        return set()
+    requests = [
+        UpdateOne(_claim_query(appointment, services[appointment.service_id]), _claim_update(appointment), upsert=True)
+        for appointment in appointments
+    ]
+    try:
+        await SlotClaim.get_motor_collection().bulk_write(requests, ordered=False)
+    except BulkWriteError as exc:
+        return {error["index"] for error in exc.details.get("writeErrors", [])}
+    return set()
+
+
+async def release_slots(booking_ids: List[PydanticObjectId]):
+    """Give back the seats held by several bookings at once."""
+    if not booking_ids:
+        return
+    await SlotClaim.get_motor_collection().bulk_write([
+        UpdateMany({"booking_ids": booking_id}, {"$inc": {"taken": -1}, "$pull": {"booking_ids": booking_id}})
+        for booking_id in booking_ids
+    ], ordered=False)
+
+
+async def release_slot(booking_id: PydanticObjectId, keep_claim_id: Optional[PydanticObjectId] = None):
+    """Give back the seat held by a booking, except the one in `keep_claim_id`."""
+    query = {"booking_ids": booking_id}
+    if keep_claim_id is not None:
+        query["_id"] = {"$ne": keep_claim_id}
+    await SlotClaim.get_motor_collection().update_many(
+        query,
+        {"$inc": {"taken": -1}, "$pull": {"booking_ids": booking_id}}
+    )
+
+
+async def release_claim(claim_id: PydanticObjectId, booking_id: PydanticObjectId):
+    """Give back the seat a booking holds in one particular claim."""
+    await SlotClaim.get_motor_collection().update_one(
+        {"_id": claim_id, "booking_ids": booking_id},
+        {"$inc": {"taken": -1}, "$pull": {"booking_ids": booking_id}}
+    )
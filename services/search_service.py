@@ -0,0 +1,88 @@
+"""Customer search keys on bookings.
+
+Every booking carries phone_e164 and name_key (see utils.search_keys).
+Bookings stored before the keys existed are backfilled with:
+
+    python -m services.search_service --tenant tenant-1
+    python -m services.search_service --all
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from models.appointment import Appointment
+from utils.search_keys import name_key, normalize_phone, prefix_range
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SEARCH_BACKFILL_BATCH_SIZE = int(os.getenv('SEARCH_BACKFILL_BATCH_SIZE', '1000'))
+
+
+def search_query(tenant_id: str, phone: Optional[str], name: Optional[str]) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """Filter and sort for one search; both follow tenant_phone_time / tenant_name_time, so the
+    scan stops after `limit` index entries however many bookings the tenant has."""
+    if bool(phone) == bool(name):
+        raise HTTPException(
+            status_code=400,
+            detail="Search by exactly one of phone or name"
+        )
+    field, key = ("phone_e164", normalize_phone(phone)) if phone else ("name_key", name_key(name))
+    if not key:
+        raise HTTPException(
+            status_code=400,
+            detail="Search term has nothing to match on"
+        )
+    query = {"tenant_id": tenant_id, field: prefix_range(key)}
+    return query, [(field, 1), ("appointment_time", -1), ("_id", -1)]
+
+
+async def backfill_search_keys(tenant_id: Optional[str] = None, batch_size: int = SEARCH_BACKFILL_BATCH_SIZE) -> int:
+    """Derive the search keys of bookings that lack them, one unordered bulk write per batch."""
+    scope = {"tenant_id": tenant_id} if tenant_id is not None else {}
+    collection = Appointment.get_motor_collection()
+    cursor = collection.find(
+        {**scope, "$or": [{"phone_e164": None}, {"name_key": None}]},
+        {"phone_no": 1, "customer_name": 1}
+    ).batch_size(batch_size)
+    updated = 0
+    while True:
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+        result = await collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "phone_e164": normalize_phone(doc.get("phone_no")),
+                "name_key": name_key(doc.get("customer_name")),
+            }})
+            for doc in docs
+        ], ordered=False)
+        updated += result.modified_count
+    return updated
+
+
+async def main(tenant_id: Optional[str]) -> int:
+    from core.database import init_db
+
+    await init_db()
+    updated = await backfill_search_keys(tenant_id)
+    logger.info(f"Backfilled search keys on {updated} bookings for {tenant_id or 'all tenants'}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Backfill customer search keys on bookings")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tenant", help="Backfill one tenant")
+    target.add_argument("--all", action="store_true", help="Backfill every tenant")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(None if args.all else args.tenant)))
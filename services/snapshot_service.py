@@ -0,0 +1,87 @@
+"""Service snapshots on bookings and `expand=service` resolution.
+
+Bookings made before snapshots existed are backfilled from the current
+catalog, one update per service:
+
+    python -m services.snapshot_service --tenant tenant-1
+    python -m services.snapshot_service --all
+"""
+from typing import Any, List, Optional
+import argparse
+import asyncio
+import logging
+import sys
+from models.appointment import Appointment, ServiceSnapshot
+from models.service import Service
+from schemas.appointment import AppointmentExpandedOut
+from schemas.service import ServiceOut
+from services.catalog_service import get_cached_services
+from utils.multi_get import unique
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+async def expand_services(items: List[Any]) -> List[Any]:
+    """Attach the current service to every row; each distinct service_id is resolved once.
+
+    Raw rows (dicts) get a `service` key; schema rows become AppointmentExpandedOut.
+    """
+    service_ids = unique([item["service_id"] if isinstance(item, dict) else item.service_id for item in items])
+    services = {
+        service_id: ServiceOut.from_orm(service)
+        for service_id, service in (await get_cached_services(service_ids)).items()
+    }
+    encoded = {service_id: service.model_dump() for service_id, service in services.items()}
+    expanded = []
+    for item in items:
+        if isinstance(item, dict):
+            item["service"] = encoded.get(item["service_id"])
+            expanded.append(item)
+        else:
+            expanded.append(AppointmentExpandedOut(**item.model_dump(), service=services.get(item.service_id)))
+    return expanded
+
+
+async def backfill_service_snapshots(tenant_id: Optional[str] = None) -> dict:
+    """Give every booking without a snapshot one taken from its service as it is now.
+
+    The original values at booking time are not recorded anywhere, so the
+    current name, duration and price are the closest available. Bookings of
+    deleted services are left without a snapshot.
+    """
+    collection = Appointment.get_motor_collection()
+    scope = {"tenant_id": tenant_id} if tenant_id is not None else {}
+    updated = 0
+    async for service in Service.find({}):
+        # Each update walks the service_id index
+        result = await collection.update_many(
+            {**scope, "service_id": service.id, "service_snapshot": None},
+            # The version bump changes the booking's ETag and fails writes based on the old row
+            {"$set": {"service_snapshot": ServiceSnapshot.of(service).model_dump()}, "$inc": {"version": 1}}
+        )
+        updated += result.modified_count
+    remaining = await collection.count_documents({**scope, "service_snapshot": None})
+    return {"updated": updated, "remaining": remaining}
+
+
+async def main(tenant_id: Optional[str]) -> int:
+    from core.database import init_db
+
+    await init_db()
+    result = await backfill_service_snapshots(tenant_id)
+    logger.info(
+        f"Backfilled {result['updated']} bookings for {tenant_id or 'all tenants'}; "
+        f"{result['remaining']} reference deleted services"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Backfill service snapshots on bookings made before they existed")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tenant", help="Backfill one tenant")
+    target.add_argument("--all", action="store_true", help="Backfill every tenant")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(None if args.all else args.tenant)))
@@ -0,0 +1,235 @@
+"""Daily booking rollups per tenant, service and status.
+
+Writes keep the rollups current with $inc; the rebuild recomputes them from
+the bookings collection with one aggregation:
+
+    python -m services.stats_service --tenant tenant-1
+    python -m services.stats_service --all
+"""
+from collections import Counter as Tally
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from beanie import PydanticObjectId
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from models.appointment import Appointment, CANCELED_STATUS
+from models.booking_rollup import BookingRollup
+from schemas.appointment import BookingStatsOut, DailyStats, ServiceStats
+from services.availability_service import BUSINESS_UTC_OFFSET_MINUTES, to_utc_naive
+from services.catalog_service import get_cached_service
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Longest range a single stats request may span
+STATS_MAX_DAYS = int(os.getenv('STATS_MAX_DAYS', '366'))
+
+RollupKey = Tuple[Optional[str], str, PydanticObjectId, str]
+
+
+def business_day(appointment_time: datetime) -> str:
+    """Local business day of a booking, matching the $dateToString of the rebuild."""
+    local = to_utc_naive(appointment_time) + timedelta(minutes=BUSINESS_UTC_OFFSET_MINUTES)
+    return local.strftime("%Y-%m-%d")
+
+
+def rollup_key(appointment: Optional[Appointment]) -> Optional[RollupKey]:
+    if appointment is None:
+        return None
+    return (appointment.tenant_id, business_day(appointment.appointment_time), appointment.service_id, appointment.status)
+
+
+def rollup_delta(appointment: Appointment, sign: int) -> Dict[str, float]:
+    """What one booking adds to its rollup; revenue comes from the price snapshotted at booking time."""
+    if appointment.service_snapshot is None:
+        # Priced at read time with the service's current price
+        return {"bookings": sign, "unpriced": sign}
+    return {"bookings": sign, "revenue": sign * appointment.service_snapshot.price}
+
+
+async def apply_rollup_deltas(deltas: Dict[RollupKey, Dict[str, float]]):
+    """$inc every touched rollup in one unordered bulk write."""
+    operations = [
+        UpdateOne(
+            {"tenant_id": tenant_id, "day": day, "service_id": service_id, "status": status},
+            {"$inc": {field: value for field, value in delta.items() if value}},
+            upsert=True
+        )
+        for (tenant_id, day, service_id, status), delta in deltas.items()
+        if any(delta.values())
+    ]
+    if not operations:
+        return
+    try:
+        await BookingRollup.get_motor_collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        # The booking itself is already written; a rebuild repairs the rollup
+        logger.error(f"Failed to update booking rollups: {str(e)}")
+
+
+def _add_bookings(deltas: Dict[RollupKey, Dict[str, float]], appointments: Iterable[Appointment], sign: int):
+    for appointment in appointments:
+        deltas.setdefault(rollup_key(appointment), Tally()).update(rollup_delta(appointment, sign))
+
+
+async def record_booking_change(before: Optional[Appointment], after: Optional[Appointment]):
+    """Move one booking between rollups; None stands for "did not exist"."""
+    deltas: Dict[RollupKey, Dict[str, float]] = {}
+    _add_bookings(deltas, [before] if before is not None else [], -1)
+    _add_bookings(deltas, [after] if after is not None else [], 1)
+    await apply_rollup_deltas(deltas)
+
+
+async def record_new_bookings(appointments: Iterable[Appointment]):
+    deltas: Dict[RollupKey, Dict[str, float]] = {}
+    _add_bookings(deltas, appointments, 1)
+    await apply_rollup_deltas(deltas)
+
+
+def _timezone_offset() -> str:
+    sign = "-" if BUSINESS_UTC_OFFSET_MINUTES < 0 else "+"
+    hours, minutes = divmod(abs(BUSINESS_UTC_OFFSET_MINUTES), 60)
+    return f"{sign}{hours:02d}{minutes:02d}"
+
+
+async def rebuild_rollups(tenant_id: Optional[str] = None) -> int:
+    """Recompute the rollups of one tenant (or all) from the bookings collection.
+
+    Rows are replaced in place and stamped with this run's id; only rows the run
+    did not produce are deleted afterwards, so stats never read an empty or
+    half-built range. Run it while the tenant is quiet: bookings written during
+    the rebuild may be counted twice or not at all until the next rebuild.
+    """
+    scope = {"tenant_id": tenant_id} if tenant_id is not None else {}
+    rollups = BookingRollup.get_motor_collection()
+    rebuild_id = ObjectId()
+    pipeline = [
+        {"$match": scope},
+        {"$group": {
+            "_id": {
+                "tenant_id": "$tenant_id",
+                "day": {"$dateToString": {
+                    "format": "%Y-%m-%d",
+                    "date": "$appointment_time",
+                    "timezone": _timezone_offset(),
+                }},
+                "service_id": "$service_id",
+                "status": "$status",
+            },
+            "bookings": {"$sum": 1},
+            "revenue": {"$sum": {"$ifNull": ["$service_snapshot.price", 0]}},
+            "unpriced": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$service_snapshot.price", None]}, None]}, 1, 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "tenant_id": "$_id.tenant_id",
+            "day": "$_id.day",
+            "service_id": "$_id.service_id",
+            "status": "$_id.status",
+            "bookings": 1,
+            "revenue": 1,
+            "unpriced": 1,
+            "rebuild_id": {"$literal": rebuild_id},
+        }},
+        {"$merge": {
+            "into": BookingRollup.get_settings().name,
+            "on": ["tenant_id", "day", "service_id", "status"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    await Appointment.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    # Keys with no bookings left, e.g. every booking of the day moved away
+    await rollups.delete_many({**scope, "rebuild_id": {"$ne": rebuild_id}})
+    return await rollups.count_documents(scope)
+
+
+async def get_booking_stats(tenant_id: str, start: date, end: date, service_id: Optional[PydanticObjectId] = None) -> BookingStatsOut:
+    """Totals by status, day and service for the days in [start, end].
+
+    Reads at most days x services x statuses rollup rows, whatever the
+    booking history. Revenue of bookings that are not canceled uses the price
+    snapshotted at booking time, and the current Service.price for bookings
+    without a snapshot.
+    """
+    query = {"tenant_id": tenant_id, "day": {"$gte": start.isoformat(), "$lte": end.isoformat()}}
+    if service_id is not None:
+        query["service_id"] = service_id
+    rows = await BookingRollup.get_motor_collection().find(
+        query, {"_id": 0, "day": 1, "service_id": 1, "status": 1, "bookings": 1, "revenue": 1, "unpriced": 1}
+    ).to_list(length=None)
+
+    service_ids = list({row["service_id"] for row in rows})
+    services = dict(zip(service_ids, await asyncio.gather(*[get_cached_service(sid) for sid in service_ids])))
+
+    by_status: Dict[str, int] = Tally()
+    days: Dict[str, DailyStats] = {}
+    per_service: Dict[PydanticObjectId, ServiceStats] = {}
+    revenue = 0.0
+    for row in rows:
+        bookings = row["bookings"]
+        if bookings <= 0:
+            continue
+        service = services.get(row["service_id"])
+        row_revenue = 0.0
+        if row["status"] != CANCELED_STATUS:
+            # Rows last rebuilt before revenue was rolled up count every booking as unpriced
+            unpriced = row.get("unpriced", 0) if "revenue" in row or "unpriced" in row else bookings
+            row_revenue = row.get("revenue", 0.0)
+            if service is not None:
+                row_revenue += unpriced * service.price
+
+        by_status[row["status"]] += bookings
+        revenue += row_revenue
+
+        daily = days.setdefault(row["day"], DailyStats(day=row["day"]))
+        daily.total += bookings
+        daily.by_status[row["status"]] = daily.by_status.get(row["status"], 0) + bookings
+        daily.revenue += row_revenue
+
+        stats = per_service.setdefault(row["service_id"], ServiceStats(
+            service_id=row["service_id"],
+            name=service.name if service is not None else None
+        ))
+        stats.total += bookings
+        stats.by_status[row["status"]] = stats.by_status.get(row["status"], 0) + bookings
+        stats.revenue += row_revenue
+
+    return BookingStatsOut(
+        tenant_id=tenant_id,
+        start=start,
+        end=end,
+        total=sum(by_status.values()),
+        revenue=revenue,
+        by_status=dict(by_status),
+        by_day=[days[day] for day in sorted(days)],
+        by_service=sorted(per_service.values(), key=lambda stats: stats.total, reverse=True)
+    )
+
+
+async def main(tenant_id: Optional[str]) -> int:
+    from core.database import init_db
+
+    await init_db()
+    rows = await rebuild_rollups(tenant_id)
+    logger.info(f"Rebuilt {rows} rollup rows for {tenant_id or 'all tenants'}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild daily booking rollups from the bookings collection")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tenant", help="Rebuild one tenant")
+    target.add_argument("--all", action="store_true", help="Rebuild every tenant")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(None if args.all else args.tenant)))
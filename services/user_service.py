@@ -1,17 +1,27 @@
 import os
-import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException, status
+from core.http_client import get_http_client
+from core.metrics import register_cache
+from utils.cache import TTLCache
 
 load_dotenv()
 USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:8001')
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '4096'))
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+register_cache("user", user_cache)
+
+async def fetch_user(user_id: str):
+    response = await get_http_client().get(f"{USER_SERVICE_URL}/users/{user_id}")
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+    return response.json()
 
 async def get_user_by_id(user_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/users/{user_id}")
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} not found"
-            )
-        return response.json()
\ No newline at end of file
+    # Concurrent lookups of one user share a single upstream call; misses are not cached
+    return await user_cache.get_or_load(user_id, lambda: fetch_user(user_id))
@@ -0,0 +1,125 @@
+"""Fixtures for the API tests (pip install -r requirements-dev.txt).
+
+Tests run against a throwaway database on TEST_MONGODB_URI when it is set,
+and against mongomock-motor in process otherwise. mongomock executes every
+command synchronously, so concurrency tests only exercise real interleaving
+inside MongoDB when TEST_MONGODB_URI points at a server:
+
+    TEST_MONGODB_URI=mongodb://localhost:27017 python -m pytest -q
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import os
+import uuid
+import httpx
+import pytest
+
+TEST_MONGODB_URI = os.getenv("TEST_MONGODB_URI")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def make_client():
+    if TEST_MONGODB_URI:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(TEST_MONGODB_URI)
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()
+
+
+def reset_process_state(monkeypatch):
+    """Forget everything the previous test left in module-level caches."""
+    from core.admission import admission
+    from services import catalog_service
+    from services.availability_service import availability_index
+    from services.booking_number_service import booking_numbers
+    from services.idempotency_service import idempotency_cache
+    from services.user_service import user_cache
+    from utils import pagination
+
+    for cache in (
+        catalog_service.service_cache,
+        catalog_service.service_page_cache,
+        catalog_service.catalog_version_cache,
+        idempotency_cache,
+        user_cache,
+    ):
+        cache.invalidate()
+    monkeypatch.setattr(catalog_service, "_seen_catalog_version", None)
+    monkeypatch.setattr(pagination, "_count_cache", {})
+    monkeypatch.setattr(availability_index, "_timelines", OrderedDict())
+    monkeypatch.setattr(booking_numbers, "_next", 0)
+    monkeypatch.setattr(booking_numbers, "_end", 0)
+    monkeypatch.setattr(admission, "buckets", OrderedDict())
+    monkeypatch.setattr(admission, "tenant_in_flight", {})
+    monkeypatch.setattr(admission, "in_flight", 0)
+    # On, as in production, so tests send what today's clients send and still pass
+    monkeypatch.setattr(admission, "enabled", True)
+
+
+@pytest.fixture
+async def database(monkeypatch):
+    import core.database as database
+
+    client = make_client()
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    monkeypatch.setattr(database, "client", client)
+    monkeypatch.setattr(database, "db", client[name])
+    monkeypatch.setattr(database, "DB_MIN_POOL_SIZE", 1)
+    reset_process_state(monkeypatch)
+    await database.init_db()
+    yield database.db
+    if TEST_MONGODB_URI:
+        await client.drop_database(name)
+        client.close()
+
+
+async def add_request_id(request: httpx.Request):
+    # x-request-id doubles as the idempotency key, so every request needs its own
+    request.headers.setdefault("x-request-id", uuid.uuid4().hex)
+
+
+@pytest.fixture
+async def client(database):
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://test",
+        event_hooks={"request": [add_request_id]},
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+def api():
+    from main import API_VERSION
+    return API_VERSION
+
+
+def slot_time(days: int = 2, hour: int = 3, minute: int = 0) -> datetime:
+    """A future UTC time; whole UTC hours are on the grid of 30- and 60-minute services."""
+    day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=days)
+    return day.replace(hour=hour, minute=minute)
+
+
+async def create_service(client: httpx.AsyncClient, api: str, **fields) -> dict:
+    body = {"name": "Haircut", "description": "Wash and cut", "duration": 60, "price": 20.0, **fields}
+    response = await client.post(f"{api}/biz-services/new", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["payload"]
+
+
+def booking_body(service: dict, appointment_time: datetime, tenant_id: str = "tenant-1", **fields) -> dict:
+    return {
+        "customer_name": "Nguyen Van A",
+        "phone_no": "0912345678",
+        "service_id": service["id"],
+        "appointment_time": appointment_time.isoformat(),
+        "tenant_id": tenant_id,
+        **fields,
+    }
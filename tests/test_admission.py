@@ -0,0 +1,68 @@
+from collections import Counter
+import asyncio
+import pytest
+from core.admission import SHARED_TENANT, admission
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def admission_on(monkeypatch):
+    # A small burst and no refill within the test
+    monkeypatch.setattr(admission, "enabled", True)
+    monkeypatch.setattr(admission, "tenant_burst", 5)
+    monkeypatch.setattr(admission, "tenant_rate", 0.001)
+    monkeypatch.setattr(admission, "shared_burst", 5)
+    monkeypatch.setattr(admission, "shared_rate", 0.001)
+
+
+async def test_noisy_tenant_is_throttled_without_affecting_others(client, api, admission_on):
+    responses = await asyncio.gather(*[
+        client.get(f"{api}/biz-services", headers={"x-tenant-id": "noisy"})
+        for _ in range(20)
+    ])
+    statuses = Counter(response.status_code for response in responses)
+    assert statuses == {200: 5, 429: 15}
+    assert all(response.headers["retry-after"] for response in responses if response.status_code == 429)
+
+    for tenant in ("polite-1", "polite-2", "polite-3"):
+        response = await client.get(f"{api}/biz-services", headers={"x-tenant-id": tenant})
+        assert response.status_code == 200
+
+
+async def test_body_tenant_routes_are_charged_to_the_header_tenant(client, api, admission_on, monkeypatch):
+    monkeypatch.setattr(admission, "enabled", False)
+    service = await create_service(client, api)
+    monkeypatch.setattr(admission, "enabled", True)
+
+    # Creates from different tenants behind one proxy address do not share a bucket
+    for hour in range(1, 6):
+        body = booking_body(service, slot_time(hour=hour), tenant_id="noisy")
+        response = await client.post(f"{api}/bookings/new", json=body, headers={"x-tenant-id": "noisy"})
+        assert response.status_code == 200
+    body = booking_body(service, slot_time(hour=6), tenant_id="noisy")
+    assert (await client.post(f"{api}/bookings/new", json=body, headers={"x-tenant-id": "noisy"})).status_code == 429
+
+    body = booking_body(service, slot_time(hour=6), tenant_id="polite")
+    assert (await client.post(f"{api}/bookings/new", json=body, headers={"x-tenant-id": "polite"})).status_code == 200
+
+
+async def test_legacy_clients_without_a_tenant_still_succeed(client, api, database):
+    # Production defaults: what today's H5 and admin clients send, with no tenant header
+    assert admission.enabled
+    service = await create_service(client, api)
+    assert (await client.get(f"{api}/biz-services")).status_code == 200
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time()))
+    assert created.status_code == 200
+    booking = created.json()["payload"]
+    assert (await client.get(f"{api}/bookings/{booking['id']}")).status_code == 200
+    assert list(admission.buckets) == [SHARED_TENANT]
+
+
+async def test_requests_without_a_tenant_share_one_bucket(client, api, admission_on):
+    statuses = Counter([(await client.get(f"{api}/biz-services")).status_code for _ in range(6)])
+    assert statuses == {200: 5, 429: 1}
+    # Named tenants keep their own buckets
+    assert (await client.get(f"{api}/biz-services", headers={"x-tenant-id": "tenant-1"})).status_code == 200
+    assert (await client.get(f"{api}/bookings", params={"tenant_id": "tenant-2", "cursor": ""})).status_code == 200
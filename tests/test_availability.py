@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+import pytest
+from services import availability_service
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+def local_midnight(days: int = 2) -> datetime:
+    """UTC instant of midnight at the business, days ahead (UTC+7 by default)."""
+    offset = timedelta(minutes=availability_service.BUSINESS_UTC_OFFSET_MINUTES)
+    return (slot_time(days=days, hour=0) + offset).replace(hour=0) - offset
+
+
+async def free_slots(client, api, service, start, end, tenant_id="tenant-1"):
+    response = await client.get(f"{api}/bookings/availability", params={
+        "service_id": service["id"],
+        "tenant_id": tenant_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    return [
+        (datetime.fromisoformat(slot["start"]), datetime.fromisoformat(slot["end"]))
+        for slot in response.json()["payload"]["slots"]
+    ]
+
+
+async def test_slots_cover_business_hours_in_the_business_time_zone(client, api):
+    service = await create_service(client, api, duration=60)
+    midnight = local_midnight()
+
+    slots = await free_slots(client, api, service, midnight, midnight + timedelta(days=1))
+    # 08:00-20:00 at UTC+7 is 01:00-13:00 UTC
+    assert [start.hour for start, _ in slots] == list(range(1, 13))
+    assert all(end - start == timedelta(hours=1) for start, end in slots)
+    assert slots[0][0] == midnight + timedelta(hours=8)
+    assert slots[-1][1] == midnight + timedelta(hours=20)
+
+
+async def test_slots_follow_the_configured_utc_offset(client, api, monkeypatch):
+    monkeypatch.setattr(availability_service, "BUSINESS_UTC_OFFSET_MINUTES", 0)
+    service = await create_service(client, api, duration=90)
+    midnight = slot_time(hour=0)
+
+    slots = await free_slots(client, api, service, midnight, midnight + timedelta(days=1))
+    # 08:00 to 20:00 in 90-minute steps; the last one ends exactly at closing
+    assert [start.strftime("%H:%M") for start, _ in slots] == [
+        "08:00", "09:30", "11:00", "12:30", "14:00", "15:30", "17:00", "18:30"
+    ]
+
+
+async def test_booked_slot_is_left_out_for_its_tenant_only(client, api):
+    service = await create_service(client, api, duration=60)
+    midnight = local_midnight()
+    day = (midnight, midnight + timedelta(days=1))
+    # Warm the in-process index first, so the booking has to update it
+    assert len(await free_slots(client, api, service, *day)) == 12
+
+    booked = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    assert booked.status_code == 200
+
+    starts = [start.hour for start, _ in await free_slots(client, api, service, *day)]
+    assert 3 not in starts and len(starts) == 11
+    assert len(await free_slots(client, api, service, *day, tenant_id="tenant-2")) == 12
+
+    # Canceling frees the slot again
+    assert (await client.delete(f"{api}/bookings/{booked.json()['payload']['id']}")).status_code == 200
+    assert len(await free_slots(client, api, service, *day)) == 12
+
+
+async def test_slot_stays_free_until_its_capacity_is_taken(client, api):
+    service = await create_service(client, api, duration=60, capacity=2)
+    window = (slot_time(hour=3), slot_time(hour=4))
+
+    assert len(await free_slots(client, api, service, *window)) == 1
+    await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    assert len(await free_slots(client, api, service, *window)) == 1
+    await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3), customer_name="Tran Thi B"))
+    assert await free_slots(client, api, service, *window) == []
+
+
+async def test_range_across_the_business_day_boundary(client, api):
+    service = await create_service(client, api, duration=60)
+    midnight = local_midnight()
+
+    # 18:30 local on one day to 09:30 local the next: the partial slots at both ends are left out
+    slots = await free_slots(client, api, service, midnight + timedelta(hours=18, minutes=30), midnight + timedelta(days=1, hours=9, minutes=30))
+    assert [start for start, _ in slots] == [
+        midnight + timedelta(hours=19),
+        midnight + timedelta(days=1, hours=8),
+    ]
+
+
+async def test_invalid_ranges_are_rejected(client, api):
+    service = await create_service(client, api)
+    start = slot_time()
+
+    assert (await client.get(f"{api}/bookings/availability", params={
+        "service_id": service["id"], "tenant_id": "tenant-1", "start": start.isoformat(), "end": start.isoformat()
+    })).status_code == 400
+    too_long = start + timedelta(days=availability_service.AVAILABILITY_MAX_DAYS + 1)
+    assert (await client.get(f"{api}/bookings/availability", params={
+        "service_id": service["id"], "tenant_id": "tenant-1", "start": start.isoformat(), "end": too_long.isoformat()
+    })).status_code == 400
@@ -0,0 +1,49 @@
+import asyncio
+import uuid
+import pytest
+from benchmarks.bench_booking_numbers import allocate_in_processes, is_increasing
+from services.booking_number_service import BookingNumberAllocator
+from tests.conftest import TEST_MONGODB_URI
+
+pytestmark = pytest.mark.anyio
+
+TOTAL = 1_000_000
+WORKERS = 8
+BATCH = 1000
+
+
+async def allocate(allocator: BookingNumberAllocator, count: int):
+    numbers = []
+    while len(numbers) < count:
+        take = min(BATCH, count - len(numbers))
+        numbers.extend(await asyncio.gather(*[allocator.next() for _ in range(take)]))
+    return numbers
+
+
+async def test_workers_sharing_one_counter_never_repeat_a_number(database):
+    # One allocator per worker, interleaved on the event loop, leasing from the same counter
+    allocators = [BookingNumberAllocator(block_size=1000) for _ in range(WORKERS)]
+    results = await asyncio.gather(*[allocate(allocator, TOTAL // WORKERS) for allocator in allocators])
+
+    numbers = [number for result in results for number in result]
+    assert len(numbers) == TOTAL
+    assert len(set(numbers)) == TOTAL
+    assert all(is_increasing(result) for result in results)
+
+
+@pytest.mark.skipif(not TEST_MONGODB_URI, reason="worker processes need a shared MongoDB server (TEST_MONGODB_URI)")
+def test_processes_sharing_one_counter_never_repeat_a_number(monkeypatch):
+    from pymongo import MongoClient
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    # Spawned workers pick their database from BENCH_DB_NAME on import
+    monkeypatch.setenv("BENCH_DB_NAME", name)
+    try:
+        results = allocate_in_processes(TOTAL, WORKERS, BATCH, TEST_MONGODB_URI)
+    finally:
+        MongoClient(TEST_MONGODB_URI).drop_database(name)
+
+    numbers = [number for result in results for number in result]
+    assert len(numbers) == TOTAL
+    assert len(set(numbers)) == TOTAL
+    assert all(is_increasing(result) for result in results)
@@ -0,0 +1,84 @@
+from datetime import timedelta
+import pytest
+from api.v1.endpoints import appointments
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+async def bulk(client, api, items, **params):
+    response = await client.post(f"{api}/bookings/bulk", json={"items": items}, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()["payload"]
+
+
+async def test_every_item_gets_its_own_result(client, api, database):
+    service = await create_service(client, api)
+    items = [
+        booking_body(service, slot_time(hour=1)),
+        {"customer_name": "Missing fields"},
+        booking_body({"id": "65f000000000000000000000"}, slot_time(hour=2)),
+        booking_body(service, slot_time(days=-1, hour=3)),
+        booking_body(service, slot_time(hour=4), service_name="Coloring"),
+        booking_body(service, slot_time(hour=5)),
+    ]
+
+    payload = await bulk(client, api, items)
+    assert (payload["created"], payload["failed"]) == (2, 4)
+    results = payload["results"]
+    assert [result["index"] for result in results] == list(range(len(items)))
+    assert [result["status"] for result in results] == ["created", "failed", "failed", "failed", "failed", "created"]
+    assert "phone_no: Field required" in results[1]["error"]
+    assert results[2]["error"] == "Service not found"
+    assert results[3]["error"] == "Appointment time must be in the future"
+    assert "does not match" in results[4]["error"]
+
+    created = [result for result in results if result["status"] == "created"]
+    assert all(result["id"] and result["booking_number"] for result in created)
+    assert len({result["booking_number"] for result in created}) == 2
+    assert await database["bookings"].count_documents({}) == 2
+
+
+async def test_off_grid_times_fail(client, api, database):
+    service = await create_service(client, api, duration=60)
+    payload = await bulk(client, api, [booking_body(service, slot_time(hour=3, minute=30))])
+
+    assert payload["results"][0]["error"] == "Appointment time must start on a 60-minute slot boundary"
+    assert await database["bookings"].count_documents({}) == 0
+
+
+async def test_slot_conflicts_within_one_batch(client, api, database):
+    service = await create_service(client, api, capacity=2)
+    items = [booking_body(service, slot_time(hour=3), customer_name=f"Customer {i}") for i in range(4)]
+
+    payload = await bulk(client, api, items, chunk_size=3)
+    assert [result["status"] for result in payload["results"]].count("created") == 2
+    assert {result["error"] for result in payload["results"] if result["status"] == "failed"} == {"This time slot is already booked"}
+    claim = await database["booking_slots"].find_one({})
+    assert claim["taken"] == 2
+    assert await database["bookings"].count_documents({}) == 2
+
+
+async def test_slot_conflicts_with_existing_bookings(client, api, database):
+    service = await create_service(client, api)
+    assert (await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))).status_code == 200
+
+    payload = await bulk(client, api, [
+        booking_body(service, slot_time(hour=3)),
+        booking_body(service, slot_time(hour=4)),
+        # Another tenant has its own slots
+        booking_body(service, slot_time(hour=3), tenant_id="tenant-2"),
+    ])
+    assert [result["status"] for result in payload["results"]] == ["failed", "created", "created"]
+    assert payload["results"][0]["error"] == "This time slot is already booked"
+
+
+async def test_batch_size_is_limited(client, api, monkeypatch):
+    service = await create_service(client, api)
+    monkeypatch.setattr(appointments, "BULK_MAX_ITEMS", 3)
+    items = [booking_body(service, slot_time(hour=1) + timedelta(hours=i)) for i in range(4)]
+
+    response = await client.post(f"{api}/bookings/bulk", json={"items": items})
+    assert response.status_code == 400
+    assert "at most 3 bookings" in response.json()["detail"]
+    assert (await client.post(f"{api}/bookings/bulk", json={"items": []})).status_code == 400
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from utils.cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Loader:
+    def __init__(self, value="loaded", error: Exception = None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.value
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = TTLCache(maxsize=10, ttl=60)
+    loader = Loader()
+    callers = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    loader.release.set()
+
+    assert await asyncio.gather(*callers) == ["loaded"] * 5
+    assert loader.calls == 1
+    assert cache.get("key") == (True, "loaded")
+
+
+async def test_cancelling_the_leading_caller_does_not_fail_the_waiters():
+    cache = TTLCache(maxsize=10, ttl=60)
+    loader = Loader()
+    leader = asyncio.create_task(cache.get_or_load("key", loader))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    loader.release.set()
+
+    assert await asyncio.gather(*waiters) == ["loaded"] * 3
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert loader.calls == 1
+    # The load finished for the waiters and was stored
+    assert cache.get("key") == (True, "loaded")
+
+
+async def test_cancelled_waiter_leaves_the_load_running():
+    cache = TTLCache(maxsize=10, ttl=60)
+    loader = Loader()
+    leader = asyncio.create_task(cache.get_or_load("key", loader))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_load("key", loader))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    loader.release.set()
+    assert await leader == "loaded"
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+
+async def test_load_errors_reach_every_caller_and_are_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    loader = Loader(error=RuntimeError("database down"))
+    callers = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    loader.release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") == (False, None)
+
+
+async def test_invalidation_during_a_load_keeps_the_stale_result_out():
+    cache = TTLCache(maxsize=10, ttl=60)
+    loader = Loader()
+    caller = asyncio.create_task(cache.get_or_load("key", loader))
+    await asyncio.sleep(0)
+    cache.invalidate("key")
+    loader.release.set()
+
+    assert await caller == "loaded"
+    assert cache.get("key") == (False, None)
@@ -0,0 +1,74 @@
+from bson import ObjectId
+import pytest
+import core.database as core_database
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_schema_sync_drops_obsolete_indexes(database):
+    bookings = database["bookings"]
+    await bookings.create_index([("tenant_id", 1), ("appointment_time", 1), ("_id", 1)], name="tenant_time_id")
+    await bookings.create_index("customer_name")
+    await bookings.create_index("phone_no")
+    # A deployment from before the index was listed as obsolete
+    await database["schema_meta"].delete_many({})
+
+    await core_database.init_db()
+
+    indexes = await bookings.index_information()
+    assert not {"tenant_time_id", "customer_name_1", "phone_no_1"} & set(indexes)
+    assert "tenant_time_id_summary" in indexes
+
+
+async def test_unchanged_schema_skips_index_work(database, monkeypatch):
+    calls = []
+
+    async def record_drop():
+        calls.append(True)
+
+    monkeypatch.setattr(core_database, "drop_obsolete_indexes", record_drop)
+    await core_database.init_db()
+    assert calls == []
+
+
+async def legacy_duplicate_numbers(database):
+    """Bookings from before the unique index, three sharing one number."""
+    from tests.conftest import slot_time
+    bookings = database["bookings"]
+    await bookings.drop_index("booking_number")
+    await bookings.insert_many([
+        {"customer_name": "A", "phone_no": "0912345678", "service_id": ObjectId(), "appointment_time": slot_time(), "booking_number": number}
+        for number in ["BK-1", "BK-1", "BK-2", "BK-1"]
+    ])
+    # The next start syncs the schema again
+    await database["schema_meta"].delete_many({})
+    return bookings
+
+
+async def test_duplicate_booking_numbers_fail_startup_with_the_repair_command(database):
+    await legacy_duplicate_numbers(database)
+
+    with pytest.raises(core_database.SchemaMigrationError, match="--renumber-duplicates"):
+        await core_database.init_db()
+    # Nothing was recorded, so the next start tries again
+    assert await database["schema_meta"].count_documents({}) == 0
+
+
+async def test_renumbering_duplicates_lets_the_unique_index_build(database):
+    from services.booking_number_service import find_duplicate_booking_numbers, renumber_duplicates
+    bookings = await legacy_duplicate_numbers(database)
+    first = await bookings.find_one({"booking_number": "BK-1"}, sort=[("_id", 1)])
+
+    assert list(await find_duplicate_booking_numbers()) == ["BK-1"]
+    changes = await renumber_duplicates()
+    assert [change["old"] for change in changes] == ["BK-1", "BK-1"]
+    assert await find_duplicate_booking_numbers() == {}
+    # The oldest booking keeps its number
+    assert (await bookings.find_one({"_id": first["_id"]}))["booking_number"] == "BK-1"
+
+    await core_database.init_db()
+    assert (await bookings.index_information())["booking_number"]["unique"]
+
+
+async def test_get_db_returns_the_connected_database(database):
+    assert core_database.get_db() is database
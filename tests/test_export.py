@@ -0,0 +1,60 @@
+import json
+import pytest
+from models.appointment import Appointment
+from services import export_service
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_export_streams_every_booking(client, api):
+    service = await create_service(client, api)
+    for hour in (1, 2, 3):
+        await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour)))
+
+    response = await client.get(f"{api}/bookings/export", params={"tenant_id": "tenant-1", "batch_size": 2})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["appointment_time"][11:13] for row in rows] == ["01", "02", "03"]
+
+
+async def test_abandoned_export_closes_its_cursor(client, api, monkeypatch):
+    service = await create_service(client, api)
+    for hour in (1, 2, 3):
+        await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour)))
+
+    closed = []
+    collection = Appointment.get_motor_collection()
+    find = collection.find
+
+    def tracking_find(*args, **kwargs):
+        cursor = find(*args, **kwargs)
+        close = cursor.close
+
+        async def tracking_close():
+            closed.append(cursor)
+            await close()
+
+        cursor.close = tracking_close
+        return cursor
+
+    monkeypatch.setattr(collection, "find", tracking_find)
+    monkeypatch.setattr(Appointment, "get_motor_collection", classmethod(lambda cls: collection))
+    stream = export_service.stream_bookings({"tenant_id": "tenant-1"}, "ndjson", batch_size=1)
+    first = await stream.__anext__()
+    assert json.loads(first.splitlines()[0])["tenant_id"] == "tenant-1"
+    assert closed == []
+
+    # What the server does when the client goes away mid-stream
+    await stream.aclose()
+    assert len(closed) == 1
+
+
+@pytest.mark.parametrize("tenant_id, filename, encoded", [
+    ("tenant-1", "bookings-tenant-1.csv", "bookings-tenant-1.csv"),
+    ("chi-nhánh-Đức", "bookings-chi-nh_nh-__c.csv", "bookings-chi-nh%C3%A1nh-%C4%90%E1%BB%A9c.csv"),
+    ('a"b', "bookings-a_b.csv", "bookings-a%22b.csv"),
+])
+async def test_export_filename_is_a_safe_header(client, api, tenant_id, filename, encoded):
+    response = await client.get(f"{api}/bookings/export", params={"tenant_id": tenant_id, "format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == f"attachment; filename=\"{filename}\"; filename*=UTF-8''{encoded}"
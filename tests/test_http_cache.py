@@ -0,0 +1,109 @@
+import pytest
+from bson import ObjectId
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+def service_url(api, service_id):
+    # The single-service route has no slash between the prefix and the id
+    return f"{api}/biz-services{service_id}"
+
+
+async def revalidate(client, url, etag):
+    return await client.get(url, headers={"if-none-match": etag})
+
+
+async def test_service_revalidates_until_it_changes(client, api):
+    service = await create_service(client, api)
+    url = service_url(api, service["id"])
+
+    first = await client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public")
+    # A second read carries another request id but the same validator
+    assert (await client.get(url)).headers["etag"] == etag
+
+    unchanged = await revalidate(client, url, etag)
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert unchanged.content == b""
+    # Proxies may weaken the validator; If-None-Match compares weakly
+    assert (await revalidate(client, url, f'"other", W/{etag}')).status_code == 304
+
+    assert (await client.put(f"{api}/biz-services/{service['id']}", json={"price": 25.0})).status_code == 200
+    changed = await revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["payload"]["price"] == 25.0
+
+
+async def test_service_star_matches_only_an_existing_service(client, api):
+    service = await create_service(client, api)
+    assert (await revalidate(client, service_url(api, service["id"]), "*")).status_code == 304
+    assert (await revalidate(client, service_url(api, ObjectId()), "*")).status_code == 404
+
+    assert (await client.delete(f"{api}/biz-services/{service['id']}")).status_code == 200
+    assert (await revalidate(client, service_url(api, service["id"]), "*")).status_code == 404
+
+
+async def test_service_listing_revalidates_against_the_catalog_version(client, api):
+    await create_service(client, api)
+    first = await client.get(f"{api}/biz-services")
+    etag = first.headers["etag"]
+    assert (await revalidate(client, f"{api}/biz-services", etag)).status_code == 304
+    # Another page of the same catalog has its own validator
+    assert (await client.get(f"{api}/biz-services", params={"limit": 1})).headers["etag"] != etag
+
+    await create_service(client, api, name="Coloring")
+    changed = await revalidate(client, f"{api}/biz-services", etag)
+    assert changed.status_code == 200
+    assert len(changed.json()["payload"]["content"]) == 2
+
+
+async def test_booking_etag_follows_its_version(client, api):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time()))
+    booking = created.json()["payload"]
+    url = f"{api}/bookings/{booking['id']}"
+
+    first = await client.get(url)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert (await revalidate(client, url, etag)).status_code == 304
+
+    edited = booking_body(service, slot_time(), status="confirmed", notes="Bring ID")
+    assert (await client.put(url, json=edited)).status_code == 200
+    updated = await revalidate(client, url, etag)
+    assert updated.status_code == 200
+    assert updated.json()["payload"]["notes"] == "Bring ID"
+    updated_etag = updated.headers["etag"]
+    assert updated_etag != etag
+
+    # Cancelling is the delete
+    assert (await client.delete(url)).status_code == 200
+    canceled = await revalidate(client, url, updated_etag)
+    assert canceled.status_code == 200
+    assert canceled.json()["payload"]["status"] == "canceled"
+
+
+async def test_booking_etag_changes_when_a_backfill_rewrites_it(client, api, database):
+    from services.snapshot_service import backfill_service_snapshots
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time()))
+    url = f"{api}/bookings/{created.json()['payload']['id']}"
+    await database["bookings"].update_many({}, {"$set": {"service_snapshot": None}})
+    etag = (await client.get(url)).headers["etag"]
+
+    await backfill_service_snapshots()
+    refreshed = await revalidate(client, url, etag)
+    assert refreshed.status_code == 200
+    assert refreshed.json()["payload"]["service_snapshot"]["name"] == "Haircut"
+
+
+async def test_booking_star_matches_only_an_existing_booking(client, api):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time()))
+    assert (await revalidate(client, f"{api}/bookings/{created.json()['payload']['id']}", "*")).status_code == 304
+    assert (await revalidate(client, f"{api}/bookings/{ObjectId()}", "*")).status_code == 404
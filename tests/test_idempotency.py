@@ -0,0 +1,155 @@
+from datetime import timedelta
+import asyncio
+import pytest
+from fastapi.responses import JSONResponse
+from services import idempotency_service
+from services.idempotency_service import REPLAY_HEADER, idempotency_cache
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+SERVICE = {"name": "Haircut", "description": "Wash and cut", "duration": 60, "price": 20.0}
+
+
+async def test_retry_with_the_same_key_replays_the_first_response(client, api, database):
+    first = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+    retry = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+
+    assert first.status_code == retry.status_code == 200
+    assert REPLAY_HEADER.lower() not in first.headers
+    assert retry.headers[REPLAY_HEADER.lower()] == "true"
+    assert retry.json()["payload"] == first.json()["payload"]
+    assert await database["services"].count_documents({}) == 1
+
+
+async def test_replay_survives_the_in_process_cache(client, api, database):
+    first = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+    # As seen by another worker: only the stored record is left
+    idempotency_cache.invalidate()
+    retry = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+
+    assert retry.headers[REPLAY_HEADER.lower()] == "true"
+    assert retry.json()["payload"] == first.json()["payload"]
+    assert await database["services"].count_documents({}) == 1
+
+
+async def test_concurrent_requests_with_one_key_run_the_handler_once(client, api, database):
+    service = await create_service(client, api, capacity=5)
+    body = booking_body(service, slot_time())
+
+    responses = await asyncio.gather(*[
+        client.post(f"{api}/bookings/new", json=body, headers={"idempotency-key": "booking-1"})
+        for _ in range(10)
+    ])
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["payload"]["id"] for response in responses}) == 1
+    assert sum(REPLAY_HEADER.lower() not in response.headers for response in responses) == 1
+    assert await database["bookings"].count_documents({}) == 1
+
+
+async def test_concurrent_workers_wait_for_the_owner_of_the_key(database):
+    # Two workers share nothing but the idempotency_keys collection
+    runs = []
+
+    async def handler():
+        runs.append(True)
+        await asyncio.sleep(0.05)
+        return JSONResponse({"created": len(runs)}, status_code=201)
+
+    first, second = await asyncio.gather(
+        idempotency_service._execute("test:key", "fingerprint", handler),
+        idempotency_service._execute("test:key", "fingerprint", handler),
+    )
+
+    assert len(runs) == 1
+    assert first.body == second.body == b'{"created":1}'
+    assert sorted([first.replayed, second.replayed]) == [False, True]
+
+
+async def test_same_key_with_a_different_body_is_rejected(client, api, database):
+    await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+    other = await client.post(f"{api}/biz-services/new", json={**SERVICE, "price": 30.0}, headers={"idempotency-key": "create-1"})
+
+    assert other.status_code == 422
+    assert await database["services"].count_documents({}) == 1
+
+
+async def test_stale_pending_key_is_taken_over(client, api, database):
+    # A worker died holding the key before it stored a response
+    now = idempotency_service._utcnow()
+    await database["idempotency_keys"].insert_one({
+        "_id": "services.create:create-1",
+        "state": "pending",
+        "fingerprint": "from-the-dead-worker",
+        "locked_until": now - timedelta(seconds=1),
+        "expires_at": now + timedelta(days=1),
+    })
+
+    response = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+    assert response.status_code == 200
+    assert REPLAY_HEADER.lower() not in response.headers
+    record = await database["idempotency_keys"].find_one({"_id": "services.create:create-1"})
+    assert record["state"] == "done"
+    assert await database["services"].count_documents({}) == 1
+
+
+async def test_live_pending_key_answers_409_after_the_wait(client, api, database, monkeypatch):
+    monkeypatch.setattr(idempotency_service, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    now = idempotency_service._utcnow()
+    await database["idempotency_keys"].insert_one({
+        "_id": "services.create:create-1",
+        "state": "pending",
+        "fingerprint": "another-worker",
+        "locked_until": now + timedelta(minutes=1),
+        "expires_at": now + timedelta(days=1),
+    })
+
+    response = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"idempotency-key": "create-1"})
+    assert response.status_code == 409
+    assert await database["services"].count_documents({}) == 0
+
+
+async def test_key_is_released_when_the_handler_fails(database):
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        await idempotency_service._execute("test:key", "fingerprint", failing)
+    assert await database["idempotency_keys"].count_documents({}) == 0
+
+    async def succeeding():
+        return JSONResponse({"ok": True})
+
+    stored = await idempotency_service._execute("test:key", "fingerprint", succeeding)
+    assert not stored.replayed
+    assert stored.body == b'{"ok":true}'
+
+
+async def test_error_responses_are_not_replayed(client, api, database):
+    service = await create_service(client, api)
+    taken = booking_body(service, slot_time(), customer_name="First")
+    assert (await client.post(f"{api}/bookings/new", json=taken)).status_code == 200
+
+    body = booking_body(service, slot_time())
+    conflict = await client.post(f"{api}/bookings/new", json=body, headers={"idempotency-key": "booking-1"})
+    assert conflict.status_code == 409
+    assert await database["idempotency_keys"].count_documents({"_id": "bookings.create:booking-1"}) == 0
+
+    # Once the slot is free again the retry runs instead of replaying the 409
+    first = (await client.get(f"{api}/bookings", params={"tenant_id": "tenant-1", "cursor": ""})).json()["payload"]["content"][0]
+    assert (await client.delete(f"{api}/bookings/{first['id']}")).status_code == 200
+    retry = await client.post(f"{api}/bookings/new", json=body, headers={"idempotency-key": "booking-1"})
+    assert retry.status_code == 200
+    assert REPLAY_HEADER.lower() not in retry.headers
+
+
+async def test_request_id_is_the_key_without_an_idempotency_key(client, api, database):
+    first = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"x-request-id": "req-1"})
+    retry = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"x-request-id": "req-1"})
+    other = await client.post(f"{api}/biz-services/new", json=SERVICE, headers={"x-request-id": "req-2"})
+
+    assert retry.headers[REPLAY_HEADER.lower()] == "true"
+    assert retry.json()["payload"]["id"] == first.json()["payload"]["id"]
+    assert other.json()["payload"]["id"] != first.json()["payload"]["id"]
+    assert await database["services"].count_documents({}) == 2
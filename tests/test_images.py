@@ -0,0 +1,61 @@
+import httpx
+import pytest
+from core import http_client
+from services import image_service
+
+pytestmark = pytest.mark.anyio
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    received = []
+
+    async def handler(request: httpx.Request):
+        body = await request.aread()
+        received.append(body)
+        return httpx.Response(200, json={"urls": [f"https://cdn.test/{len(received)}.png"]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, "_client", client)
+    return received
+
+
+def upload(name: str = "a.png", content: bytes = PNG):
+    return ("files", (name, content, "image/png"))
+
+
+async def test_upload_forwards_all_files_in_one_request(client, api, upstream):
+    response = await client.post(f"{api}/biz-services/image/upload", data={"category": "hair"}, files=[upload("a.png"), upload("b.png")])
+    assert response.status_code == 200
+    assert response.json()["payload"] == {"urls": ["https://cdn.test/1.png"]}
+    assert len(upstream) == 1
+    assert b'filename="a.png"' in upstream[0] and b'filename="b.png"' in upstream[0]
+
+
+async def test_upload_each_returns_one_result_per_file(client, api, upstream):
+    response = await client.post(f"{api}/biz-services/image/upload/each", data={"category": "hair"}, files=[upload("a.png"), upload("b.png")])
+    assert response.status_code == 200
+    payload = response.json()["payload"]
+    assert isinstance(payload, list) and len(payload) == 2
+    assert len(upstream) == 2
+
+
+async def test_size_limit_message_follows_the_configured_limit(client, api, upstream, monkeypatch):
+    monkeypatch.setattr(image_service, "MAX_IMAGE_SIZE", 64)
+    response = await client.post(f"{api}/biz-services/image/upload", data={"category": "hair"}, files=[upload()])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File size exceeds 64 bytes limit"
+    assert upstream == []
+
+
+async def test_non_images_are_rejected_by_content(client, api, upstream):
+    response = await client.post(f"{api}/biz-services/image/upload", data={"category": "hair"}, files=[upload(content=b"GIF89a")])
+    assert response.status_code == 400
+    assert upstream == []
+
+
+@pytest.mark.parametrize("size, expected", [(4 * 1024 * 1024, "4MB"), (512 * 1024, "512KB"), (1500, "1500 bytes")])
+def test_format_size(size, expected):
+    assert image_service.format_size(size) == expected
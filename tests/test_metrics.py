@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+import httpx
+import pytest
+from bson import ObjectId
+from prometheus_client import REGISTRY
+from core.admission import admission
+from core.metrics import HTTPX_EVENT_HOOKS, CommandTimingListener, PoolMetricsListener
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_request_latency_is_labelled_by_route_template(client, api):
+    route = f"{api}/bookings/{{appointment_id}}"
+    before = sample("http_request_duration_seconds_count", method="GET", route=route, status="404")
+
+    ids = [str(ObjectId()) for _ in range(2)]
+    for booking_id in ids:
+        response = await client.get(f"{api}/bookings/{booking_id}")
+        assert response.status_code == 404
+
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="404") == before + 2
+    scraped = (await client.get("/metrics")).text
+    # Raw ids never become label values
+    assert f'route="{route}"' in scraped
+    assert not any(booking_id in scraped for booking_id in ids)
+
+
+async def test_unmatched_paths_share_one_label(client):
+    before = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+    await client.get("/no-such-path/1")
+    await client.get("/no-such-path/2")
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") == before + 2
+
+
+async def test_metrics_endpoint_exposes_cache_and_admission_state(client, api):
+    await client.get(f"{api}/biz-services")
+    await client.get(f"{api}/biz-services")
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert sample("cache_hits_total", cache="service_page") >= 1
+    assert sample("cache_misses_total", cache="service_page") >= 1
+    assert sample("admission_in_flight_limit") == admission.max_in_flight
+    # /metrics itself is neither timed nor required to carry x-request-id
+    assert 'route="/metrics"' not in response.text
+
+
+async def test_admission_rejections_are_counted_by_reason(client, api, monkeypatch):
+    monkeypatch.setattr(admission, "enabled", True)
+    monkeypatch.setattr(admission, "tenant_burst", 1)
+    monkeypatch.setattr(admission, "tenant_rate", 0.001)
+    before = sample("admission_rejections_total", reason="tenant_rate")
+
+    statuses = [(await client.get(f"{api}/biz-services", headers={"x-tenant-id": "metrics"})).status_code for _ in range(3)]
+
+    assert statuses == [200, 429, 429]
+    assert sample("admission_rejections_total", reason="tenant_rate") == before + 2
+
+
+def command_event(name: str, command: dict, request_id: int, duration_micros: int = 2000):
+    return SimpleNamespace(
+        command_name=name, command=command, connection_id=("db", 27017),
+        request_id=request_id, duration_micros=duration_micros,
+    )
+
+
+def test_command_listener_times_commands_per_collection():
+    listener = CommandTimingListener()
+    find_before = sample("mongodb_command_duration_seconds_count", collection="metrics_test", command="find")
+    more_before = sample("mongodb_command_duration_seconds_count", collection="metrics_test", command="getMore")
+    failed_before = sample("mongodb_command_failures_total", collection="metrics_test", command="insert")
+
+    listener.started(command_event("find", {"find": "metrics_test"}, 1))
+    listener.succeeded(command_event("find", {}, 1))
+    # getMore names its collection in a separate field
+    listener.started(command_event("getMore", {"getMore": 123, "collection": "metrics_test"}, 2))
+    listener.succeeded(command_event("getMore", {}, 2))
+    listener.started(command_event("insert", {"insert": "metrics_test"}, 3))
+    listener.failed(command_event("insert", {}, 3))
+
+    assert sample("mongodb_command_duration_seconds_count", collection="metrics_test", command="find") == find_before + 1
+    assert sample("mongodb_command_duration_seconds_count", collection="metrics_test", command="getMore") == more_before + 1
+    assert sample("mongodb_command_failures_total", collection="metrics_test", command="insert") == failed_before + 1
+    # Started events are not kept once their command finished
+    assert listener._collections == {}
+
+
+def test_pool_listener_tracks_open_and_checked_out_connections():
+    listener = PoolMetricsListener()
+    event = SimpleNamespace(address=("metrics-test", 27017), reason="timeout")
+
+    for _ in range(3):
+        listener.connection_created(event)
+    listener.connection_checked_out(event)
+    listener.connection_checked_out(event)
+    listener.connection_checked_in(event)
+    listener.connection_check_out_failed(event)
+
+    assert sample("mongodb_pool_connections", address="metrics-test:27017") == 3
+    assert sample("mongodb_pool_connections_in_use", address="metrics-test:27017") == 1
+    assert sample("mongodb_pool_checkout_failures_total", address="metrics-test:27017", reason="timeout") == 1
+    listener.pool_closed(event)
+    assert sample("mongodb_pool_connections", address="metrics-test:27017") == 0
+
+
+async def test_upstream_calls_are_timed_per_host():
+    before = sample("http_upstream_duration_seconds_count", host="upstream.test", method="GET", status="204")
+    transport = httpx.MockTransport(lambda request: httpx.Response(204))
+    async with httpx.AsyncClient(transport=transport, event_hooks=HTTPX_EVENT_HOOKS) as upstream:
+        await upstream.get("http://upstream.test/ping")
+    assert sample("http_upstream_duration_seconds_count", host="upstream.test", method="GET", status="204") == before + 1
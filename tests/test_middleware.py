@@ -0,0 +1,25 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_request_id_is_echoed_from_header_or_query(client, api):
+    response = await client.get(f"{api}/biz-services", headers={"x-request-id": "from-header"})
+    assert response.headers["x-request-id"] == "from-header"
+
+    # EventSource clients can only pass it in the URL
+    response = await client.get(f"{api}/biz-services?x-request-id=from-query", headers={"x-request-id": ""})
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "from-query"
+
+
+async def test_missing_request_id_is_rejected(client, api):
+    response = await client.get(f"{api}/biz-services", headers={"x-request-id": ""})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("encoded", ["%E2%82%AC", "abc%0D%0Ax-injected:1", "%00"])
+async def test_request_id_that_cannot_be_echoed_is_a_400_not_a_500(client, api, encoded):
+    response = await client.get(f"{api}/biz-services?x-request-id={encoded}", headers={"x-request-id": ""})
+    assert response.status_code == 400
+    assert "x-injected" not in response.headers
@@ -0,0 +1,85 @@
+import pytest
+from bson import ObjectId
+from utils import multi_get
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+async def book(client, api, service, hour, tenant_id="tenant-1"):
+    response = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour), tenant_id=tenant_id))
+    assert response.status_code == 200, response.text
+    return response.json()["payload"]
+
+
+async def test_services_come_back_in_request_order_with_the_missing_ids(client, api):
+    services = [await create_service(client, api, name=name) for name in ("Haircut", "Coloring", "Massage")]
+    absent = str(ObjectId())
+    ids = [services[2]["id"], absent, services[0]["id"], services[2]["id"], services[1]["id"]]
+
+    response = await client.post(f"{api}/biz-services/multi-get", json={"ids": ids})
+    assert response.status_code == 200
+    payload = response.json()["payload"]
+    # Duplicates are returned once, at their first position
+    assert [service["name"] for service in payload["content"]] == ["Massage", "Haircut", "Coloring"]
+    assert payload["missing"] == {"ids": [absent]}
+
+
+async def test_bookings_by_id_and_number_in_request_order(client, api):
+    service = await create_service(client, api)
+    first, second, third = [await book(client, api, service, hour) for hour in (1, 2, 3)]
+    absent = str(ObjectId())
+
+    response = await client.post(f"{api}/bookings/multi-get", json={
+        "ids": [third["id"], absent, first["id"], third["id"]],
+        # The first booking was already returned by id, so it is not repeated
+        "booking_numbers": [second["booking_number"], "BK-MISSING", first["booking_number"]],
+    })
+    assert response.status_code == 200
+    payload = response.json()["payload"]
+    assert [booking["id"] for booking in payload["content"]] == [third["id"], first["id"], second["id"]]
+    assert payload["missing"] == {"ids": [absent], "bookingNumbers": ["BK-MISSING"]}
+
+
+async def test_bookings_of_other_tenants_are_reported_missing(client, api):
+    service = await create_service(client, api)
+    own = await book(client, api, service, 1)
+    other = await book(client, api, service, 2, tenant_id="tenant-2")
+
+    response = await client.post(
+        f"{api}/bookings/multi-get",
+        params={"tenant_id": "tenant-1"},
+        json={"ids": [own["id"], other["id"]], "booking_numbers": [other["booking_number"]]}
+    )
+    payload = response.json()["payload"]
+    assert [booking["id"] for booking in payload["content"]] == [own["id"]]
+    assert payload["missing"] == {"ids": [other["id"]], "bookingNumbers": [other["booking_number"]]}
+
+
+async def test_sparse_fields_keep_the_matching_keys(client, api):
+    service = await create_service(client, api)
+    booking = await book(client, api, service, 1)
+
+    response = await client.post(
+        f"{api}/bookings/multi-get",
+        params={"fields": "status"},
+        json={"booking_numbers": [booking["booking_number"]]}
+    )
+    assert response.json()["payload"]["content"] == [
+        {"id": booking["id"], "booking_number": booking["booking_number"], "status": "Pending"}
+    ]
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/biz-services/multi-get", lambda ids: {"ids": ids}),
+    ("/bookings/multi-get", lambda ids: {"ids": ids[:2], "booking_numbers": [f"BK-{i}" for i in range(len(ids) - 2)]}),
+])
+async def test_batch_size_is_limited(client, api, monkeypatch, path, body):
+    monkeypatch.setattr(multi_get, "MULTI_GET_MAX_IDS", 3)
+    ids = [str(ObjectId()) for _ in range(4)]
+
+    too_many = await client.post(f"{api}{path}", json=body(ids))
+    assert too_many.status_code == 400
+    assert "at most 3 identifiers" in too_many.json()["detail"]
+    assert (await client.post(f"{api}{path}", json=body(ids[:3]))).status_code == 200
+    assert (await client.post(f"{api}{path}", json={})).status_code == 400
@@ -0,0 +1,25 @@
+import pytest
+from models.appointment import Appointment
+from utils.pagination import count_documents
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_filtered_counts_are_cached_unless_asked_not_to(client, api):
+    service = await create_service(client, api)
+    query = {"tenant_id": "tenant-1"}
+    await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=1)))
+    assert await count_documents(Appointment, query) == 1
+
+    await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=2)))
+    # Within the TTL the cached total is served
+    assert await count_documents(Appointment, query) == 1
+    assert await count_documents(Appointment, query, cached=False) == 2
+
+
+async def test_unfiltered_counts_use_collection_metadata(client, api):
+    service = await create_service(client, api)
+    for hour in (1, 2, 3):
+        await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour)))
+    assert await count_documents(Appointment, {}) == 3
@@ -0,0 +1,54 @@
+import pytest
+from core import query_plans
+
+pytestmark = pytest.mark.anyio
+
+
+class ExplainingDb:
+    """Answers explain with a fixed winning plan per filter."""
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    async def command(self, command):
+        shape = command["explain"]
+        plan = self.plans(shape.get("filter"), shape.get("sort"))
+        return {"queryPlanner": {"winningPlan": plan, "rejectedPlans": [{"stage": "COLLSCAN"}]}}
+
+
+def index_plan(query_filter, sort):
+    return {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+
+
+async def test_index_backed_plans_pass(database):
+    assert await query_plans.check_query_plans(ExplainingDb(index_plan)) == []
+
+
+async def test_blocking_sort_fails_the_check(database):
+    def sorting_tenant_pages(query_filter, sort):
+        if query_filter == {"tenant_id": query_plans.SAMPLE_TENANT} and sort == {"_id": 1}:
+            # What the skip pages got before the (tenant_id, _id) index
+            return {"stage": "SORT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+        return index_plan(query_filter, sort)
+
+    assert await query_plans.check_query_plans(ExplainingDb(sorting_tenant_pages)) == ["bookings.list.tenant"]
+
+
+async def test_collection_scans_fail_the_check(database):
+    def scanning_searches(query_filter, sort):
+        if query_filter and "phone_e164" in query_filter:
+            return {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}
+        return index_plan(query_filter, sort)
+
+    assert await query_plans.check_query_plans(ExplainingDb(scanning_searches)) == ["bookings.search.phone"]
+
+
+async def test_bounded_multi_get_sort_is_allowed(database):
+    shapes = {shape.name: shape for shape in query_plans.query_shapes()}
+    assert query_plans.plan_problems(shapes["bookings.multi_get"], {"SORT", "IXSCAN", "FETCH"}) == []
+    assert query_plans.plan_problems(shapes["bookings.list.tenant"], {"SORT", "IXSCAN", "FETCH"}) == ["SORT"]
+
+
+async def test_tenant_skip_pages_have_an_index_in_their_sort_order(database):
+    indexes = await database["bookings"].index_information()
+    assert list(indexes["tenant_by_id"]["key"]) == [("tenant_id", 1), ("_id", 1)]
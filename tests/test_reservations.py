@@ -0,0 +1,183 @@
+from datetime import timedelta
+import asyncio
+from collections import Counter
+from bson import ObjectId
+import pytest
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+CONCURRENT_BOOKINGS = 200
+
+
+@pytest.mark.parametrize("capacity", [1, 3])
+async def test_concurrent_bookings_of_one_slot_fill_exactly_its_capacity(client, api, database, capacity, monkeypatch):
+    from core.admission import admission
+    # More requests at once than admission lets in; this is about the slot claim alone
+    monkeypatch.setattr(admission, "enabled", False)
+    service = await create_service(client, api, capacity=capacity)
+    body = booking_body(service, slot_time())
+
+    responses = await asyncio.gather(*[
+        client.post(f"{api}/bookings/new", json=body)
+        for _ in range(CONCURRENT_BOOKINGS)
+    ])
+
+    statuses = Counter(response.status_code for response in responses)
+    assert statuses == {200: capacity, 409: CONCURRENT_BOOKINGS - capacity}
+    assert await database["bookings"].count_documents({}) == capacity
+    claim = await database["booking_slots"].find_one({})
+    assert claim["taken"] == len(claim["booking_ids"]) == capacity
+
+
+async def test_overlapping_off_grid_bookings_are_rejected(client, api):
+    service = await create_service(client, api, duration=60)
+    on_grid = slot_time(hour=3)
+
+    first = await client.post(f"{api}/bookings/new", json=booking_body(service, on_grid))
+    assert first.status_code == 200
+    # 10:30 and 11:15 local would snap to different slots yet overlap each other
+    for minutes in (30, 75):
+        response = await client.post(f"{api}/bookings/new", json=booking_body(service, on_grid + timedelta(minutes=minutes)))
+        assert response.status_code == 400
+        assert "60-minute slot boundary" in response.json()["detail"]
+
+
+async def test_update_to_off_grid_time_is_rejected(client, api):
+    service = await create_service(client, api, duration=60)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+
+    # Snaps to the same slot, so it claims nothing, but would overlap the next one
+    moved = booking_body(service, slot_time(hour=3, minute=30), status="confirmed")
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=moved)
+    assert response.status_code == 400
+    current = await client.get(f"{api}/bookings/{booking['id']}")
+    assert current.json()["payload"]["appointment_time"].startswith(slot_time(hour=3).strftime("%Y-%m-%dT%H:%M"))
+
+
+async def test_moving_a_booking_frees_its_old_slot(client, api, database):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+
+    moved = await client.put(f"{api}/bookings/{booking['id']}", json=booking_body(service, slot_time(hour=4), status="confirmed"))
+    assert moved.status_code == 200
+    taken = {claim["slot_start"].hour: claim["taken"] async for claim in database["booking_slots"].find({})}
+    assert taken == {3: 0, 4: 1}
+    # The old slot can be booked again, the new one cannot
+    assert (await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))).status_code == 200
+    assert (await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=4)))).status_code == 409
+
+
+async def test_move_into_a_full_slot_writes_nothing(client, api, database):
+    service = await create_service(client, api)
+    await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=4)))
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+
+    moved = await client.put(f"{api}/bookings/{booking['id']}", json=booking_body(service, slot_time(hour=4), status="confirmed"))
+    assert moved.status_code == 409
+    current = (await client.get(f"{api}/bookings/{booking['id']}")).json()["payload"]
+    assert current["version"] == booking["version"]
+    assert current["appointment_time"].startswith(slot_time(hour=3).strftime("%Y-%m-%dT%H:%M"))
+
+
+async def test_concurrent_write_between_claim_and_update_releases_the_new_seat(client, api, database, monkeypatch):
+    from api.v1.endpoints import appointments
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+
+    claim_slot = appointments.claim_slot
+
+    async def claim_then_interfere(appointment, service):
+        claim_id = await claim_slot(appointment, service)
+        # Another writer changes the booking after the seat is taken
+        await database["bookings"].update_one({"_id": appointment.id}, {"$inc": {"version": 1}})
+        return claim_id
+
+    monkeypatch.setattr(appointments, "claim_slot", claim_then_interfere)
+    moved = await client.put(f"{api}/bookings/{booking['id']}", json=booking_body(service, slot_time(hour=4), status="confirmed"))
+    assert moved.status_code == 409
+    taken = {claim["slot_start"].hour: claim["taken"] async for claim in database["booking_slots"].find({})}
+    assert taken == {3: 1, 4: 0}
+
+
+async def test_off_grid_booking_from_before_the_check_can_still_be_edited(client, api, database):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+    # As stored before times had to sit on the grid
+    off_grid = slot_time(hour=3, minute=20).replace(tzinfo=None)
+    await database["bookings"].update_one({"_id": ObjectId(booking["id"])}, {"$set": {"appointment_time": off_grid}})
+
+    edited = booking_body(service, slot_time(hour=3, minute=20), status="confirmed", notes="Bring ID")
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=edited)
+    assert response.status_code == 200
+    assert response.json()["payload"]["notes"] == "Bring ID"
+
+
+@pytest.fixture
+def booking_reads(database, monkeypatch):
+    """Count the reads update_appointment issues against the bookings collection."""
+    from models.appointment import Appointment
+    collection_type = type(Appointment.get_motor_collection())
+    reads = []
+    find_one = collection_type.find_one
+
+    def counting_find_one(self, *args, **kwargs):
+        if self.name == "bookings":
+            reads.append(args)
+        return find_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "find_one", counting_find_one)
+    return reads
+
+
+async def test_edit_that_keeps_the_slot_is_a_single_write(client, api, database, booking_reads):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+    booking_reads.clear()
+
+    edited = booking_body(service, slot_time(hour=3), status="confirmed", notes="Bring ID", version=booking["version"])
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=edited)
+    assert response.status_code == 200
+    assert response.json()["payload"]["notes"] == "Bring ID"
+    assert response.json()["payload"]["version"] == booking["version"] + 1
+    assert booking_reads == []
+    claim = await database["booking_slots"].find_one({})
+    assert claim["taken"] == 1
+
+    # Moving it falls back to reading the booking before claiming the new slot
+    moved = booking_body(service, slot_time(hour=4), status="confirmed")
+    assert (await client.put(f"{api}/bookings/{booking['id']}", json=moved)).status_code == 200
+    assert len(booking_reads) == 1
+
+
+async def test_stale_version_on_the_fast_path_is_a_conflict(client, api, booking_reads):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+    first = booking_body(service, slot_time(hour=3), status="confirmed", notes="first", version=booking["version"])
+    assert (await client.put(f"{api}/bookings/{booking['id']}", json=first)).status_code == 200
+
+    second = booking_body(service, slot_time(hour=3), status="confirmed", notes="second", version=booking["version"])
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=second)
+    assert response.status_code == 409
+    current = (await client.get(f"{api}/bookings/{booking['id']}")).json()["payload"]
+    assert current["notes"] == "first"
+
+
+async def test_reactivating_a_canceled_booking_claims_its_slot_again(client, api, database):
+    service = await create_service(client, api)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=3)))
+    booking = created.json()["payload"]
+    assert (await client.delete(f"{api}/bookings/{booking['id']}")).status_code == 200
+    assert (await database["booking_slots"].find_one({}))["taken"] == 0
+
+    # Same service and time, so only the canceled status keeps it off the fast path
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=booking_body(service, slot_time(hour=3), status="confirmed"))
+    assert response.status_code == 200
+    assert (await database["booking_slots"].find_one({}))["taken"] == 1
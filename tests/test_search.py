@@ -0,0 +1,88 @@
+import pytest
+from utils.search_keys import name_key, normalize_phone
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("phone", ["0912345678", "0912 345 678", "+84 912-345-678", "84912345678", "0084912345678", "(+84) 912.345.678"])
+def test_vietnamese_numbers_normalize_to_e164(phone):
+    assert normalize_phone(phone) == "+84912345678"
+
+
+@pytest.mark.parametrize("phone, expected", [("091", "+8491"), ("+84 9", "+849"), ("  ", None), (None, None), ("n/a", None)])
+def test_partial_numbers_normalize_for_prefix_search(phone, expected):
+    assert normalize_phone(phone) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Nguyễn  Văn Đức", "nguyen van duc"),
+    ("TRẦN THỊ Ánh", "tran thi anh"),
+    (" đặng ", "dang"),
+    ("", None),
+])
+def test_names_fold_case_and_diacritics(name, expected):
+    assert name_key(name) == expected
+
+
+async def book(client, api, service, hour, customer_name, phone_no, tenant_id="tenant-1"):
+    body = booking_body(service, slot_time(hour=hour), tenant_id=tenant_id, customer_name=customer_name, phone_no=phone_no)
+    response = await client.post(f"{api}/bookings/new", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["payload"]
+
+
+async def search(client, api, **params):
+    response = await client.get(f"{api}/bookings/search", params={"tenant_id": "tenant-1", **params})
+    assert response.status_code == 200, response.text
+    return [(row["customer_name"], row["appointment_time"][11:13]) for row in response.json()["payload"]]
+
+
+@pytest.fixture
+async def customers(client, api):
+    service = await create_service(client, api)
+    await book(client, api, service, 1, "Nguyễn Văn An", "0912 345 678")
+    await book(client, api, service, 2, "NGUYEN VAN BINH", "+84 912 000 111")
+    await book(client, api, service, 3, "Nguyễn Văn An", "84912345678")
+    await book(client, api, service, 4, "Đặng Thị Đức", "0987 654 321")
+    # Same name and number at another tenant
+    await book(client, api, service, 5, "Nguyễn Văn An", "0912345678", tenant_id="tenant-2")
+
+
+@pytest.mark.parametrize("phone", ["0912", "+84912", "84 912", "0084-912"])
+async def test_phone_search_matches_every_format(client, api, customers, phone):
+    # Phone order, then the newest booking of each number first
+    assert await search(client, api, phone=phone) == [
+        ("NGUYEN VAN BINH", "02"),
+        ("Nguyễn Văn An", "03"),
+        ("Nguyễn Văn An", "01"),
+    ]
+
+
+async def test_phone_search_narrows_with_more_digits(client, api, customers):
+    assert await search(client, api, phone="091 234") == [("Nguyễn Văn An", "03"), ("Nguyễn Văn An", "01")]
+    assert await search(client, api, phone="0999") == []
+
+
+@pytest.mark.parametrize("name", ["nguyen van", "Nguyễn Văn", "NGUYEN  VAN"])
+async def test_name_search_ignores_case_and_accents(client, api, customers, name):
+    # Name order, then newest first
+    assert await search(client, api, name=name) == [
+        ("Nguyễn Văn An", "03"),
+        ("Nguyễn Văn An", "01"),
+        ("NGUYEN VAN BINH", "02"),
+    ]
+
+
+async def test_name_search_folds_d_with_stroke(client, api, customers):
+    assert await search(client, api, name="dang thi duc") == [("Đặng Thị Đức", "04")]
+
+
+async def test_search_limit_keeps_the_first_matches(client, api, customers):
+    assert await search(client, api, name="nguyen", limit=2) == [("Nguyễn Văn An", "03"), ("Nguyễn Văn An", "01")]
+
+
+@pytest.mark.parametrize("params", [{}, {"phone": "0912", "name": "an"}, {"phone": "--"}])
+async def test_search_needs_exactly_one_usable_term(client, api, database, params):
+    response = await client.get(f"{api}/bookings/search", params={"tenant_id": "tenant-1", **params})
+    assert response.status_code == 400
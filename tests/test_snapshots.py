@@ -0,0 +1,110 @@
+import pytest
+from tests.conftest import booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def booking_updates(database, monkeypatch):
+    """Record every update_one sent to the bookings collection."""
+    from models.appointment import Appointment
+    collection_type = type(Appointment.get_motor_collection())
+    updates = []
+    update_one = collection_type.update_one
+
+    def recording_update_one(self, *args, **kwargs):
+        if self.name == "bookings":
+            updates.append(args)
+        return update_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "update_one", recording_update_one)
+    return updates
+
+
+async def book(client, api, service, hour=3, **fields):
+    response = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour), **fields))
+    assert response.status_code == 200, response.text
+    return response.json()["payload"]
+
+
+async def test_booking_keeps_its_snapshot_when_the_catalog_changes(client, api):
+    service = await create_service(client, api, price=20.0)
+    booking = await book(client, api, service)
+    assert booking["service_snapshot"] == {"name": "Haircut", "duration": 60, "price": 20.0}
+
+    assert (await client.put(f"{api}/biz-services/{service['id']}", json={"price": 25.0})).status_code == 200
+    current = (await client.get(f"{api}/bookings/{booking['id']}")).json()["payload"]
+    assert current["service_snapshot"]["price"] == 20.0
+
+
+async def test_moving_to_another_service_snapshots_it_in_the_same_write(client, api, booking_updates):
+    haircut = await create_service(client, api, price=20.0)
+    coloring = await create_service(client, api, name="Coloring", price=45.0)
+    booking = await book(client, api, haircut)
+
+    moved = booking_body(coloring, slot_time(hour=3), status="confirmed", version=booking["version"])
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=moved)
+    assert response.status_code == 200
+    assert response.json()["payload"]["service_snapshot"] == {"name": "Coloring", "duration": 60, "price": 45.0}
+    assert booking_updates == []
+
+    current = (await client.get(f"{api}/bookings/{booking['id']}")).json()["payload"]
+    assert current["service_snapshot"]["name"] == "Coloring"
+    assert current["version"] == booking["version"] + 1
+
+
+async def test_same_service_edit_keeps_the_original_snapshot(client, api):
+    service = await create_service(client, api, price=20.0)
+    booking = await book(client, api, service)
+    assert (await client.put(f"{api}/biz-services/{service['id']}", json={"price": 25.0})).status_code == 200
+
+    edited = booking_body(service, slot_time(hour=4), status="confirmed")
+    response = await client.put(f"{api}/bookings/{booking['id']}", json=edited)
+    assert response.status_code == 200
+    assert response.json()["payload"]["service_snapshot"]["price"] == 20.0
+
+
+@pytest.mark.parametrize("params", [{"cursor": ""}, {"skip": 0}], ids=["cursor", "skip"])
+async def test_listing_expands_the_current_service(client, api, params):
+    haircut = await create_service(client, api, price=20.0)
+    coloring = await create_service(client, api, name="Coloring", price=45.0)
+    await book(client, api, haircut, hour=3)
+    await book(client, api, haircut, hour=4)
+    await book(client, api, coloring, hour=5)
+    assert (await client.put(f"{api}/biz-services/{haircut['id']}", json={"price": 25.0})).status_code == 200
+
+    response = await client.get(f"{api}/bookings", params={"tenant_id": "tenant-1", "expand": "service", **params})
+    assert response.status_code == 200
+    content = response.json()["payload"]["content"]
+    assert [(row["service"]["name"], row["service"]["price"]) for row in content] == [
+        ("Haircut", 25.0), ("Haircut", 25.0), ("Coloring", 45.0)
+    ]
+    # The snapshot still holds the price the customer booked at
+    assert [row["service_snapshot"]["price"] for row in content] == [20.0, 20.0, 45.0]
+
+
+async def test_expand_with_sparse_fields_and_a_deleted_service(client, api):
+    haircut = await create_service(client, api)
+    coloring = await create_service(client, api, name="Coloring")
+    await book(client, api, haircut, hour=3)
+    await book(client, api, coloring, hour=4)
+    assert (await client.delete(f"{api}/biz-services/{coloring['id']}")).status_code == 200
+
+    response = await client.get(
+        f"{api}/bookings",
+        params={"tenant_id": "tenant-1", "cursor": "", "fields": "booking_number", "expand": "service"}
+    )
+    content = response.json()["payload"]["content"]
+    assert [row["service"] and row["service"]["name"] for row in content] == ["Haircut", None]
+    assert all(set(row) == {"id", "appointment_time", "booking_number", "service_id", "service"} for row in content)
+
+
+async def test_search_and_multi_get_expand_the_service(client, api):
+    service = await create_service(client, api)
+    booking = await book(client, api, service)
+
+    found = await client.get(f"{api}/bookings/search", params={"tenant_id": "tenant-1", "phone": "0912", "expand": "service"})
+    assert [row["service"]["id"] for row in found.json()["payload"]] == [service["id"]]
+
+    fetched = await client.post(f"{api}/bookings/multi-get", params={"expand": "service"}, json={"ids": [booking["id"]]})
+    assert [row["service"]["id"] for row in fetched.json()["payload"]["content"]] == [service["id"]]
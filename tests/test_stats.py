@@ -0,0 +1,100 @@
+from datetime import timedelta
+import pytest
+from bson import ObjectId
+from models.appointment import Appointment
+from services import stats_service
+from tests.conftest import TEST_MONGODB_URI, booking_body, create_service, slot_time
+
+pytestmark = pytest.mark.anyio
+
+# mongomock implements neither $merge nor $dateToString's timezone
+needs_server = pytest.mark.skipif(not TEST_MONGODB_URI, reason="the rollup rebuild needs a MongoDB server (TEST_MONGODB_URI)")
+
+
+def stats_params(days: int = 2) -> dict:
+    day = slot_time(days=days).date()
+    return {"tenant_id": "tenant-1", "start": (day - timedelta(days=1)).isoformat(), "end": (day + timedelta(days=1)).isoformat()}
+
+
+async def book(client, api, service, hours):
+    for hour in hours:
+        response = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=hour)))
+        assert response.status_code == 200
+
+
+@needs_server
+async def test_rebuild_repairs_rollups_and_drops_stale_rows(client, api, database):
+    service = await create_service(client, api)
+    await book(client, api, service, (1, 2, 3))
+    rollups = database["booking_rollups"]
+    await rollups.update_many({}, {"$set": {"bookings": 99}})
+    stale = {"tenant_id": "tenant-1", "day": "2000-01-01", "service_id": ObjectId(service["id"]), "status": "Pending", "bookings": 5}
+    await rollups.insert_one(stale)
+
+    await stats_service.rebuild_rollups("tenant-1")
+
+    assert await rollups.count_documents({"day": "2000-01-01"}) == 0
+    stats = (await client.get(f"{api}/bookings/stats", params=stats_params())).json()["payload"]
+    assert stats["total"] == 3
+
+
+@needs_server
+async def test_rebuild_never_empties_the_rollups(client, api, database, monkeypatch):
+    service = await create_service(client, api)
+    await book(client, api, service, (1, 2, 3))
+    rollups = database["booking_rollups"]
+    collection = Appointment.get_motor_collection()
+    aggregate = collection.aggregate
+    seen = []
+
+    class ObservedCursor:
+        def __init__(self, cursor):
+            self.cursor = cursor
+
+        async def to_list(self, length=None):
+            # What a stats request would read just before the rebuilt rows land
+            seen.append(await rollups.count_documents({"tenant_id": "tenant-1"}))
+            return await self.cursor.to_list(length=length)
+
+    monkeypatch.setattr(collection, "aggregate", lambda pipeline, *args, **kwargs: ObservedCursor(aggregate(pipeline, *args, **kwargs)))
+    monkeypatch.setattr(Appointment, "get_motor_collection", classmethod(lambda cls: collection))
+    await stats_service.rebuild_rollups("tenant-1")
+
+    assert seen == [3]
+
+
+async def test_revenue_uses_the_price_each_booking_was_made_at(client, api):
+    service = await create_service(client, api, price=20.0)
+    await book(client, api, service, (1, 2))
+    update = await client.put(f"{api}/biz-services/{service['id']}", json={"price": 50.0})
+    assert update.status_code == 200
+    await book(client, api, service, (3,))
+
+    stats = (await client.get(f"{api}/bookings/stats", params=stats_params())).json()["payload"]
+    assert stats["total"] == 3
+    assert stats["revenue"] == 90.0
+    assert stats["by_service"][0]["revenue"] == 90.0
+
+
+async def test_canceled_bookings_leave_the_revenue(client, api):
+    service = await create_service(client, api, price=20.0)
+    created = await client.post(f"{api}/bookings/new", json=booking_body(service, slot_time(hour=1)))
+    await book(client, api, service, (2,))
+
+    canceled = await client.delete(f"{api}/bookings/{created.json()['payload']['id']}")
+    assert canceled.status_code == 200
+    stats = (await client.get(f"{api}/bookings/stats", params=stats_params())).json()["payload"]
+    assert stats["by_status"] == {"Pending": 1, "canceled": 1}
+    assert stats["revenue"] == 20.0
+
+
+async def test_rollups_without_revenue_are_priced_at_the_current_price(client, api, database):
+    service = await create_service(client, api, price=20.0)
+    # A row last rebuilt before revenue was rolled up
+    await database["booking_rollups"].insert_one({
+        "tenant_id": "tenant-1", "day": stats_params()["start"], "service_id": ObjectId(service["id"]),
+        "status": "Pending", "bookings": 2,
+    })
+
+    stats = (await client.get(f"{api}/bookings/stats", params=stats_params())).json()["payload"]
+    assert stats["revenue"] == 40.0
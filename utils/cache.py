@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+
+def _retrieve_exception(task: asyncio.Future):
+    # A failed load nobody waits on any more is not an unhandled error
+    if not task.cancelled():
+        task.exception()
+
+
+class TTLCache:
+    """Size-bounded LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent misses for the same key share one loader call, which finishes
+    even if the caller that started it is cancelled. Invalidation during a
+    load keeps the stale result from being stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; loaders outside get_or_load compare it before storing."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if time.monotonic() >= entry[0]:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], cache_none: bool = False) -> Any:
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        # Waiters on an in-flight load count as hits: only loader calls are misses
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        # The load runs as its own task: cancelling the caller that started it
+        # must not cancel it for everyone else waiting on the same key
+        task = asyncio.create_task(self._load(key, loader, cache_none, self._generation))
+        task.add_done_callback(_retrieve_exception)
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], cache_none: bool, generation: int) -> Any:
+        try:
+            value = await loader()
+            if generation == self._generation and (value is not None or cache_none):
+                self.set(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or everything when no key is given."""
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,110 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+from functools import lru_cache
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+import orjson
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Read endpoints encode raw Motor documents straight to JSON instead of going
+# through Beanie documents, response schemas and jsonable_encoder
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', 'true').lower() == 'true'
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    # Aware UTC datetimes end in "Z", as pydantic writes them
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowEncoder:
+    """Turn raw Mongo documents into the same JSON shape a response schema produces.
+
+    The projection only asks Mongo for the schema's fields; `id` is read from
+    `_id`, missing optional fields get the schema default and float fields are
+    coerced so stored integers still render as floats.
+    """
+
+    def __init__(self, schema: Type[BaseModel], fields: Optional[Sequence[str]] = None):
+        self.fields: List[Tuple[str, str, Callable[[], Any], bool]] = []
+        for name, field in schema.model_fields.items():
+            if fields is not None and name not in fields:
+                continue
+            source = "_id" if name == "id" else name
+            if field.default_factory is not None:
+                default = field.default_factory
+            else:
+                value = None if field.is_required() else field.default
+                default = lambda value=value: value
+            self.fields.append((name, source, default, field.annotation is float))
+        self.projection: Dict[str, int] = {source: 1 for _, source, _, _ in self.fields}
+        if "_id" not in self.projection:
+            self.projection["_id"] = 0
+
+    def encode(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        row = {}
+        for name, source, default, is_float in self.fields:
+            value = doc.get(source)
+            if value is None:
+                value = default()
+            elif is_float:
+                value = float(value)
+            row[name] = value
+        return row
+
+
+@lru_cache(maxsize=128)
+def row_encoder(schema: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None) -> RowEncoder:
+    """Shared encoder per (schema, field selection)."""
+    return RowEncoder(schema, fields)
+
+
+def select_fields(schema: Type[BaseModel], fields: Optional[str], view: Optional[str], views: Dict[str, Sequence[str]], always: Sequence[str] = ("id",)) -> Optional[Tuple[str, ...]]:
+    """Resolve a `fields=` list or a named view into schema field names; None means every field."""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+    elif view in views:
+        names = list(views[view])
+    else:
+        return None
+    unknown = [name for name in names if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return tuple(dict.fromkeys([*always, *names]))
+
+
+async def find_rows(document_model, encoder: RowEncoder, query: Dict[str, Any], sort: List[Tuple[str, int]], skip: int = 0, limit: int = 0) -> List[Dict[str, Any]]:
+    """Run a projected find on the model's collection and encode every document."""
+    cursor = document_model.get_motor_collection().find(query, encoder.projection).sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [encoder.encode(doc) async for doc in cursor]
+
+
+def respond(content: Dict[str, Any], raw: bool = False):
+    """Return the envelope as pre-encoded JSON in fast mode or for raw rows, otherwise let FastAPI encode it."""
+    if FAST_SERIALIZATION or raw:
+        return ORJSONResponse(content)
+    return content
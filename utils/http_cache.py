@@ -0,0 +1,46 @@
+from typing import Any, Optional
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+import hashlib
+import os
+
+# Load environment variables
+load_dotenv()
+
+# The catalog is public and rarely changes: let browsers and the CDN keep it briefly
+CATALOG_CACHE_CONTROL = os.getenv('CATALOG_CACHE_CONTROL', 'public, max-age=30, stale-while-revalidate=300')
+# Bookings are per customer: cacheable by the browser only, revalidated every time
+BOOKING_CACHE_CONTROL = os.getenv('BOOKING_CACHE_CONTROL', 'private, no-cache')
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong validator over the parts that determine a representation.
+
+    The envelope's meta.requestId is deliberately not one of them.
+    """
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def with_cache_headers(content: Any, etag: str, cache_control: str) -> Response:
+    """Attach validator headers to an endpoint result, rendering plain content as JSON."""
+    response = content if isinstance(content, Response) else JSONResponse(jsonable_encoder(content))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,51 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Sequence, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Most identifiers a single multi-get request may ask for
+MULTI_GET_MAX_IDS = int(os.getenv('MULTI_GET_MAX_IDS', '500'))
+
+
+def check_batch_size(*requested: Sequence[Any]):
+    total = sum(len(keys) for keys in requested)
+    if total == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide at least one identifier"
+        )
+    if total > MULTI_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A multi-get accepts at most {MULTI_GET_MAX_IDS} identifiers"
+        )
+
+
+def unique(keys: Iterable[Hashable]) -> List[Hashable]:
+    """Drop repeated identifiers, keeping the first occurrence."""
+    return list(dict.fromkeys(keys))
+
+
+def in_request_order(requested: Sequence[Hashable], found: Dict[Hashable, Any], seen: set) -> Tuple[List[Any], List[Hashable]]:
+    """Items in the order they were asked for, each item once, plus the identifiers that matched nothing.
+
+    `seen` collects the identity of every item returned so several lookups can share it.
+    """
+    items, missing = [], []
+    for key in unique(requested):
+        item = found.get(key)
+        if item is None:
+            missing.append(key)
+            continue
+        marker = id(item)
+        if marker not in seen:
+            seen.add(marker)
+            items.append(item)
+    return items, missing
+
+
+def index_by(items: Iterable[Any], key_of: Callable[[Any], Hashable]) -> Dict[Hashable, Any]:
+    return {key_of(item): item for item in items}
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+from fastapi import HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+from dotenv import load_dotenv
+import base64
+import json
+import os
+import time
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a filtered total stays cached for cursor pagination
+PAGINATION_COUNT_CACHE_TTL = float(os.getenv('PAGINATION_COUNT_CACHE_TTL', '30'))
+PAGINATION_COUNT_CACHE_SIZE = 10000
+
+_count_cache: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+
+def encode_cursor(last_id: ObjectId, sort_value: Optional[datetime] = None) -> str:
+    """Build the opaque cursor pointing just after the given row."""
+    data = {"id": str(last_id)}
+    if sort_value is not None:
+        data["v"] = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[ObjectId, Optional[datetime]]:
+    """Parse a cursor produced by encode_cursor, rejecting anything else with a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value = datetime.fromisoformat(data["v"]) if "v" in data else None
+        return ObjectId(data["id"]), sort_value
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_filter(cursor: str, sort_field: Optional[str] = None) -> Dict[str, Any]:
+    """Filter selecting rows after the cursor in (sort_field, _id) order."""
+    last_id, sort_value = decode_cursor(cursor)
+    if sort_field is None:
+        return {"_id": {"$gt": last_id}}
+    if sort_value is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    return {"$or": [
+        {sort_field: {"$gt": sort_value}},
+        {sort_field: sort_value, "_id": {"$gt": last_id}},
+    ]}
+
+
+async def count_documents(document_model, query: Dict[str, Any], cached: bool = True) -> int:
+    """Total from collection metadata when unfiltered, otherwise an indexed count kept for a short TTL."""
+    collection = document_model.get_motor_collection()
+    if not query:
+        return await collection.estimated_document_count()
+    if not cached:
+        return await collection.count_documents(query)
+
+    key = (collection.name, json.dumps(query, sort_keys=True, default=str))
+    entry = _count_cache.get(key)
+    if entry and time.monotonic() - entry[0] < PAGINATION_COUNT_CACHE_TTL:
+        return entry[1]
+    total = await collection.count_documents(query)
+    if len(_count_cache) >= PAGINATION_COUNT_CACHE_SIZE:
+        _count_cache.clear()
+    _count_cache[key] = (time.monotonic(), total)
+    return total
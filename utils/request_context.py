@@ -0,0 +1,9 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# Set by core.middleware.RequestIdMiddleware for the duration of each request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
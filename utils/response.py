@@ -1,4 +1,5 @@
 from typing import Generic, TypeVar, Any, List, Optional
+from utils.request_context import get_request_id
 import uuid
 
 T = TypeVar('T')
@@ -7,9 +8,9 @@ class APIResponse(Generic[T]):
     def __init__(self, payload: T, status_code: str = "200", request_id: Optional[str] = None):
         self.status = status_code
         self.payload = payload
-        # Use provided request_id or generate a new one if not provided
+        # Use provided request_id, then the current request's, or generate a new one
         self.meta = {
-            "requestId": request_id if request_id else str(uuid.uuid4())
+            "requestId": request_id or get_request_id() or str(uuid.uuid4())
         }
 
     def dict(self) -> dict[str, Any]:
@@ -26,7 +27,7 @@ class APIResponsePagination(Generic[T]):
         self.totalElements = total_elements
         self.page = page
         self.size = size
-        self.request_id = request_id
+        self.request_id = request_id or get_request_id()
 
     def dict(self) -> dict[str, Any]:
         result = {
@@ -41,6 +42,42 @@ class APIResponsePagination(Generic[T]):
             result["meta"] = {"requestId": self.request_id}
         return result
 
+class APIResponseCursor(Generic[T]):
+    def __init__(self, content: List[T], next_cursor: Optional[str], size: int, total_elements: Optional[int] = None, request_id: Optional[str] = None):
+        self.content = content
+        self.nextCursor = next_cursor
+        self.size = size
+        self.totalElements = total_elements
+        self.request_id = request_id or get_request_id()
+
+    def dict(self) -> dict[str, Any]:
+        result = {
+            "content": self.content,
+            "nextCursor": self.nextCursor,
+            "size": self.size
+        }
+        # Totals are only computed when the client asks for them
+        if self.totalElements is not None:
+            result["totalElements"] = self.totalElements
+        if self.request_id:
+            result["meta"] = {"requestId": self.request_id}
+        return result
+
+class APIResponseMultiGet(Generic[T]):
+    def __init__(self, content: List[T], missing: dict[str, List[Any]], request_id: Optional[str] = None):
+        self.content = content
+        self.missing = missing
+        self.request_id = request_id or get_request_id()
+
+    def dict(self) -> dict[str, Any]:
+        result = {
+            "content": self.content,
+            "missing": self.missing
+        }
+        if self.request_id:
+            result["meta"] = {"requestId": self.request_id}
+        return result
+
 
 def create_response(payload: T, status_code: str = "200", request_id: Optional[str] = None) -> dict[str, Any]:
     """Create a response following the APIResponse schema.
@@ -48,7 +85,7 @@ def create_response(payload: T, status_code: str = "200", request_id: Optional[s
     Args:
         payload: The data to include in the response
         status_code: HTTP status code as a string
-        request_id: Optional request ID to use instead of generating a new one
+        request_id: Optional request ID; defaults to the current request's x-request-id
     
     Returns:
         Dict conforming to APIResponse structure
@@ -72,7 +109,7 @@ def create_pagination_response(
         page: Current page number (0-indexed)
         size: Number of items per page
         status_code: HTTP status code as a string
-        request_id: Optional request ID to use instead of generating a new one
+        request_id: Optional request ID; defaults to the current request's x-request-id
 
     Returns:
         Dict conforming to APIResponse structure with pagination data
@@ -86,4 +123,59 @@ def create_pagination_response(
         size=size,
         request_id=request_id
     ).dict()
-    return create_response(pagination_data, status_code, request_id)
\ No newline at end of file
+    return create_response(pagination_data, status_code, request_id)
+
+def create_cursor_response(
+    content: List[T],
+    next_cursor: Optional[str],
+    size: int,
+    total_elements: Optional[int] = None,
+    status_code: str = "200",
+    request_id: Optional[str] = None
+) -> dict[str, Any]:
+    """Create a cursor (keyset) pagination response wrapped in APIResponse.
+
+    Args:
+        content: List of items for the current page
+        next_cursor: Opaque cursor for the following page, None on the last page
+        size: Maximum number of items per page
+        total_elements: Optional total number of items across all pages
+        status_code: HTTP status code as a string
+        request_id: Optional request ID; defaults to the current request's x-request-id
+
+    Returns:
+        Dict conforming to APIResponse structure with cursor pagination data
+    """
+    cursor_data = APIResponseCursor(
+        content=content,
+        next_cursor=next_cursor,
+        size=size,
+        total_elements=total_elements,
+        request_id=request_id
+    ).dict()
+    return create_response(cursor_data, status_code, request_id)
+
+
+def create_multi_get_response(
+    content: List[T],
+    missing: dict[str, List[Any]],
+    status_code: str = "200",
+    request_id: Optional[str] = None
+) -> dict[str, Any]:
+    """Create a multi-get response wrapped in APIResponse.
+
+    Args:
+        content: Found items, in the order they were requested
+        missing: Requested identifiers that matched nothing, by kind
+        status_code: HTTP status code as a string
+        request_id: Optional request ID; defaults to the current request's x-request-id
+
+    Returns:
+        Dict conforming to APIResponse structure with the items and the missing identifiers
+    """
+    multi_get_data = APIResponseMultiGet(
+        content=content,
+        missing=missing,
+        request_id=request_id
+    ).dict()
+    return create_response(multi_get_data, status_code, request_id)
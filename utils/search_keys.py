@@ -0,0 +1,51 @@
+from typing import Dict, Optional
+from dotenv import load_dotenv
+import os
+import re
+import unicodedata
+
+# Load environment variables
+load_dotenv()
+
+# Country calling code assumed for national numbers ("0912..." -> "+84912...")
+DEFAULT_COUNTRY_CODE = os.getenv('DEFAULT_COUNTRY_CODE', '84')
+
+NON_DIGITS = re.compile(r"\D")
+WHITESPACE = re.compile(r"\s+")
+# Letters NFD does not decompose into a base letter plus marks
+FOLDED_LETTERS = str.maketrans({"đ": "d", "Đ": "d"})
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """E.164 form of a phone number, or of the leading part of one for prefix search.
+
+    "0912 345 678", "+84 912-345-678" and "0084912345678" all become
+    "+84912345678"; None when there are no digits at all.
+    """
+    if not phone:
+        return None
+    phone = phone.strip()
+    digits = NON_DIGITS.sub("", phone)
+    if not digits:
+        return None
+    if phone.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if digits.startswith("0"):
+        return f"+{DEFAULT_COUNTRY_CODE}{digits[1:]}"
+    return f"+{digits}"
+
+
+def name_key(name: Optional[str]) -> Optional[str]:
+    """Lowercase, diacritic-free, single-spaced form of a name: "Nguyễn  Văn Đức" -> "nguyen van duc"."""
+    if not name:
+        return None
+    decomposed = unicodedata.normalize("NFD", name.translate(FOLDED_LETTERS))
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return WHITESPACE.sub(" ", folded).strip().lower() or None
+
+
+def prefix_range(prefix: str) -> Dict[str, str]:
+    """Anchored prefix match as a plain index range: every string starting with `prefix`."""
+    return {"$gte": prefix, "$lt": prefix[:-1] + chr(ord(prefix[-1]) + 1)}
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+
+
+def versioned_filter(document_id: Any, expected_version: Optional[int] = None, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """Filter for a single-round-trip update: the document, its tenant and, when given, the version the client read."""
+    query: Dict[str, Any] = {"_id": document_id}
+    if tenant_id:
+        query["tenant_id"] = tenant_id
+    if expected_version is not None:
+        # Documents written before versioning have no field and count as version 0
+        query["version"] = {"$in": [0, None]} if expected_version == 0 else expected_version
+    return query
+
+
+def versioned_update(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """$set only the changed fields, bump updated_at and the version."""
+    return {"$set": {**changes, "updated_at": datetime.now()}, "$inc": {"version": 1}}
+
+
+async def raise_update_miss(collection, document_id: Any, not_found: str, tenant_id: Optional[str] = None, forbidden: str = "Not allowed"):
+    """Explain why a versioned update matched nothing; only runs on the failure path."""
+    current = await collection.find_one({"_id": document_id}, {"tenant_id": 1, "version": 1})
+    if current is None:
+        raise HTTPException(
+            status_code=404,
+            detail=not_found
+        )
+    if tenant_id and current.get("tenant_id") != tenant_id:
+        raise HTTPException(
+            status_code=403,
+            detail=forbidden
+        )
+    raise HTTPException(
+        status_code=409,
+        detail=f"Modified concurrently; current version is {current.get('version', 0)}"
+    )